@@ -0,0 +1,255 @@
+"""
+Pipeline benchmarks on synthetic data.
+
+Generates MachineLearningRating_v3-style files (see scripts/synthetic_data.py) at the
+requested row counts and times each stage of the notebook pipeline: loading (raw and typed),
+convert_data_types, handle_missing_values, bootstrap and permutation tests of the loss ratio
+of the two largest provinces, create_features, prepare_modeling_data, the ModelTrainer fits
+and shap_summary. Every row count runs in a fresh process, so the peak
+RSS reported for a stage is not inflated by earlier sizes.
+
+Results are printed as a table and appended to a JSON lines file; with --baseline the run is
+compared against an earlier results file and stages that got slower (or bigger) than the
+tolerance are reported as regressions.
+
+Usage:
+    python run_benchmarks.py --rows 10000 100000 1000000 --output results.jsonl
+    python run_benchmarks.py --rows 100000 --baseline results.jsonl --fail-on-regression
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARK_DIR, '..', 'scripts'))
+
+import numpy as np
+import pandas as pd
+from profiling import PeakMemory
+
+FREQUENCY_MODELS = ['xgb_classifier', 'rf_classifier', 'logistic_regression']
+SEVERITY_MODELS = ['xgboost', 'random_forest', 'linear_regression']
+TREE_MODELS = ['xgb_classifier', 'rf_classifier', 'xgboost', 'random_forest']
+
+
+class StageTimer:
+    """Collects one record per timed stage of a benchmark run."""
+
+    def __init__(self, n_rows, quiet=True):
+        self.n_rows = n_rows
+        self.quiet = quiet
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, name, rows):
+        """Times the enclosed block; rows is the number of rows the stage processes."""
+        output = io.StringIO()
+        with PeakMemory() as memory:
+            start, cpu_start = time.perf_counter(), time.process_time()
+            with contextlib.redirect_stdout(output) if self.quiet else contextlib.nullcontext():
+                yield
+            seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+        self.records.append({
+            'rows': self.n_rows,
+            'stage': name,
+            'stage_rows': int(rows),
+            'seconds': round(seconds, 4),
+            'cpu_seconds': round(cpu_seconds, 4),
+            'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None,
+            'peak_rss_mb': round(memory.peak / 2 ** 20, 1) if memory.peak is not None else None,
+            'peak_delta_mb': round((memory.peak - memory.start) / 2 ** 20, 1) if memory.peak is not None else None,
+        })
+
+
+def synthetic_file(n_rows, data_dir, seed=0):
+    """Path of the synthetic file with n_rows rows, generated on first use."""
+    from synthetic_data import write_policies
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_{n_rows}_seed{seed}.txt")
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        write_policies(tmp_path, n_rows, seed=seed)
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_pipeline(path, n_rows, models, encoding='sparse', n_estimators=100, shap_sample=10_000, resamples=1000,
+                 quiet=True):
+    """Runs the pipeline on the file at path once and returns the per-stage records."""
+    from utils import DataLoader
+    from data_preprocessing import PreprocessData
+    from feature_engineering import FeatureEngineering
+    from models import ModelTrainer
+    from feature_importance import FeatureInterpreter
+    from resampling import TwoSampleResampler
+
+    timer = StageTimer(n_rows, quiet=quiet)
+
+    with timer.stage('load_data typed', n_rows):
+        DataLoader().load_data(path, typed=True)
+
+    with timer.stage('load_data', n_rows):
+        data = DataLoader().load_data(path)
+
+    preprocess = PreprocessData(data)
+    with timer.stage('convert_data_types', n_rows):
+        preprocess.convert_data_types(data)
+
+    with timer.stage('handle_missing_values', n_rows):
+        data = preprocess.handle_missing_values(data, inplace=True)
+
+    if resamples:
+        # Seeded, single process, no early stopping: the timings are comparable between runs
+        groups = [data[data['Province'] == name] for name in data['Province'].value_counts().index[:2]]
+        resampler = TwoSampleResampler(*(group[col].to_numpy(dtype=float) for group in groups
+                                         for col in ('TotalClaims', 'TotalPremium')), seed=0)
+        with timer.stage(f'bootstrap {resamples}', sum(map(len, groups))):
+            resampler.bootstrap(resamples)
+        with timer.stage(f'permutation {resamples}', sum(map(len, groups))):
+            resampler.permutation(resamples, early_stop=False)
+
+    feature_eng = FeatureEngineering(data, copy=False)
+    del data
+    with timer.stage(f'create_features {encoding}', n_rows):
+        feature_eng.create_features(encoding=encoding)
+
+    with timer.stage('prepare_modeling_data', n_rows):
+        (X_train, X_test, y_freq_train, y_freq_test,
+         X_train_sev, y_sev_train, X_test_sev, y_sev_test) = feature_eng.prepare_modeling_data()
+
+    trainers = {'frequency': ModelTrainer(X_train, X_test, y_freq_train, y_freq_test),
+                'severity': ModelTrainer(X_train_sev, X_test_sev, y_sev_train, y_sev_test)}
+    fitted = {}
+    for name in models:
+        trainer = trainers['frequency' if name in FREQUENCY_MODELS else 'severity']
+        fit = getattr(trainer, f"train_{name}")
+        kwargs = {'n_estimators': n_estimators} if name in TREE_MODELS else {}
+        with timer.stage(f'fit {name}', trainer.X_train.shape[0]):
+            fitted[name] = fit(**kwargs)
+
+    explained = next((name for name in ('xgb_classifier', 'rf_classifier') if name in fitted), None)
+    if explained is not None and shap_sample:
+        interpreter = FeatureInterpreter(fitted[explained], X_test, feature_names=feature_eng.feature_names)
+        sample_size = min(shap_sample, X_test.shape[0])
+        with timer.stage(f'shap_summary {explained}', sample_size):
+            interpreter.shap_summary(sample_size=sample_size, stratify=y_freq_test, plot=False, use_cache=False)
+
+    return timer.records
+
+
+def _run_size(args):
+    n_rows, options = args
+    path = synthetic_file(n_rows, options['data_dir'], options['seed'])
+    return run_pipeline(path, n_rows, options['models'], encoding=options['encoding'],
+                        n_estimators=options['n_estimators'], shap_sample=options['shap_sample'],
+                        resamples=options['resamples'])
+
+
+def environment():
+    """Machine and library versions stored with every result, for sizing and comparisons."""
+    import sklearn
+    import xgboost
+    memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') if hasattr(os, 'sysconf') else None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'memory_gb': round(memory / 2 ** 30, 1) if memory else None,
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+    }
+
+
+def load_results(path):
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def compare(results, baseline, tolerance=0.2, min_seconds=0.05, min_mb=16):
+    """
+    Joins results with the latest baseline record per (rows, stage) and flags stages whose time
+    or peak memory grew by more than tolerance. Stages faster than min_seconds, or using less
+    than min_mb, in both runs are too noisy to flag on time or memory.
+    """
+    baseline = baseline.drop_duplicates(['rows', 'stage'], keep='last').set_index(['rows', 'stage'])
+    current = results.set_index(['rows', 'stage'])
+    joined = current[['seconds', 'peak_delta_mb']].join(
+        baseline[['seconds', 'peak_delta_mb']], rsuffix='_baseline', how='inner')
+    joined['time_ratio'] = (joined['seconds'] / joined['seconds_baseline']).round(2)
+    joined['memory_ratio'] = (joined['peak_delta_mb'].clip(lower=1) / joined['peak_delta_mb_baseline'].clip(lower=1)).round(2)
+    slower = (joined['time_ratio'] > 1 + tolerance) & (joined[['seconds', 'seconds_baseline']].max(axis=1) >= min_seconds)
+    bigger = (joined['memory_ratio'] > 1 + tolerance) & (joined[['peak_delta_mb', 'peak_delta_mb_baseline']].max(axis=1) >= min_mb)
+    joined['regression'] = np.select([slower & bigger, slower, bigger], ['time+memory', 'time', 'memory'], '')
+    return joined.reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the insurance pipeline on synthetic data.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000],
+                        help="Row counts to benchmark (e.g. 10000 100000 1000000 10000000)")
+    parser.add_argument('--models', nargs='+', default=FREQUENCY_MODELS + SEVERITY_MODELS,
+                        choices=FREQUENCY_MODELS + SEVERITY_MODELS, help="ModelTrainer fits to time")
+    parser.add_argument('--encoding', choices=['dense', 'sparse'], default='sparse',
+                        help="create_features encoding (dense one-hot frames do not scale to 10M rows)")
+    parser.add_argument('--n-estimators', type=int, default=100, help="Trees per forest/boosted model")
+    parser.add_argument('--shap-sample', type=int, default=10_000, help="Rows explained by shap_summary (0 skips it)")
+    parser.add_argument('--resamples', type=int, default=1000,
+                        help="Resamples timed for the bootstrap and permutation tests (0 skips them)")
+    parser.add_argument('--data-dir', default=os.path.join(BENCHMARK_DIR, '..', 'data', 'synthetic'),
+                        help="Where generated files are kept between runs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON lines file the results are appended to")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slowdown or memory growth")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 on regressions")
+    args = parser.parse_args(argv)
+
+    options = {'data_dir': args.data_dir, 'seed': args.seed, 'models': args.models, 'encoding': args.encoding,
+               'n_estimators': args.n_estimators, 'shap_sample': args.shap_sample, 'resamples': args.resamples}
+    env = environment()
+    run_id = time.strftime('%Y-%m-%dT%H:%M:%S')
+    records = []
+    context = multiprocessing.get_context('spawn')
+    for n_rows in args.rows:
+        print(f"Benchmarking {n_rows} rows...")
+        with context.Pool(1) as pool:
+            records.extend(pool.map(_run_size, [(n_rows, options)])[0])
+
+    results = pd.DataFrame(records)
+    print(results.drop(columns='cpu_seconds').to_string(index=False))
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            for record in records:
+                f.write(json.dumps({'run': run_id, **record, **options, 'environment': env}, default=str) + '\n')
+        print(f"Results appended to {args.output}")
+
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        # Only runs with the same settings are comparable
+        for key in ('encoding', 'n_estimators', 'shap_sample', 'resamples', 'seed'):
+            if key in baseline.columns:
+                baseline = baseline[baseline[key] == options[key]]
+        comparison = compare(results, baseline, tolerance=args.tolerance)
+        print(comparison.to_string(index=False))
+        regressions = comparison[comparison['regression'] != '']
+        if len(regressions):
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            print(regressions[['rows', 'stage', 'seconds', 'seconds_baseline', 'regression']].to_string(index=False))
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print("No regressions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,59 @@
-from utils import *
-from data_preprocessing import *
-from eda import *
-from hypothesis_testing import *
-from feature_engineering import *
-from models import *
-from feature_importance import *
+"""
+Package entry point for the analysis scripts.
 
+The modules import each other by flat name (from utils import ...), as the notebooks put this
+directory on sys.path; importing the package does the same. Public names are resolved on
+first access, so `from scripts import DataLoader` loads pandas but not shap, xgboost,
+scikit-learn, scipy or matplotlib. Every module is also reachable as an attribute
+(e.g. scripts.kpi_store).
+"""
+
+import importlib
+import os
+import sys
+
+_SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPTS_DIR not in sys.path:
+    sys.path.append(_SCRIPTS_DIR)
+
+# Public names per module, in the order the package used to star-import them (later wins)
+_EXPORTS = {
+    'utils': ['CATEGORICAL_COLS', 'EXTRA_CATEGORICAL_COLS', 'NUMERIC_DTYPES', 'COERCED_NUMERIC_COLS',
+              'DATE_COLS', 'COLUMNAR_FORMATS', 'schema_dtypes', 'parse_dates', 'apply_schema',
+              'coerce_schema', 'iter_typed_chunks', 'frame_memory', 'dvc_md5', 'read_columnar',
+              'write_columnar', 'DataLoader'],
+    'data_preprocessing': ['COLUMN_GROUPS', 'DROP_COLS', 'RISK_FLAG_COLS', 'CAT_IMPUTE_COLS',
+                           'NUM_IMPUTE_COLS', 'DROP_AFTER_COLS', 'PreprocessData'],
+    'eda': ['ExploratoryDataAnalysis'],
+    'hypothesis_testing': ['adjust_pvalues', 'HypothesisTester'],
+    'feature_engineering': ['TARGET_COLS', 'DATE_COLS', 'reference_year', 'derive_features',
+                            'build_vocabulary', 'vocabulary_feature_names', 'feature_sources',
+                            'encode_sparse', 'FeatureEngineering', 'FeaturePipeline'],
+    'models': ['MODEL_SPECS', 'build_model', 'ModelTrainer', 'PolicyChunkIter', 'train_xgb_external',
+               'TrainingOrchestrator', 'CrossValidator'],
+    'feature_importance': ['model_hash', 'data_hash', 'FeatureInterpreter', 'QuoteExplainer'],
+}
+
+_MODULES = {'utils', 'data_preprocessing', 'eda', 'hypothesis_testing', 'feature_engineering', 'models',
+            'feature_importance', 'aggregation', 'sketches', 'kpi_store', 'plot', 'scoring', 'profiling',
+            'synthetic_data', 'resampling', 'sampling'}
+
+_NAME_TO_MODULE = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_NAME_TO_MODULE)
+
+
+def __getattr__(name):
+    if name in _NAME_TO_MODULE:
+        value = getattr(importlib.import_module(_NAME_TO_MODULE[name]), name)
+    elif name in _MODULES:
+        value = importlib.import_module(name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Cache it, so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _MODULES)
@@ -0,0 +1,251 @@
+"""
+Additive KPI aggregation for the insurance portfolio.
+
+Loss ratio, claim frequency, severity and margin are all ratios of additive sums,
+so partial sums computed per chunk can be merged and finalised at the end.
+With weight_col (e.g. the SampleWeight of a stratified sample) every row counts weight
+times, so the sums and counts estimate those of the full portfolio.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+SUM_COLS = ['PolicyCount', 'TotalPremium', 'TotalClaims', 'ClaimCount', 'SeveritySum', 'SeveritySumSq']
+
+
+def _segment_key(segment):
+    return list(segment) if isinstance(segment, (list, tuple)) else segment
+
+
+def partial_sums(data, segment=None, weight_col=None):
+    """
+    Returns the additive KPI sums for data, grouped by segment (a column name or a tuple
+    of column names) or as a single-row frame when segment is None. With weight_col the
+    sums and counts are weighted.
+    """
+    claims = data['TotalClaims']
+    has_claim = claims > 0
+    severity = claims.where(has_claim, 0.0)
+    parts = pd.DataFrame({
+        'PolicyCount': np.ones(len(data), dtype=np.int64),
+        'TotalPremium': data['TotalPremium'],
+        'TotalClaims': claims,
+        'ClaimCount': has_claim.astype(np.int64),
+        'SeveritySum': severity,
+        'SeveritySumSq': severity ** 2,
+    }, index=data.index)
+    if weight_col is not None:
+        parts = parts.mul(data[weight_col].astype(np.float64), axis=0)
+
+    if segment is None:
+        return parts.sum().to_frame('overall').T
+
+    key = _segment_key(segment)
+    keys = [data[col] for col in (key if isinstance(key, list) else [key])]
+    sums = parts.groupby(keys, observed=True).sum()
+    # Plain (non-categorical) index so sums from chunks with different categories align
+    if isinstance(sums.index, pd.MultiIndex):
+        sums.index = pd.MultiIndex.from_arrays(
+            [sums.index.get_level_values(i).astype(object) for i in range(sums.index.nlevels)],
+            names=sums.index.names)
+    else:
+        sums.index = sums.index.astype(object)
+    return sums
+
+
+def finalize_kpis(sums):
+    """
+    Derives loss ratio, frequency, severity and margin columns from additive sums.
+    """
+    kpis = sums.copy()
+    claim_count = kpis['ClaimCount'].astype(float)
+    kpis['LossRatio'] = kpis['TotalClaims'] / kpis['TotalPremium']
+    kpis['ClaimFrequency'] = claim_count / kpis['PolicyCount']
+    kpis['ClaimSeverity'] = kpis['SeveritySum'] / claim_count.replace(0, np.nan)
+    variance = (kpis['SeveritySumSq'] - kpis['SeveritySum'] ** 2 / claim_count.replace(0, np.nan)) / (claim_count - 1).where(claim_count > 1)
+    kpis['SeverityStd'] = np.sqrt(variance.clip(lower=0))
+    kpis['Margin'] = kpis['TotalPremium'] - kpis['TotalClaims']
+    kpis['AverageMargin'] = kpis['Margin'] / kpis['PolicyCount']
+    return kpis
+
+
+def factorize_segment(series):
+    """
+    Returns (codes, uniques) for a segment column; missing values get code -1.
+    Categorical columns reuse their codes, so no hashing pass is needed.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, uniques
+
+
+def _bincount_sums(codes, n_groups, premium, claims, weights=None):
+    valid = codes >= 0
+    if not valid.all():
+        codes, premium, claims = codes[valid], premium[valid], claims[valid]
+        weights = weights[valid] if weights is not None else None
+    return (np.bincount(codes, weights=weights, minlength=n_groups),
+            np.bincount(codes, weights=premium, minlength=n_groups),
+            np.bincount(codes, weights=claims, minlength=n_groups))
+
+
+def _segment_task(name, codes, uniques, premium, claims, weights=None, month_codes=None, month_uniques=None,
+                  month_col=None):
+    """
+    Worker kernel: premium/claim sums for one segment column (optionally crossed with month).
+    premium and claims are already weighted; weights only turn the row counts into weighted counts.
+    """
+    if month_codes is None:
+        counts, prem, clm = _bincount_sums(codes, len(uniques), premium, claims, weights)
+        index = pd.Index(uniques, name=name)
+    else:
+        n_months = len(month_uniques)
+        combined = np.where((codes >= 0) & (month_codes >= 0), codes.astype(np.int64) * n_months + month_codes, -1)
+        counts, prem, clm = _bincount_sums(combined, len(uniques) * n_months, premium, claims, weights)
+        index = pd.MultiIndex.from_product([uniques, month_uniques], names=[name, month_col])
+
+    segment = pd.DataFrame({'TotalPremium': prem, 'TotalClaims': clm, 'PolicyCount': counts}, index=index)
+    # Keep observed groups only, as groupby(observed=True) does
+    segment = segment[counts > 0]
+    segment['LossRatio'] = segment['TotalClaims'] / segment['TotalPremium']
+    return segment
+
+
+def segment_sums(data, segment_cols, by_month=False, month_col='TransactionMonth', n_jobs=None, backend='thread',
+                 weight_col=None):
+    """
+    Premium and claim sums, policy counts and loss ratios for every segment column.
+
+    Each column is factorized once and summed with bincount kernels; the columns (and
+    segment x month combinations when by_month=True, keyed as (col, month_col)) are
+    spread across a thread or process pool. With weight_col the sums and policy counts
+    are weighted.
+    Returns a dict of DataFrames keyed like StreamingKPIAggregator.results().
+    """
+    if backend not in ('thread', 'process'):
+        raise ValueError(f"Unsupported backend: {backend}. Use 'thread' or 'process'.")
+    segment_cols = [col for col in segment_cols if col in data.columns]
+    premium = data['TotalPremium'].to_numpy(dtype=np.float64)
+    claims = data['TotalClaims'].to_numpy(dtype=np.float64)
+    weights = None
+    if weight_col is not None:
+        weights = data[weight_col].to_numpy(dtype=np.float64)
+        premium, claims = premium * weights, claims * weights
+    factorized = {col: factorize_segment(data[col]) for col in segment_cols}
+
+    tasks = [(col, *factorized[col], premium, claims, weights) for col in segment_cols]
+    keys = list(segment_cols)
+    if by_month and month_col in data.columns:
+        month_codes, month_uniques = factorize_segment(data[month_col])
+        tasks += [(col, *factorized[col], premium, claims, weights, month_codes, month_uniques, month_col)
+                  for col in segment_cols]
+        keys += [(col, month_col) for col in segment_cols]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(tasks), 1))
+    if n_jobs == 1:
+        segments = [_segment_task(*task) for task in tasks]
+    else:
+        executor_cls = ThreadPoolExecutor if backend == 'thread' else ProcessPoolExecutor
+        with executor_cls(max_workers=n_jobs) as executor:
+            # Submitted one by one: map(*zip(*tasks)) would cut the month tasks to the shortest tuple
+            segments = [future.result() for future in [executor.submit(_segment_task, *task) for task in tasks]]
+    return dict(zip(keys, segments))
+
+
+def zip_month_panel(data, zip_col='PostalCode', month_col='TransactionMonth', weight_col=None):
+    """
+    Returns monthly TotalPremium, TotalClaims and PolicyCount per ZIP code, indexed by
+    (zip_col, month_col), built with a single grouped pass. Missing ZIPs are excluded.
+    Build it once and pass it to top_zipcodes/zip_spearman (or as panel= to the EDA and
+    plot ZIP views) to reuse it for every top-N ZIP analysis of the same data.
+    """
+    return segment_sums(data, [zip_col], by_month=True, month_col=month_col, n_jobs=1,
+                        weight_col=weight_col)[(zip_col, month_col)]
+
+
+def top_zipcodes(panel, top_n=5):
+    """Returns the top_n ZIP codes by policy count from a zip_month_panel."""
+    volume = panel['PolicyCount'].groupby(level=0).sum()
+    return volume.nlargest(top_n).index
+
+
+def zip_spearman(panel, zips):
+    """
+    Spearman correlation of monthly premium vs claims for each ZIP in zips, computed
+    from a zip_month_panel as grouped Pearson moments of within-ZIP ranks.
+    ZIPs with fewer than two months of data are omitted.
+    """
+    sub = panel.loc[panel.index.get_level_values(0).isin(zips), ['TotalPremium', 'TotalClaims']]
+    level = sub.index.get_level_values(0)
+    ranks = sub.groupby(level=0).rank()
+    x, y = ranks['TotalPremium'], ranks['TotalClaims']
+    moments = pd.DataFrame({'n': 1, 'x': x, 'y': y, 'xy': x * y, 'xx': x * x, 'yy': y * y}).groupby(level).sum()
+
+    n = moments['n']
+    cov = moments['xy'] - moments['x'] * moments['y'] / n
+    var_x = moments['xx'] - moments['x'] ** 2 / n
+    var_y = moments['yy'] - moments['y'] ** 2 / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.sqrt(var_x * var_y)
+    corr = corr[n > 1]
+    return corr.reindex([z for z in zips if z in corr.index])
+
+
+class StreamingKPIAggregator:
+    """
+    Single-pass, out-of-core KPI aggregation over a stream of chunks.
+
+    Each chunk contributes additive partial sums (premium, claims, claim counts,
+    severity sums and sums of squares) for the overall portfolio and for every
+    requested segment; aggregators built on different workers can be merged.
+    With weight_col (e.g. 'SampleWeight' for sampled chunks) the sums are weighted.
+    """
+
+    def __init__(self, segment_cols=None, weight_col=None):
+        self.segment_cols = list(segment_cols or [])
+        self.weight_col = weight_col
+        self.sums = {'overall': None}
+        self.sums.update({segment: None for segment in self.segment_cols})
+
+    def _add(self, name, sums):
+        current = self.sums[name]
+        self.sums[name] = sums if current is None else current.add(sums, fill_value=0)
+
+    def update(self, chunk):
+        """Adds one chunk's partial sums."""
+        self._add('overall', partial_sums(chunk, weight_col=self.weight_col))
+        for segment in self.segment_cols:
+            key = _segment_key(segment)
+            if all(col in chunk.columns for col in (key if isinstance(key, list) else [key])):
+                self._add(segment, partial_sums(chunk, segment, weight_col=self.weight_col))
+        return self
+
+    def merge(self, other):
+        """Merges the partial sums of another aggregator built for the same segments."""
+        for name, sums in other.sums.items():
+            if sums is not None:
+                self.sums.setdefault(name, None)
+                self._add(name, sums)
+        return self
+
+    def fit(self, chunks):
+        """Consumes an iterator of chunks, e.g. DataLoader.load_data(..., typed=True, chunksize=...)."""
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def results(self):
+        """
+        Returns {'overall': Series of portfolio KPIs, segment: DataFrame of per-segment KPIs}.
+        """
+        if self.sums['overall'] is None:
+            raise ValueError("No data aggregated yet.")
+        results = {'overall': finalize_kpis(self.sums['overall']).iloc[0]}
+        for segment in self.segment_cols:
+            if self.sums[segment] is not None:
+                results[segment] = finalize_kpis(self.sums[segment].sort_index())
+        return results
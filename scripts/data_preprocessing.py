@@ -2,9 +2,112 @@
 Docstring for scripts.data_preprocessing
 """
 
+import time
+
 import pandas as pd
 import numpy as np
+from utils import frame_memory, parse_dates
+from profiling import profile_methods
+
+#  Raw columns by topic, in file order
+COLUMN_GROUPS = {
+    "Columns about the Insurance Policy": [
+        "UnderwrittenCoverID", "PolicyID", "TransactionMonth"
+    ],
+
+    "Columns about the Client": [
+        "IsVATRegistered", "Citizenship", "LegalType", "Title",
+        "Language", "Bank", "AccountType", "MaritalStatus", "Gender"
+    ],
+
+    "Columns about the Client location": [
+        "Country", "Province", "PostalCode", "MainCrestaZone", "SubCrestaZone"
+    ],
+
+    "Columns about the Car Insured": [
+        "ItemType", "mmcode", "VehicleType", "RegistrationYear", "make",
+        "Model", "Cylinders", "cubiccapacity", "kilowatts", "bodytype",
+        "NumberOfDoors", "VehicleIntroDate", "CustomValueEstimate",
+        "AlarmImmobiliser", "TrackingDevice", "CapitalOutstanding",
+        "NewVehicle", "WrittenOff", "Rebuilt", "Converted",
+        "CrossBorder", "NumberOfVehiclesInFleet"
+    ],
+
+    "Columns about the Plan": [
+        "SumInsured", "TermFrequency", "CalculatedPremiumPerTerm",
+        "ExcessSelected", "CoverCategory", "CoverType", "CoverGroup",
+        "Section", "Product", "StatutoryClass", "StatutoryRiskType"
+    ],
+
+    "Columns about the Payment & Claim": [
+        "TotalPremium", "TotalClaims"
+    ]
+}
 
+#  Columns with >99% missing values, dropped before imputation
+DROP_COLS = ['NumberOfVehiclesInFleet', 'CrossBorder', 'CustomValueEstimate']
+#  High-risk vehicle flags: filled with 'No' plus a missing flag column
+RISK_FLAG_COLS = ['WrittenOff', 'Rebuilt', 'Converted']
+#  Moderate-missing categorical columns: 'Missing' (or the mode for numeric codes)
+CAT_IMPUTE_COLS = ['NewVehicle', 'Bank', 'AccountType', 'Gender', 'MaritalStatus',
+                   'mmcode', 'VehicleType', 'make', 'Model', 'bodytype']
+#  Numeric columns filled with the median
+NUM_IMPUTE_COLS = ['CapitalOutstanding', 'Cylinders', 'cubiccapacity', 'kilowatts', 'NumberOfDoors']
+#  Date columns dropped once vehicle age is available
+DROP_AFTER_COLS = ['VehicleIntroDate']
+
+
+def _is_text(dtype):
+    return dtype.name in ('category', 'object') or pd.api.types.is_string_dtype(dtype)
+
+
+def _mode_from_counts(counts):
+    """Most frequent value of a value_counts Series (smallest on ties, as Series.mode)."""
+    if counts.empty:
+        return np.nan
+    return counts[counts == counts.max()].index.min()
+
+
+def _fill_missing(series, value, mask):
+    """
+    Returns series with the positions in mask set to value, or None if nothing changes.
+    Categories are filled on their codes; the fill level is always registered so every
+    batch shares the same categories.
+    """
+    if series.dtype.name == 'category':
+        categories = series.cat.categories
+        if value in categories:
+            if not mask.any():
+                return None
+        else:
+            categories = categories.append(pd.Index([value], dtype=categories.dtype))
+        codes = np.where(mask, categories.get_loc(value), series.cat.codes.to_numpy())
+        dtype = pd.CategoricalDtype(categories, ordered=series.cat.ordered)
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=series.index, name=series.name)
+    if not mask.any():
+        return None
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        try:
+            fill = np.asarray(value, dtype=series.dtype)
+        except (TypeError, ValueError):
+            return series.fillna(value)
+        return pd.Series(np.where(mask, fill, series.to_numpy()), index=series.index, name=series.name)
+    return series.fillna(value)
+
+
+def _median_from_counts(counts):
+    """Exact median from a value_counts Series (mean of the two middle values for even counts)."""
+    if counts.empty:
+        return np.nan
+    counts = counts.sort_index()
+    cumulative = counts.to_numpy().cumsum()
+    total = cumulative[-1]
+    values = counts.index.to_numpy(dtype=float)
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, total // 2, side='right')]
+    return (lower + upper) / 2
+
+@profile_methods
 class PreprocessData: 
     """
     A class to perform data understanding, type conversion, and basic preprocessing for the insurance dataset.
@@ -12,6 +115,8 @@ class PreprocessData:
 
     def __init__(self, data):
         self.data = data
+        self.missing_value_plan = None
+        self.conversion_report = None
 
     def understand_data(self, data):
         """
@@ -23,51 +128,37 @@ class PreprocessData:
     def explore_by_columns(self, data):
         """Grouped columns for easier inspection.
         """
-        column_groups = {
-        "Columns about the Insurance Policy": [
-            "UnderwrittenCoverID", "PolicyID", "TransactionMonth"
-        ],
-
-        "Columns about the Client": [
-            "IsVATRegistered", "Citizenship", "LegalType", "Title", 
-            "Language", "Bank", "AccountType", "MaritalStatus", "Gender"
-        ],
-
-        "Columns about the Client location": [
-            "Country", "Province", "PostalCode", "MainCrestaZone", "SubCrestaZone"
-        ],
-
-        "Columns about the Car Insured": [
-            "ItemType", "mmcode", "VehicleType", "RegistrationYear", "make", 
-            "Model", "Cylinders", "cubiccapacity", "kilowatts", "bodytype", 
-            "NumberOfDoors", "VehicleIntroDate", "CustomValueEstimate", 
-            "AlarmImmobiliser", "TrackingDevice", "CapitalOutstanding", 
-            "NewVehicle", "WrittenOff", "Rebuilt", "Converted", 
-            "CrossBorder", "NumberOfVehiclesInFleet"
-        ],
-
-        "Columns about the Plan": [
-            "SumInsured", "TermFrequency", "CalculatedPremiumPerTerm", 
-            "ExcessSelected", "CoverCategory", "CoverType", "CoverGroup", 
-            "Section", "Product", "StatutoryClass", "StatutoryRiskType"
-        ],
-
-        "Columns about the Payment & Claim": [
-            "TotalPremium", "TotalClaims"
-        ]
-        }
-
         # Print grouped heads
-        for group_name, cols in column_groups.items():
+        for group_name, cols in COLUMN_GROUPS.items():
             print(f"\n{group_name}")
             display(data[cols].tail())
 
     def convert_data_types(self, data):
+        """
+        Converts raw columns in place: PostalCode to string, dates parsed once per distinct
+        value (see utils.parse_dates), CapitalOutstanding to numeric and the text columns
+        below to categories. The seconds and bytes saved by each conversion are printed and
+        kept in self.conversion_report.
+        """
+        self.conversion_report = []
+
+        def convert(col, conversion, func):
+            before = frame_memory(data[col])
+            start = time.perf_counter()
+            data[col] = func(data[col])
+            self.conversion_report.append({
+                "Column": col, "Conversion": conversion,
+                "Seconds": round(time.perf_counter() - start, 4),
+                "BytesBefore": before, "BytesAfter": frame_memory(data[col]),
+            })
 
-        data['PostalCode'] = data['PostalCode'].astype(str)
-        data['TransactionMonth'] = pd.to_datetime(data['TransactionMonth'], format='mixed')
-        data['VehicleIntroDate'] = pd.to_datetime(data['VehicleIntroDate'], format='mixed')
-        data['CapitalOutstanding'] = pd.to_numeric(data['CapitalOutstanding'], errors='coerce')
+        if 'PostalCode' in data.columns:
+            convert('PostalCode', 'str', lambda s: s.astype(str))
+        for col in ['TransactionMonth', 'VehicleIntroDate']:
+            if col in data.columns:
+                convert(col, 'datetime', lambda s: parse_dates(s, errors='raise'))
+        if 'CapitalOutstanding' in data.columns:
+            convert('CapitalOutstanding', 'numeric', lambda s: pd.to_numeric(s, errors='coerce'))
 
         categorical_cols = [
             'IsVATRegistered', 'Citizenship', 'LegalType', 'Title', 'Language', 
@@ -75,27 +166,42 @@ class PreprocessData:
             'Province', 'MainCrestaZone', 'SubCrestaZone', 'ItemType', 'VehicleType',
             'make', 'Model', 'bodytype', 'AlarmImmobiliser', 'TrackingDevice', 
             'TermFrequency', 'CoverCategory', 'CoverType', 'CoverGroup', 
-            'Section', 'Product', 'StatutoryClass', 'StatutoryRiskType' 'WrittenOff', 'Rebuilt', 'Converted'
+            'Section', 'Product', 'StatutoryClass', 'StatutoryRiskType', 'WrittenOff', 'Rebuilt', 'Converted'
         ]
         
         # Filter for columns that actually exist in the DataFrame (to prevent errors)
-        cols_to_convert = [col for col in categorical_cols if col in data.columns]
+        # and still hold text (object or string dtype)
+        cols_to_convert = [col for col in categorical_cols
+                           if col in data.columns and _is_text(data[col].dtype) and data[col].dtype.name != 'category']
 
         for col in cols_to_convert:
-            # treat the PostalCode (now a string) as a category
-            if data[col].dtype == 'object':
-                data[col] = data[col].astype('category')
-                
+            convert(col, 'category', lambda s: s.astype('category'))
+
+        report = pd.DataFrame(self.conversion_report, columns=["Column", "Conversion", "Seconds", "BytesBefore", "BytesAfter"])
+        report["BytesSaved"] = report["BytesBefore"] - report["BytesAfter"]
+        self.conversion_report = report
+
+        print("--- Conversion Report ---")
+        print(report.to_string(index=False))
+        print(f"Total: {report['Seconds'].sum():.2f}s, {report['BytesSaved'].sum() / 1e6:.1f} MB saved")
         print("--- Updated Dtypes---")
         print(data.info())
+        return report
 
-    def check_missing_values(self, data):
+    def check_missing_values(self, data, plan=None):
         """
         Check missing values in each column.
         Returns a DataFrame with missing values count and percentage for each column.
+        With a plan from fit_missing_values the counts it recorded are reused instead of
+        scanning data again.
         """
-        missing_count = data.isna().sum()
-        missing_percent = (missing_count / len(data) * 100).round(2)
+        if plan is not None:
+            missing_count = pd.Series(plan["missing_counts"], dtype='int64')
+            n_rows = plan["n_rows"]
+        else:
+            missing_count = data.isna().sum()
+            n_rows = len(data)
+        missing_percent = (missing_count / n_rows * 100).round(2)
         missing_df = pd.DataFrame({
             "MissingCount": missing_count,
             "MissingPercent": missing_percent
@@ -104,45 +210,93 @@ class PreprocessData:
 
         return missing_df.sort_values(by="MissingPercent", ascending=False)
 
-    def handle_missing_values(self, data):
+    def fit_missing_values(self, data):
         """
-        Performs comprehensive missing value cleaning, including previously remaining columns.
+        Computes the fill values used by handle_missing_values without modifying data.
+        Returns a plan dict that apply_missing_values can reuse on new batches (e.g. at scoring time).
+
+        data may be a DataFrame or an iterable of chunks (e.g. DataLoader.load_data(...,
+        chunksize=...)); each chunk is scanned once for missing counts and the value counts
+        behind the modes and medians, which are merged so the fill values stay exact.
+        The plan also records the per-column missing counts and the number of rows.
         """
-        
-        #  Drop columns with >99% missing values 
-        drop_cols = ['NumberOfVehiclesInFleet', 'CrossBorder', 'CustomValueEstimate']
-        data = data.drop(columns=[col for col in drop_cols if col in data.columns], errors='ignore')
-        
-        #  Fill high-risk vehicle flags with 'No' and add missing flags
-        risk_flags = ['WrittenOff', 'Rebuilt', 'Converted']
-        for col in risk_flags:
-            if col in data.columns:
-                data[col+'_missing_flag'] = data[col].isna().astype(int)  # Optional predictive flag
-                data[col] = data[col].fillna('No')
-        
-        #  Fill moderate-missing categorical columns with 'Missing' or mode 
-        cat_to_impute = ['NewVehicle', 'Bank', 'AccountType', 'Gender', 'MaritalStatus',
-                        'mmcode', 'VehicleType', 'make', 'Model', 'bodytype']
-        for col in cat_to_impute:
-            if col in data.columns:
-                if data[col].dtype.name == 'category':
-                    if 'Missing' not in data[col].cat.categories:
-                        data[col] = data[col].cat.add_categories('Missing')
-                if data[col].dtype.name in ['category', 'object']:
-                    data[col] = data[col].fillna('Missing')
-                else:
-                    data[col] = data[col].fillna(data[col].mode()[0])
-        
-        #  Fill numeric columns with median 
-        num_to_impute = ['CapitalOutstanding', 'Cylinders', 'cubiccapacity', 'kilowatts', 'NumberOfDoors']
-        for col in num_to_impute:
-            if col in data.columns:
-                data[col] = data[col].fillna(data[col].median())
-        
-        #  Handle remaining date columns 
-        if 'VehicleIntroDate' in data.columns:
-            # Drop if age is already calculated; otherwise, fill with fallback
-            data = data.drop(columns=['VehicleIntroDate'], errors='ignore')
-        
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        columns, text_cols = None, set()
+        n_rows, missing_counts, value_counts = 0, None, {}
+        mode_cols = median_cols = []
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.columns)
+                text_cols = {col for col in CAT_IMPUTE_COLS if col in chunk.columns and _is_text(chunk[col].dtype)}
+                mode_cols = [col for col in CAT_IMPUTE_COLS if col in chunk.columns and col not in text_cols]
+                median_cols = [col for col in NUM_IMPUTE_COLS if col in chunk.columns]
+            n_rows += len(chunk)
+            counts = chunk.isna().sum()
+            missing_counts = counts if missing_counts is None else missing_counts.add(counts, fill_value=0)
+            for col in mode_cols + median_cols:
+                counts = chunk[col].value_counts(dropna=True)
+                value_counts[col] = counts if col not in value_counts else value_counts[col].add(counts, fill_value=0)
+        if columns is None:
+            raise ValueError("No data to fit the missing-value plan on.")
+
+        fill_values = {}
+
+        #  High-risk vehicle flags are filled with 'No'
+        flag_cols = [col for col in RISK_FLAG_COLS if col in columns]
+        fill_values.update({col: 'No' for col in flag_cols})
+
+        #  Moderate-missing categorical columns get 'Missing', numeric ones their mode
+        for col in CAT_IMPUTE_COLS:
+            if col in text_cols:
+                fill_values[col] = 'Missing'
+            elif col in mode_cols:
+                fill_values[col] = _mode_from_counts(value_counts[col])
+
+        #  Numeric columns get their median
+        for col in median_cols:
+            fill_values[col] = _median_from_counts(value_counts[col])
+
+        return {
+            "drop_cols": [col for col in DROP_COLS if col in columns],
+            "flag_cols": flag_cols,
+            "fill_values": fill_values,
+            "drop_after": [col for col in DROP_AFTER_COLS if col in columns],
+            "missing_counts": missing_counts.astype('int64').to_dict(),
+            "n_rows": n_rows,
+        }
+
+    def apply_missing_values(self, data, plan, inplace=False):
+        """
+        Applies a plan from fit_missing_values: drops, missing flags, then fills.
+        The missing mask is computed once for all planned columns and reused for the flags
+        and the fills; columns without gaps are not rewritten.
+        """
+        drop_cols = [col for col in plan["drop_cols"] + plan["drop_after"] if col in data.columns]
+        if inplace:
+            data.drop(columns=drop_cols, inplace=True)
+        else:
+            data = data.drop(columns=drop_cols)
+
+        flag_cols = [col for col in plan["flag_cols"] if col in data.columns]
+        fill_cols = [col for col in plan["fill_values"] if col in data.columns]
+        missing = data[list(dict.fromkeys(flag_cols + fill_cols))].isna()
+
+        updates = {col + '_missing_flag': missing[col].astype(int) for col in flag_cols}  # Optional predictive flag
+        for col in fill_cols:
+            filled = _fill_missing(data[col], plan["fill_values"][col], missing[col].to_numpy())
+            if filled is not None:
+                updates[col] = filled
+
+        if updates:
+            # One bulk assignment instead of a column insert per update
+            data[list(updates)] = pd.DataFrame(updates, index=data.index)
         return data
 
+    def handle_missing_values(self, data, inplace=False):
+        """
+        Performs comprehensive missing value cleaning, including previously remaining columns.
+        With inplace=True the given frame is cleaned in place instead of via a dropped copy.
+        The fitted fill values are kept in self.missing_value_plan.
+        """
+        self.missing_value_plan = self.fit_missing_values(data)
+        return self.apply_missing_values(data, self.missing_value_plan, inplace=inplace)
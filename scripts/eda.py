@@ -1,16 +1,36 @@
+import warnings
+
 import pandas as pd
+from aggregation import segment_sums, zip_month_panel, top_zipcodes, zip_spearman
+from sketches import NumericProfiler
+from sampling import weights_of
 
 class ExploratoryDataAnalysis:
     """
     class for Exploratory Data Analysis.
+
+    On a stratified sample (DataLoader.load_sample) the loss ratio and bivariate summaries
+    apply the SampleWeight column, so they estimate the full portfolio; weight_col names
+    another weight column.
     """
-    def __init__(self, data):
+    def __init__(self, data, weight_col=None):
         self.data = data
+        self.weight_col = weights_of(data, weight_col) if data is not None else weight_col
 
-    def descriptive_statistics(self, numerical_cols):
+    def descriptive_statistics(self, numerical_cols, approximate=False, relative_accuracy=0.01, chunksize=100_000):
         """
         Returns standard data.describe() and a variability table with mean, median, std, and CV.
+
+        approximate=True builds them in one pass from mergeable sketches (quantiles within
+        relative_accuracy, exact count/mean/std/min/max), chunksize rows at a time; for
+        extracts that do not fit in memory use sketches.NumericProfiler over loader chunks.
         """
+        if approximate:
+            profiler = NumericProfiler(numerical_cols, relative_accuracy)
+            for start in range(0, len(self.data), chunksize):
+                profiler.update(self.data.iloc[start:start + chunksize])
+            return profiler.describe().round(2), profiler.variability().round(2)
+
         desc = self.data[numerical_cols].describe().round(2)
         
         # Variability: mean, median, std
@@ -23,32 +43,52 @@ class ExploratoryDataAnalysis:
         
         return desc, variability
 
-    def calculate_loss_ratios(self, segment_cols):
+    def calculate_loss_ratios(self, segment_cols, by_month=False, n_jobs=None, backend='thread',
+                              store=None, start=None, end=None):
+        """
+        Returns the overall loss ratio and per-segment premium, claims and loss ratio.
+        Segments are aggregated in parallel (see aggregation.segment_sums); by_month=True
+        adds (col, 'TransactionMonth') breakdowns. With a kpi_store.KPIStore the figures
+        for the months between start and end are read from the store instead of the rows.
+        Segments missing from the data (or the store) are skipped with a warning.
+        """
+        if store is not None:
+            return store.loss_ratios(segment_cols, start, end, by_month=by_month)
         data = self.data
+        missing = [col for col in segment_cols if col not in data.columns]
+        if missing:
+            warnings.warn(f"Skipping segments not in the data: {missing}")
         results = {}
 
-        overall_lr = data['TotalClaims'].sum() / data['TotalPremium'].sum()
+        weights = data[self.weight_col] if self.weight_col else 1
+        overall_lr = (data['TotalClaims'] * weights).sum() / (data['TotalPremium'] * weights).sum()
         results['overall'] = overall_lr
 
-        for col in segment_cols:
-            if col in data.columns:
-                segment = data.groupby(col, observed=True).agg(
-                    TotalPremium=('TotalPremium', 'sum'),
-                    TotalClaims=('TotalClaims', 'sum')
-                )
-                segment['LossRatio'] = segment['TotalClaims'] / segment['TotalPremium']
-                results[col] = segment
+        segments = segment_sums(data, segment_cols, by_month=by_month, n_jobs=n_jobs, backend=backend,
+                                weight_col=self.weight_col)
+        for key, segment in segments.items():
+            results[key] = segment[['TotalPremium', 'TotalClaims', 'LossRatio']]
 
         return results
 
-    def bivariate_analysis(self):
+    def bivariate_analysis(self, top_n=5, store=None, start=None, end=None, panel=None):
         """
         Produces bivariate/trend-focused summaries:
         - Monthly total premiums, claims, and loss ratios
         - Average claim severity per vehicle make
-        - Spearman correlation of monthly premium vs claims in top ZIP codes
+        - Spearman correlation of monthly premium vs claims in top_n ZIP codes
+
+        With a kpi_store.KPIStore (holding 'make' and 'PostalCode' segments) the summaries
+        for the months between start and end are read from the store instead of the rows.
+        The ZIP x month panel is returned as 'zip_panel'; pass it back as panel= (or to the
+        EDAPlots ZIP plots) to skip rebuilding it while the data is unchanged.
         """
+        if store is not None:
+            return self._bivariate_from_store(store, top_n, start, end)
         data = self.data
+        if self.weight_col:
+            weights = data[self.weight_col]
+            data = data.assign(TotalPremium=data['TotalPremium'] * weights, TotalClaims=data['TotalClaims'] * weights)
 
         # Monthly totals
         monthly = data.groupby('TransactionMonth').agg(
@@ -57,29 +97,41 @@ class ExploratoryDataAnalysis:
         )
         monthly['LossRatio'] = monthly['TotalClaims'] / monthly['TotalPremium']
 
-        # Claim severity per make
+        # Claim severity per make (weighted claims over weighted claim counts)
+        claims = data[data['TotalClaims'] > 0]
         make_severity = (
-            data[data['TotalClaims'] > 0]
-            .groupby('make')['TotalClaims']
-            .mean()
-            .sort_values(ascending=False)
-        )
+            claims.groupby('make')['TotalClaims'].sum()
+            / (claims.groupby('make')[self.weight_col].sum() if self.weight_col else claims.groupby('make').size())
+        ).dropna().sort_values(ascending=False).rename('TotalClaims')
+
+        # Correlations by top ZIP codes, from the ZIP x month panel
+        if panel is None:
+            panel = zip_month_panel(self.data, weight_col=self.weight_col)
+        correlations = zip_spearman(panel, top_zipcodes(panel, top_n))
 
-        # Correlations by top ZIP codes
-        top_zips = data['PostalCode'].value_counts().nlargest(5).index
-        correlations = {}
+        return {
+            "monthly_summary": monthly,
+            "make_severity": make_severity,
+            "zip_correlations": correlations,
+            "zip_panel": panel
+        }
 
-        for z in top_zips:
-            zip_data = data[data['PostalCode'] == z]
-            m = zip_data.groupby('TransactionMonth').agg(
-                P=('TotalPremium', 'sum'),
-                C=('TotalClaims', 'sum')
-            )
-            if len(m) > 1:
-                correlations[z] = m['P'].corr(m['C'], method='spearman')
+    def _bivariate_from_store(self, store, top_n, start, end):
+        monthly = store.query(None, start, end, by_month=True)[['TotalPremium', 'TotalClaims', 'LossRatio']]
+        make_severity = (
+            store.query('make', start, end)['ClaimSeverity']
+            .dropna()
+            .rename('TotalClaims')
+            .sort_values(ascending=False)
+        )
+        # Same columns as aggregation.zip_month_panel
+        panel = store.query('PostalCode', start, end, by_month=True)[['TotalPremium', 'TotalClaims', 'PolicyCount',
+                                                                      'LossRatio']]
+        correlations = zip_spearman(panel, top_zipcodes(panel, top_n))
 
         return {
             "monthly_summary": monthly,
             "make_severity": make_severity,
-            "zip_correlations": pd.Series(correlations)
-        }
\ No newline at end of file
+            "zip_correlations": correlations,
+            "zip_panel": panel
+        }
@@ -1,7 +1,122 @@
 import pandas as pd
 import numpy as np
+import joblib
+import scipy.sparse as sp
 from sklearn.model_selection import train_test_split
+from utils import frame_memory
+from data_preprocessing import PreprocessData
+from profiling import profile_methods
+from sampling import WEIGHT_COL
 
+# Columns kept out of the sparse design matrix (stored in FeatureEngineering.targets instead)
+TARGET_COLS = ['HasClaim', 'TotalClaims']
+DATE_COLS = ['TransactionMonth', 'VehicleIntroDate']
+
+
+def reference_year(df):
+    """Latest transaction year, used as 'today' for VehicleAge (2015 if dates are unavailable)."""
+    if 'TransactionMonth' in df.columns and pd.api.types.is_datetime64_any_dtype(df['TransactionMonth']):
+        return df['TransactionMonth'].dt.year.max()
+    return 2015  # fallback if no datetime
+
+
+def derive_features(df, current_year):
+    """Returns the narrow frame of derived columns (HasClaim, VehicleAge) for df."""
+    derived = pd.DataFrame(index=df.index)
+
+    # Binary Target for Claim Frequency
+    if 'TotalClaims' in df.columns:
+        derived['HasClaim'] = (df['TotalClaims'] > 0).astype(int)
+
+    #  Vehicle Age
+    if 'RegistrationYear' in df.columns:
+        derived['VehicleAge'] = current_year - df['RegistrationYear']
+    return derived
+
+
+def _is_categorical(series):
+    return series.dtype.name in ('category', 'object') or pd.api.types.is_string_dtype(series.dtype)
+
+
+def build_vocabulary(series, min_frequency=None, hash_buckets=None):
+    """
+    Fits the one-hot vocabulary of one categorical column.
+    Levels seen fewer than min_frequency times share an '<col>_other' column; columns with more
+    than hash_buckets levels are hashed into hash_buckets columns instead of one per level.
+    """
+    counts = series.value_counts(dropna=True)
+    counts = counts[counts > 0]
+    if hash_buckets and len(counts) > hash_buckets:
+        return {'levels': None, 'other': False, 'hash_buckets': int(hash_buckets)}
+    levels = counts.index
+    other = False
+    if min_frequency:
+        other = bool((counts < min_frequency).any())
+        levels = counts.index[counts >= min_frequency]
+    return {'levels': pd.Index(sorted(levels, key=str)), 'other': other, 'hash_buckets': None}
+
+
+def vocabulary_feature_names(col, vocab):
+    """Column names produced by a fitted vocabulary."""
+    if vocab['hash_buckets']:
+        return [f"{col}_hash{k}" for k in range(vocab['hash_buckets'])]
+    names = [f"{col}_{level}" for level in vocab['levels']]
+    return names + ([f"{col}_other"] if vocab['other'] else [])
+
+
+def feature_sources(feature_names, categorical_cols, numeric_cols=()):
+    """
+    Maps each encoded column to the original column it came from: numeric columns map to
+    themselves, one-hot/hash columns to their categorical column (longest matching prefix).
+    """
+    numeric_cols = set(numeric_cols)
+    prefixes = sorted(categorical_cols, key=len, reverse=True)
+    return {name: name if name in numeric_cols else next((col for col in prefixes if name.startswith(f"{col}_")), name)
+            for name in feature_names}
+
+
+def _level_codes(series, levels):
+    """Position of each value of series in levels; -1 for missing or unseen values."""
+    levels = pd.Index(levels)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Map the categories once; code -1 (missing) picks the trailing -1
+        lookup = np.append(levels.get_indexer(series.cat.categories), -1)
+        return lookup[series.cat.codes.to_numpy()]
+    return levels.get_indexer(series)
+
+
+def _vocabulary_codes(series, vocab):
+    """Column offsets (within the column's block) for each row; -1 for missing/unseen values."""
+    if vocab['hash_buckets']:
+        values = series.astype(object)
+        missing = values.isna().to_numpy()
+        hashed = pd.util.hash_array(values.astype(str).to_numpy(dtype=object)) % np.uint64(vocab['hash_buckets'])
+        return np.where(missing, -1, hashed.astype(np.int64))
+    codes = _level_codes(series, vocab['levels']).astype(np.int64)
+    if vocab['other']:
+        unseen = (codes < 0) & series.notna().to_numpy()
+        codes[unseen] = len(vocab['levels'])
+    return codes
+
+
+def encode_sparse(df, numeric_cols, vocabulary, dtype=np.float64):
+    """
+    Builds a CSR design matrix: numeric_cols as-is followed by the one-hot blocks of vocabulary.
+    The default float64 keeps large integer codes (e.g. mmcode) exact, as in the dense frame.
+    """
+    n_rows = len(df)
+    blocks = [sp.csr_matrix(df[numeric_cols].to_numpy(dtype=dtype))] if numeric_cols else []
+    for col, vocab in vocabulary.items():
+        width = len(vocabulary_feature_names(col, vocab))
+        codes = _vocabulary_codes(df[col], vocab)
+        rows = np.flatnonzero(codes >= 0)
+        block = sp.csr_matrix((np.ones(len(rows), dtype=dtype), (rows, codes[rows])), shape=(n_rows, width))
+        blocks.append(block)
+    if not blocks:
+        return sp.csr_matrix((n_rows, 0), dtype=dtype)
+    return sp.hstack(blocks, format='csr', dtype=dtype)
+
+@profile_methods
 class FeatureEngineering:
     """
     Handles feature creation, encoding, and preparation of modeling datasets 
@@ -9,50 +124,142 @@ class FeatureEngineering:
     Assumes the data is already cleaned and preprocessed.
     """
     
-    def __init__(self, data: pd.DataFrame):
-        self.data = data.copy()
-    
-    def create_features(self) -> pd.DataFrame:
+    def __init__(self, data: pd.DataFrame, copy: bool = True):
         """
-        Creates additional features and encodes categorical variables.
+        With copy=False the input frame is used as-is: no defensive copies are taken, derived
+        columns are built in a separate narrow frame, and the targets are moved (not copied)
+        out of the feature frame in prepare_modeling_data. memory_report lists the bytes each
+        step added. The SampleWeight column of a stratified sample is kept out of the features
+        (in self.sample_weight) and split alongside them in prepare_modeling_data.
         """
-        df = self.data.copy()
+        self.copy = copy
+        self.data = data.copy() if copy else data
+        self.targets = None
+        self.feature_names = None
+        self.vocabulary = None
+        self.feature_sources = None
+        self.sample_weight = None
+        self.sample_weights = None
+        self.memory_report = []
+        if copy:
+            self._record_memory('copy input', self.data)
 
-        # ---  Feature Creation ---
+    def _record_memory(self, step, *frames):
+        self.memory_report.append({'Step': step, 'AddedBytes': sum(frame_memory(f) for f in frames)})
 
-        # Binary Target for Claim Frequency
-        if 'TotalClaims' in df.columns:
-            df['HasClaim'] = (df['TotalClaims'] > 0).astype(int)
+    def create_features(self, encoding: str = 'dense', min_frequency: int = None, hash_buckets: int = None):
+        """
+        Creates additional features and encodes categorical variables.
 
-        #  Vehicle Age
-        if 'TransactionMonth' in df.columns and pd.api.types.is_datetime64_any_dtype(df['TransactionMonth']):
-            current_year = df['TransactionMonth'].dt.year.max()
-        else:
-            current_year = 2015  # fallback if no datetime
-        if 'RegistrationYear' in df.columns:
-            df['VehicleAge'] = current_year - df['RegistrationYear']
+        encoding='dense' returns the get_dummies frame. encoding='sparse' returns a scipy CSR
+        matrix (targets kept in self.targets, column names in self.feature_names, per-column
+        vocabularies in self.vocabulary); rare levels can be pooled with min_frequency and
+        high-cardinality columns hashed into hash_buckets columns. Either way self.feature_sources
+        maps every encoded column back to its original column.
+        """
+        if encoding not in ('dense', 'sparse'):
+            raise ValueError(f"Unknown encoding: {encoding}. Use 'dense' or 'sparse'.")
+        df = self.data.copy() if self.copy else self.data
+        if self.copy:
+            self._record_memory('create_features: copy', df)
+
+        # ---  Feature Creation ---
+        derived = derive_features(df, reference_year(df))
+        self._record_memory('create_features: derived columns', derived)
 
-        #  Drop original date columns after transformation
-        df = df.drop(columns=['TransactionMonth', 'VehicleIntroDate'], errors='ignore')
+        #  Drop original date columns after transformation, and sample weights (they encode HasClaim)
+        self.sample_weight = df[WEIGHT_COL] if WEIGHT_COL in df.columns else None
+        keep_cols = [col for col in df.columns if col not in DATE_COLS and col != WEIGHT_COL]
 
         # ---  Encoding Categorical Variables ---
-        categorical_cols = df.select_dtypes(include=['category', 'object']).columns.tolist()
-        df = pd.get_dummies(df, columns=categorical_cols, drop_first=True)
+        categorical_cols = [col for col in keep_cols if _is_categorical(df[col])]
+        other_cols = [col for col in keep_cols if col not in categorical_cols and col not in derived.columns]
+        if encoding == 'sparse':
+            return self._create_sparse_features(df, derived, categorical_cols, other_cols, min_frequency, hash_buckets)
+
+        dummies = pd.get_dummies(df[categorical_cols], drop_first=True)
+        self._record_memory('create_features: one-hot encoding', dummies)
 
+        df = pd.concat([df[other_cols], derived, dummies], axis=1)
+        self.feature_sources = feature_sources(df.columns, categorical_cols, other_cols + list(derived.columns))
         self.data = df
         return df
 
+    def _create_sparse_features(self, df, derived, categorical_cols, other_cols, min_frequency, hash_buckets):
+        base = pd.concat([df[other_cols], derived], axis=1)
+        self.targets = base[[col for col in TARGET_COLS if col in base.columns]]
+        numeric_cols = [col for col in base.columns if col not in TARGET_COLS]
+
+        self.vocabulary = {col: build_vocabulary(df[col], min_frequency, hash_buckets) for col in categorical_cols}
+        self.feature_names = numeric_cols + [name for col, vocab in self.vocabulary.items()
+                                             for name in vocabulary_feature_names(col, vocab)]
+        self.feature_sources = feature_sources(self.feature_names, categorical_cols, numeric_cols)
+        X = encode_sparse(pd.concat([base[numeric_cols], df[categorical_cols]], axis=1), numeric_cols, self.vocabulary)
+        self.memory_report.append({'Step': 'create_features: sparse encoding',
+                                   'AddedBytes': int(X.data.nbytes + X.indices.nbytes + X.indptr.nbytes)})
+        self.data = X
+        return X
+
+    def _prepare_sparse_modeling_data(self, target_freq, target_sev, test_size):
+        X = self.data
+        y_freq = self.targets[target_freq] if target_freq in self.targets.columns else None
+        y_sev = self.targets[target_sev] if target_sev in self.targets.columns else None
+
+        rows = np.arange(X.shape[0])
+        if y_freq is not None:
+            train_rows, test_rows = train_test_split(rows, test_size=test_size, random_state=42, stratify=y_freq)
+        else:
+            train_rows, test_rows = rows, rows
+        X_train_full, X_test_full = X[train_rows], X[test_rows]
+        y_freq_train = y_freq.iloc[train_rows] if y_freq is not None else None
+        y_freq_test = y_freq.iloc[test_rows] if y_freq is not None else None
+
+        if y_sev is not None:
+            y_sev_train_all, y_sev_test_all = y_sev.iloc[train_rows], y_sev.iloc[test_rows]
+            train_claims = (y_sev_train_all > 0).to_numpy()
+            test_claims = (y_sev_test_all > 0).to_numpy()
+            X_train_sev, y_sev_train = X_train_full[train_claims], y_sev_train_all[train_claims]
+            X_test_sev, y_sev_test = X_test_full[test_claims], y_sev_test_all[test_claims]
+        else:
+            X_train_sev, y_sev_train, X_test_sev, y_sev_test = None, None, None, None
+
+        if self.sample_weight is not None:
+            weight_train, weight_test = self.sample_weight.iloc[train_rows], self.sample_weight.iloc[test_rows]
+            self.sample_weights = (weight_train, weight_test,
+                                   weight_train[train_claims] if y_sev is not None else None,
+                                   weight_test[test_claims] if y_sev is not None else None)
+
+        return (X_train_full, X_test_full, y_freq_train, y_freq_test,
+                X_train_sev, y_sev_train, X_test_sev, y_sev_test)
+
     def prepare_modeling_data(self, target_freq: str = 'HasClaim', target_sev: str = 'TotalClaims', test_size: float = 0.2):
         """
         Splits data into training and test sets for frequency and severity modeling.
         Returns:
             X_train_full, X_test_full, y_freq_train, y_freq_test,
             X_train_sev, y_sev_train, X_test_sev, y_sev_test
+        With sparse features the X outputs are CSR matrices (columns in self.feature_names).
+        For a weighted sample, self.sample_weights holds the matching weights
+        (train_full, test_full, train_sev, test_sev), e.g. for ModelTrainer(sample_weight=...).
         """
-        df = self.data.copy()
-        X = df.drop(columns=[target_freq, target_sev], errors='ignore')
-        y_freq = df[target_freq] if target_freq in df.columns else None
-        y_sev = df[target_sev] if target_sev in df.columns else None
+        if sp.issparse(self.data):
+            return self._prepare_sparse_modeling_data(target_freq, target_sev, test_size)
+        if self.copy:
+            df = self.data.copy()
+            X = df.drop(columns=[target_freq, target_sev], errors='ignore')
+            y_freq = df[target_freq] if target_freq in df.columns else None
+            y_sev = df[target_sev] if target_sev in df.columns else None
+            self._record_memory('prepare_modeling_data: copy', df)
+        else:
+            # Move the targets out of the feature frame instead of copying it without them
+            targets = self.targets if self.targets is not None else pd.DataFrame(index=self.data.index)
+            for col in (target_freq, target_sev):
+                if col in self.data.columns:
+                    targets[col] = self.data.pop(col)
+            self.targets = targets
+            X = self.data
+            y_freq = targets[target_freq] if target_freq in targets.columns else None
+            y_sev = targets[target_sev] if target_sev in targets.columns else None
 
         # --- 1. Train-Test Split for Frequency ---
         if y_freq is not None:
@@ -76,5 +283,114 @@ class FeatureEngineering:
         else:
             X_train_sev, y_sev_train, X_test_sev, y_sev_test = None, None, None, None
 
+        if self.sample_weight is not None:
+            self.sample_weights = tuple(self.sample_weight.loc[X.index] if X is not None else None
+                                        for X in (X_train_full, X_test_full, X_train_sev, X_test_sev))
+
         return (X_train_full, X_test_full, y_freq_train, y_freq_test,
                 X_train_sev, y_sev_train, X_test_sev, y_sev_test)
+
+
+class FeaturePipeline:
+    """
+    Fitted, reusable preprocessing + feature state for scoring new policy batches.
+
+    fit() captures the missing-value plan of PreprocessData.handle_missing_values, the
+    reference year for VehicleAge and the categorical vocabularies; transform() then maps any
+    raw (typed) batch onto exactly the training column layout in one pass. The fitted
+    pipeline can be saved with save() and restored with FeaturePipeline.load().
+    """
+
+    def __init__(self, encoding: str = 'dense', min_frequency: int = None, hash_buckets: int = None):
+        if encoding not in ('dense', 'sparse'):
+            raise ValueError(f"Unknown encoding: {encoding}. Use 'dense' or 'sparse'.")
+        self.encoding = encoding
+        self.min_frequency = min_frequency
+        self.hash_buckets = hash_buckets
+        self.missing_value_plan = None
+        self.reference_year = None
+        self.numeric_cols = None
+        self.vocabulary = None
+        self.feature_names = None
+        self.feature_sources = None
+
+    def fit(self, data: pd.DataFrame):
+        """Fits imputation values, reference year and vocabularies on raw (typed) data."""
+        preprocess = PreprocessData(data)
+        self.missing_value_plan = preprocess.fit_missing_values(data)
+        self.reference_year = reference_year(data)
+
+        df = preprocess.apply_missing_values(data, self.missing_value_plan)
+        derived = derive_features(df, self.reference_year)
+        keep_cols = [col for col in df.columns if col not in DATE_COLS and col not in TARGET_COLS and col != WEIGHT_COL]
+        categorical_cols = [col for col in keep_cols if _is_categorical(df[col])]
+        self.numeric_cols = ([col for col in keep_cols if col not in categorical_cols and col not in derived.columns]
+                             + [col for col in derived.columns if col not in TARGET_COLS])
+
+        if self.encoding == 'sparse':
+            self.vocabulary = {col: build_vocabulary(df[col], self.min_frequency, self.hash_buckets)
+                               for col in categorical_cols}
+            self.feature_names = self.numeric_cols + [name for col, vocab in self.vocabulary.items()
+                                                      for name in vocabulary_feature_names(col, vocab)]
+        else:
+            # Same levels get_dummies would see, so the layout matches create_features()
+            self.vocabulary = {col: (df[col].cat.categories if df[col].dtype.name == 'category'
+                                     else pd.Index(sorted(df[col].dropna().unique())))
+                               for col in categorical_cols}
+            self.feature_names = self.numeric_cols + [f"{col}_{level}" for col, levels in self.vocabulary.items()
+                                                      for level in levels[1:]]
+        self.feature_sources = feature_sources(self.feature_names, categorical_cols, self.numeric_cols)
+        return self
+
+    def _check_fitted(self):
+        if self.feature_names is None:
+            raise RuntimeError("FeaturePipeline is not fitted yet.")
+
+    def _prepare(self, data):
+        df = PreprocessData(data).apply_missing_values(data, self.missing_value_plan)
+        derived = derive_features(df, self.reference_year)
+        base = df.drop(columns=[col for col in derived.columns if col in df.columns])
+        return pd.concat([base, derived], axis=1)
+
+    def transform(self, data: pd.DataFrame):
+        """
+        Returns the design matrix for data in the fitted column layout: a DataFrame with
+        columns feature_names (dense) or a CSR matrix (sparse). Unseen levels encode as zeros.
+        """
+        self._check_fitted()
+        df = self._prepare(data)
+        numeric = df.reindex(columns=self.numeric_cols)
+
+        if self.encoding == 'sparse':
+            categorical = df.reindex(columns=list(self.vocabulary))
+            return encode_sparse(pd.concat([numeric, categorical], axis=1), self.numeric_cols, self.vocabulary)
+
+        blocks = [numeric]
+        for col, levels in self.vocabulary.items():
+            values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+            codes = _level_codes(values, levels)
+            onehot = codes[:, None] == np.arange(1, len(levels))[None, :]
+            blocks.append(pd.DataFrame(onehot, index=df.index, columns=[f"{col}_{level}" for level in levels[1:]]))
+        return pd.concat(blocks, axis=1)
+
+    def fit_transform(self, data: pd.DataFrame):
+        return self.fit(data).transform(data)
+
+    def extract_targets(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Returns the HasClaim/TotalClaims targets available in data."""
+        targets = derive_features(data, self.reference_year or reference_year(data))
+        if 'TotalClaims' in data.columns:
+            targets['TotalClaims'] = data['TotalClaims']
+        return targets[[col for col in TARGET_COLS if col in targets.columns]]
+
+    def save(self, path):
+        """Serializes the fitted pipeline to disk."""
+        self._check_fitted()
+        joblib.dump(self, path)
+
+    @classmethod
+    def load(cls, path):
+        pipeline = joblib.load(path)
+        if not isinstance(pipeline, cls):
+            raise TypeError(f"{path} does not contain a {cls.__name__}.")
+        return pipeline
@@ -1,42 +1,305 @@
 # scripts/feature_importance.py - ENHANCED for model type handling
 
+import hashlib
+import pickle
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import shap
 import numpy as np
+import scipy.sparse as sp
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+from profiling import profile_methods
+
+# Number of shap_summary results kept in memory (least recently used are evicted)
+SHAP_CACHE_SIZE = 4
+
+# (model hash, data hash, options) -> (importance frame, shap values, sampled rows)
+_SHAP_CACHE = OrderedDict()
+_WORKER_EXPLAINER = {}
+
+
+def model_hash(model):
+    """Content hash of a fitted model (XGBoost boosters hash their raw bytes)."""
+    if hasattr(model, 'get_booster'):
+        payload = bytes(model.get_booster().save_raw())
+    else:
+        payload = pickle.dumps(model)
+    return hashlib.sha1(payload).hexdigest()
+
+
+def data_hash(X):
+    """Content hash of a DataFrame, ndarray or sparse matrix."""
+    h = hashlib.sha1()
+    if isinstance(X, pd.DataFrame):
+        h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+        h.update(','.join(map(str, X.columns)).encode())
+    elif sp.issparse(X):
+        X = X.tocsr()
+        for part in (X.data, X.indices, X.indptr):
+            h.update(np.ascontiguousarray(part).tobytes())
+    else:
+        h.update(np.ascontiguousarray(X).tobytes())
+    h.update(str(X.shape).encode())
+    return h.hexdigest()
+
+
+def clear_shap_cache():
+    """Drops every cached shap_summary result."""
+    _SHAP_CACHE.clear()
+
+
+def _take_rows(X, rows):
+    return X.iloc[rows] if hasattr(X, 'iloc') else X[rows]
+
+
+def _to_dense(X):
+    if sp.issparse(X):
+        return X.toarray()
+    return X.to_numpy(dtype=float) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=float)
+
+
+def _batch_rows(X):
+    """
+    X (DataFrame, ndarray, 1-D row or sparse matrix) as float32 rows: a sorted CSR copy for
+    sparse input (explicit zeros kept, since XGBoost reads them as values and absent entries
+    as missing), otherwise a 2-D array.
+    """
+    if sp.issparse(X):
+        X = sp.csr_matrix(X, dtype=np.float32, copy=True)
+        X.sort_indices()
+        return X
+    X = _to_dense(X).astype(np.float32, copy=False)
+    return X[None, :] if X.ndim == 1 else X
+
+
+def _row_keys(X):
+    """
+    One hashable key per row of a _batch_rows matrix. Sparse keys hold the stored column
+    indices and values, so an absent entry and an explicit zero give different keys.
+    """
+    if not sp.issparse(X):
+        return [b'd' + row.tobytes() for row in X]
+    indices, data = X.indices.astype(np.int32, copy=False), X.data
+    return [b's' + indices[a:b].tobytes() + data[a:b].tobytes() for a, b in zip(X.indptr[:-1], X.indptr[1:])]
+
+
+def _positive_class(shap_values):
+    # If classification model, use SHAP values for the positive class (index 1)
+    if isinstance(shap_values, list) and len(shap_values) > 1:
+        return shap_values[1]
+    if getattr(shap_values, 'ndim', 2) == 3:
+        return shap_values[:, :, 1]
+    return shap_values
+
+
+def _init_tree_worker(model):
+    _WORKER_EXPLAINER['explainer'] = shap.TreeExplainer(model)
+
+
+def _tree_shap_chunk(X_chunk):
+    return _positive_class(_WORKER_EXPLAINER['explainer'].shap_values(X_chunk))
 
+
+@profile_methods
 class FeatureInterpreter:
-    def __init__(self, model, X_test):
+    def __init__(self, model, X_test, feature_names=None):
         self.model = model
         self.X_test = X_test
+        # Needed for sparse X_test (e.g. FeatureEngineering.feature_names)
+        if feature_names is None and not hasattr(X_test, 'columns'):
+            raise ValueError("feature_names are required when X_test has no columns (e.g. sparse matrices).")
+        self.feature_names = list(feature_names) if feature_names is not None else list(X_test.columns)
+        self.sample_rows = None
+
+    def _sample_rows(self, sample_size, stratify, random_state):
+        n_rows = self.X_test.shape[0]
+        if not sample_size or sample_size >= n_rows:
+            return np.arange(n_rows)
+        rows, _ = train_test_split(np.arange(n_rows), train_size=sample_size, random_state=random_state,
+                                   stratify=np.asarray(stratify) if stratify is not None else None)
+        return np.sort(rows)
 
-    def shap_summary(self, top_n=10):
-        
-        # Determine the appropriate explainer type
+    def _shap_values(self, X, background_size, n_jobs, random_state):
         model_name = type(self.model).__name__
-        if 'XGB' in model_name or 'RandomForest' in model_name:
-            explainer = shap.TreeExplainer(self.model)
-        elif 'Linear' in model_name or 'Logistic' in model_name:
-            # Use background data for Linear Explainer
-            explainer = shap.LinearExplainer(self.model, self.X_test) 
+        if 'XGB' in model_name:
+            # Native TreeSHAP: same contributions as shap.TreeExplainer, without the wrapper overhead
+            contribs = self.model.get_booster().predict(xgb.DMatrix(X), pred_contribs=True)
+            return contribs[:, :-1]
+        if 'RandomForest' in model_name:
+            if n_jobs and n_jobs > 1 and X.shape[0] > n_jobs:
+                chunks = [_take_rows(X, rows) for rows in np.array_split(np.arange(X.shape[0]), n_jobs)]
+                with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_tree_worker,
+                                         initargs=(self.model,)) as executor:
+                    return np.vstack(list(executor.map(_tree_shap_chunk, chunks)))
+            return _positive_class(shap.TreeExplainer(self.model).shap_values(X))
+        if 'Linear' in model_name or 'Logistic' in model_name:
+            # k-means summary of the test rows as background instead of the full X_test
+            dense = _to_dense(self.X_test if self.X_test.shape[0] <= 10 * background_size else
+                              _take_rows(self.X_test, np.random.default_rng(random_state).choice(
+                                  self.X_test.shape[0], 10 * background_size, replace=False)))
+            background = shap.kmeans(dense, min(background_size, len(dense))).data
+            explainer = shap.LinearExplainer(self.model, background)
+            return _positive_class(explainer.shap_values(_to_dense(X)))
+        explainer = shap.Explainer(self.model)
+        return _positive_class(explainer.shap_values(X))
+
+    def shap_summary(self, top_n=10, sample_size=None, stratify=None, background_size=100, n_jobs=1,
+                     plot=True, use_cache=True, random_state=42):
+        """
+        Mean |SHAP| feature importance on X_test (or a stratified sample of sample_size rows).
+
+        XGBoost models use the native pred_contribs path, RandomForest SHAP can be split over
+        n_jobs processes, and linear models use a k-means background of background_size rows.
+        plot=False skips the summary plot. The last SHAP_CACHE_SIZE results are cached per
+        model/data content and options (clear_shap_cache() drops them), so repeated calls are
+        free. Returns (top_n importance frame, SHAP values of the sampled rows).
+        """
+        key = None
+        if use_cache:
+            stratify_key = data_hash(np.asarray(stratify)) if stratify is not None else None
+            key = (model_hash(self.model), data_hash(self.X_test), sample_size, stratify_key, background_size, random_state)
+        if key is not None and key in _SHAP_CACHE:
+            feature_importance_df, shap_values, self.sample_rows = _SHAP_CACHE[key]
+            _SHAP_CACHE.move_to_end(key)
         else:
-            explainer = shap.Explainer(self.model)
-            
-        shap_values = explainer.shap_values(self.X_test)
-        
-        # If classification model, use SHAP values for the positive class (index 1)
-        if isinstance(shap_values, list) and len(shap_values) > 1:
-            shap_values = shap_values[1] 
-            
-        # Get Mean Absolute SHAP values for quantitative comparison
-        mean_abs_shap = np.abs(shap_values).mean(axis=0)
-        feature_importance_df = pd.DataFrame({
-            'Feature': self.X_test.columns,
-            'Mean_Abs_SHAP': mean_abs_shap
-        }).sort_values(by='Mean_Abs_SHAP', ascending=False)
-        
-        # Generate plot (will render in the notebook)
-        print(f"\n--- SHAP Feature Importance (Top {top_n}) ---")
-        shap.summary_plot(shap_values, self.X_test, max_display=top_n) 
-        
-        
-        return feature_importance_df.head(top_n), shap_values
\ No newline at end of file
+            self.sample_rows = self._sample_rows(sample_size, stratify, random_state)
+            X = _take_rows(self.X_test, self.sample_rows)
+            shap_values = self._shap_values(X, background_size, n_jobs, random_state)
+
+            # Get Mean Absolute SHAP values for quantitative comparison
+            mean_abs_shap = np.abs(shap_values).mean(axis=0)
+            feature_importance_df = pd.DataFrame({
+                'Feature': self.feature_names,
+                'Mean_Abs_SHAP': mean_abs_shap
+            }).sort_values(by='Mean_Abs_SHAP', ascending=False)
+            if key is not None and SHAP_CACHE_SIZE:
+                _SHAP_CACHE[key] = (feature_importance_df, shap_values, self.sample_rows)
+                while len(_SHAP_CACHE) > SHAP_CACHE_SIZE:
+                    _SHAP_CACHE.popitem(last=False)
+
+        if plot:
+            # Generate plot (will render in the notebook)
+            print(f"\n--- SHAP Feature Importance (Top {top_n}) ---")
+            X_plot = _take_rows(self.X_test, self.sample_rows)
+            if sp.issparse(X_plot):
+                X_plot = pd.DataFrame(X_plot.toarray(), columns=self.feature_names)
+            shap.summary_plot(shap_values, X_plot, max_display=top_n)
+
+        return feature_importance_df.head(top_n), shap_values
+
+
+class QuoteExplainer:
+    """
+    Per-quote explanations: the top contributing factors of individual encoded policy rows.
+
+    The explainer is built once (native pred_contribs for XGBoost, TreeExplainer for random
+    forests, LinearExplainer on a k-means background for linear models) and contributions
+    are summed back to the original columns through feature_sources, e.g.
+    FeatureEngineering.feature_sources or FeaturePipeline.feature_sources, so all one-hot
+    columns of a categorical count as one factor. Explanations are cached per feature
+    vector (up to cache_size rows) and calls slower than latency_budget_ms raise a warning.
+    """
+
+    def __init__(self, model, feature_names, feature_sources=None, background=None, background_size=100,
+                 latency_budget_ms=50.0, cache_size=10_000):
+        self.model = model
+        self.feature_names = list(feature_names)
+        feature_sources = feature_sources or {}
+        sources = [feature_sources.get(name, name) for name in self.feature_names]
+        self.sources = list(dict.fromkeys(sources))
+        # (n_features x n_sources) 0/1 matrix that sums encoded contributions per original column
+        codes = pd.Index(self.sources).get_indexer(sources)
+        self._source_matrix = sp.csr_matrix((np.ones(len(codes)), (np.arange(len(codes)), codes)),
+                                            shape=(len(self.feature_names), len(self.sources)))
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.last_latency_ms = None
+        self._explain_fn = self._build_explainer(background, background_size)
+
+    def _build_explainer(self, background, background_size):
+        model_name = type(self.model).__name__
+        if 'XGB' in model_name:
+            # Sparse rows go in as CSR so absent entries stay missing, as in predict()
+            booster = self.model.get_booster()
+            return lambda X: booster.predict(xgb.DMatrix(X, feature_names=booster.feature_names),
+                                             pred_contribs=True)[:, :-1]
+        if 'RandomForest' in model_name:
+            explainer = shap.TreeExplainer(self.model)
+            return lambda X: _positive_class(explainer.shap_values(_to_dense(X), check_additivity=False))
+        if 'Linear' in model_name or 'Logistic' in model_name:
+            if background is None:
+                raise ValueError("Linear models need background rows (e.g. a sample of X_train).")
+            dense = _to_dense(background)
+            explainer = shap.LinearExplainer(self.model, shap.kmeans(dense, min(background_size, len(dense))).data)
+            return lambda X: _positive_class(explainer.shap_values(_to_dense(X)))
+        raise ValueError(f"Unsupported model type for per-quote explanations: {model_name}")
+
+    def contributions(self, X):
+        """
+        Returns an (n_rows x n_sources) array of contributions per original column for
+        encoded rows X (DataFrame, ndarray or sparse matrix in the feature_names layout).
+        XGBoost models explain sparse X as sparse, so pass X in the form the model was trained on.
+        """
+        X = _batch_rows(X)
+        if X.shape[1] != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} features, got {X.shape[1]}.")
+
+        keys = _row_keys(X)
+        # First position of every row missing from the cache (duplicates are explained once)
+        first = {}
+        for i, key in enumerate(keys):
+            if key not in self._cache:
+                first.setdefault(key, i)
+        computed = {}
+        if first:
+            # Only the rows to explain are passed on (and densified, for the sklearn explainers)
+            rows = X[list(first.values())]
+            computed = dict(zip(first, np.asarray(self._explain_fn(rows)) @ self._source_matrix))
+
+        result = np.empty((X.shape[0], len(self.sources)))
+        for i, key in enumerate(keys):
+            if key in computed:
+                result[i] = computed[key]
+            else:
+                result[i] = self._cache[key]
+                self._cache.move_to_end(key)
+        if self.cache_size:
+            for key, values in computed.items():
+                self._cache[key] = values
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def explain(self, X, top_k=5):
+        """
+        Top top_k factors per row of X, ranked by |contribution|.
+        Returns a long frame with columns Row, Rank, Feature and Contribution.
+        """
+        start = time.perf_counter()
+        values = self.contributions(X)
+        top_k = min(top_k, values.shape[1])
+        order = np.argsort(-np.abs(values), axis=1, kind='stable')[:, :top_k]
+        rows = np.repeat(np.arange(len(values)), top_k)
+        explanation = pd.DataFrame({
+            'Row': rows,
+            'Rank': np.tile(np.arange(1, top_k + 1), len(values)),
+            'Feature': np.asarray(self.sources, dtype=object)[order.ravel()],
+            'Contribution': values[rows, order.ravel()],
+        })
+        if isinstance(X, pd.DataFrame):
+            explanation['Row'] = X.index[rows]
+
+        self.last_latency_ms = (time.perf_counter() - start) * 1000
+        if self.latency_budget_ms and self.last_latency_ms > self.latency_budget_ms:
+            warnings.warn(f"Explaining {len(values)} rows took {self.last_latency_ms:.1f}ms "
+                          f"(budget {self.latency_budget_ms:.0f}ms)", RuntimeWarning)
+        return explanation
+
+    def clear_cache(self):
+        self._cache.clear()
@@ -1,10 +1,66 @@
+from itertools import combinations
+
+import numpy as np
 import pandas as pd
-from scipy.stats import chi2_contingency, ttest_ind
+from scipy.stats import chi2, chi2_contingency, t as t_dist, ttest_ind
+from aggregation import factorize_segment
+from resampling import METRICS, TwoSampleResampler
+from utils import frame_memory
+from profiling import profile_methods
+
+
+def adjust_pvalues(p_values, method='fdr_bh'):
+    """
+    Multiple-comparison adjustment: 'bonferroni', 'holm', 'fdr_bh' (Benjamini-Hochberg) or None.
+    NaN p-values are left as NaN and do not count towards the number of tests.
+    """
+    p = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p, np.nan)
+    valid = ~np.isnan(p)
+    m = valid.sum()
+    if method is None or m == 0:
+        return p.copy()
 
+    pv = p[valid]
+    order = np.argsort(pv)
+    ranked = pv[order]
+    if method == 'bonferroni':
+        adj = np.minimum(pv * m, 1.0)
+    elif method == 'holm':
+        adj_sorted = np.minimum(np.maximum.accumulate(ranked * (m - np.arange(m))), 1.0)
+        adj = np.empty_like(pv)
+        adj[order] = adj_sorted
+    elif method == 'fdr_bh':
+        adj_sorted = ranked * m / np.arange(1, m + 1)
+        adj_sorted = np.minimum(np.minimum.accumulate(adj_sorted[::-1])[::-1], 1.0)
+        adj = np.empty_like(pv)
+        adj[order] = adj_sorted
+    else:
+        raise ValueError(f"Unknown correction method: {method}")
+    adjusted[valid] = adj
+    return adjusted
+
+@profile_methods
 class HypothesisTester:
-    def __init__(self, data):
-        self.data = data.copy()
+    def __init__(self, data, copy=True):
+        """
+        With copy=False the input frame is neither copied nor modified: KPI columns are kept
+        in the narrow self.derived frame and tests only materialise the columns they need.
+        """
+        self.copy = copy
+        self.data = data.copy() if copy else data
+        self.derived = pd.DataFrame(index=self.data.index)
         self.metrics_calculated = False  # Track if KPIs are ready
+        self.memory_report = []
+        if copy:
+            self.memory_report.append({"Step": "copy input", "AddedBytes": frame_memory(self.data)})
+
+    def _column(self, name):
+        return self.derived[name] if name in self.derived.columns else self.data[name]
+
+    def _frame(self, columns):
+        """Narrow frame with only the requested columns (input or derived)."""
+        return pd.DataFrame({col: self._column(col) for col in dict.fromkeys(columns)}, index=self.data.index)
 
     # METRICS / KPI CALCULATION
 
@@ -12,13 +68,22 @@ class HypothesisTester:
         """Create KPIs: ClaimOccurred, Claim Frequency, Claim Severity, Margin"""
 
         # KPI columns
-        self.data['ClaimOccurred'] = (self.data['TotalClaims'] > 0).astype(int)
-        self.data['Margin'] = self.data['TotalPremium'] - self.data['TotalClaims']
+        kpis = pd.DataFrame({
+            'ClaimOccurred': (self.data['TotalClaims'] > 0).astype(int),
+            'Margin': self.data['TotalPremium'] - self.data['TotalClaims']
+        }, index=self.data.index)
+        if self.copy:
+            self.data['ClaimOccurred'] = kpis['ClaimOccurred']
+            self.data['Margin'] = kpis['Margin']
+        else:
+            self.derived = kpis
+        self.memory_report.append({"Step": "calculate_metrics", "AddedBytes": frame_memory(kpis)})
 
         # Overall KPIs
-        claim_frequency = self.data['ClaimOccurred'].mean()
-        claim_severity = self.data.loc[self.data['ClaimOccurred'] == 1, 'TotalClaims'].mean() if self.data['ClaimOccurred'].sum() else 0
-        margin = self.data['Margin']
+        claim_occurred = kpis['ClaimOccurred']
+        claim_frequency = claim_occurred.mean()
+        claim_severity = self.data['TotalClaims'][claim_occurred == 1].mean() if claim_occurred.sum() else 0
+        margin = kpis['Margin']
         margin_mean = margin.mean()
 
         self.metrics_calculated = True
@@ -30,7 +95,7 @@ class HypothesisTester:
 
     # INTERNAL STAT TESTS
     def _chi_square(self, feature, data=None):
-        data = data if data is not None else self.data
+        data = data if data is not None else self._frame([feature, 'ClaimOccurred'])
         table = pd.crosstab(data[feature], data['ClaimOccurred'])
         chi2, p, _, _ = chi2_contingency(table)
         return {"Test": "Chi-Square (Claim Frequency)",
@@ -39,7 +104,7 @@ class HypothesisTester:
                 "Reject_H0": p < 0.05}
 
     def _t_test(self, feature, value_col, data=None):
-        data = data if data is not None else self.data
+        data = data if data is not None else self._frame([feature, value_col])
         groups = data[feature].dropna().unique()
         if len(groups) != 2:
             raise ValueError(f"T-test requires exactly 2 groups in '{feature}', found {len(groups)}")
@@ -55,6 +120,160 @@ class HypothesisTester:
                 "Reject_H0": p < 0.05}
 
 
+    def _group_moments(self, feature, value_cols):
+        """Per-group n, claim counts and (n, mean, variance) of each value column in one pass."""
+        codes, groups = factorize_segment(self.data[feature])
+        valid = codes >= 0
+        codes = codes[valid]
+        n_groups = len(groups)
+
+        moments = pd.DataFrame(index=groups)
+        moments['N'] = np.bincount(codes, minlength=n_groups)
+        claims = self._column('ClaimOccurred').to_numpy()[valid]
+        moments['Claims'] = np.bincount(codes, weights=claims, minlength=n_groups)
+        for col in value_cols:
+            values = self._column(col).to_numpy(dtype=float)[valid]
+            present = ~np.isnan(values)
+            # Shift by the overall mean so the sum-of-squares variance stays numerically stable
+            shift = values[present].mean() if present.any() else 0.0
+            centred = np.where(present, values - shift, 0.0)
+            n = np.bincount(codes, weights=present, minlength=n_groups)
+            total = np.bincount(codes, weights=centred, minlength=n_groups)
+            total_sq = np.bincount(codes, weights=centred ** 2, minlength=n_groups)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                moments[f'{col}_N'] = n
+                moments[f'{col}_Mean'] = total / n + shift
+                moments[f'{col}_Var'] = (total_sq - total ** 2 / n) / (n - 1)
+        return moments
+
+    def test_pairs(self, feature, pairs=None, value_cols=('Margin', 'TotalClaims'), top_n=None,
+                   alpha=0.05, correction='fdr_bh'):
+        """
+        Batch chi-square (claim frequency) and Welch t-tests (value_cols) for many group pairs.
+
+        Group counts and moments are built once per feature, then every pair is tested with
+        array operations. pairs is a list of (group_a, group_b); by default all pairs among the
+        top_n groups by volume (or all groups) are tested. P-values are adjusted per test type
+        with the given correction ('fdr_bh', 'holm', 'bonferroni' or None).
+        Returns one row per (pair, test).
+        """
+        if not self.metrics_calculated:
+            raise RuntimeError("Calculate metrics first.")
+        value_cols = list(value_cols)
+        moments = self._group_moments(feature, value_cols)
+        moments = moments[moments['N'] > 0]
+
+        if pairs is None:
+            groups = moments['N'].nlargest(top_n).index if top_n else moments.index
+            pairs = list(combinations(groups, 2))
+        if not pairs:
+            raise ValueError(f"No group pairs to test for '{feature}'.")
+        group_a, group_b = (pd.Index(side) for side in zip(*pairs))
+        ia, ib = moments.index.get_indexer(group_a), moments.index.get_indexer(group_b)
+        missing = [pair for pair, a, b in zip(pairs, ia, ib) if a < 0 or b < 0]
+        if missing:
+            raise ValueError(f"Groups not found in '{feature}': {missing[:5]}")
+        a, b = moments.iloc[ia], moments.iloc[ib]
+
+        base = pd.DataFrame({'Feature': feature, 'Group_1': group_a, 'Group_2': group_b,
+                             'N_1': a['N'].to_numpy(), 'N_2': b['N'].to_numpy()})
+        results = []
+
+        # 2x2 chi-square with Yates' continuity correction, as chi2_contingency applies for dof=1
+        observed = np.stack([a['N'].to_numpy() - a['Claims'].to_numpy(), a['Claims'].to_numpy(),
+                             b['N'].to_numpy() - b['Claims'].to_numpy(), b['Claims'].to_numpy()], axis=1).astype(float)
+        rows = observed[:, [0, 0, 2, 2]] + observed[:, [1, 1, 3, 3]]
+        cols = observed[:, [0, 1, 0, 1]] + observed[:, [2, 3, 2, 3]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = rows * cols / observed.sum(axis=1, keepdims=True)
+            diff = expected - observed
+            corrected = observed + np.sign(diff) * np.minimum(0.5, np.abs(diff))
+            stat = ((corrected - expected) ** 2 / expected).sum(axis=1)
+        stat[(expected == 0).any(axis=1)] = np.nan
+        chi_res = base.assign(Test="Chi-Square (Claim Frequency)", Statistic=stat, **{'P-Value': chi2.sf(stat, 1)},
+                              Group_1_Mean=a['Claims'].to_numpy() / a['N'].to_numpy(),
+                              Group_2_Mean=b['Claims'].to_numpy() / b['N'].to_numpy())
+        results.append(chi_res)
+
+        # Welch t-tests from the per-group moments
+        for col in value_cols:
+            n1, n2 = a[f'{col}_N'].to_numpy(), b[f'{col}_N'].to_numpy()
+            m1, m2 = a[f'{col}_Mean'].to_numpy(), b[f'{col}_Mean'].to_numpy()
+            v1, v2 = a[f'{col}_Var'].to_numpy() / n1, b[f'{col}_Var'].to_numpy() / n2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_stat = (m1 - m2) / np.sqrt(v1 + v2)
+                dof = (v1 + v2) ** 2 / (v1 ** 2 / (n1 - 1) + v2 ** 2 / (n2 - 1))
+            p = 2 * t_dist.sf(np.abs(t_stat), dof)
+            results.append(base.assign(Test=f"T-Test ({col})", Statistic=t_stat, **{'P-Value': p},
+                                       Group_1_Mean=m1, Group_2_Mean=m2))
+
+        for res in results:
+            res['Adjusted_P-Value'] = adjust_pvalues(res['P-Value'].to_numpy(), correction)
+            res['Reject_H0'] = res['Adjusted_P-Value'] < alpha
+        columns = ['Test', 'Feature', 'Group_1', 'Group_2', 'N_1', 'N_2', 'Group_1_Mean', 'Group_2_Mean',
+                   'Statistic', 'P-Value', 'Adjusted_P-Value', 'Reject_H0']
+        return pd.concat(results, ignore_index=True)[columns]
+
+    def _resampler(self, feature, group_a, group_b, metric, seed, n_jobs, max_batch_bytes):
+        if not self.metrics_calculated:
+            raise RuntimeError("Calculate metrics first.")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}. Use one of {list(METRICS)}.")
+        num_col, den_col, _ = METRICS[metric]
+        num = self._column(num_col).to_numpy(dtype=float)
+        den = self._column(den_col).to_numpy(dtype=float) if den_col else np.ones(len(num))
+        values = self._column(feature)
+        samples = []
+        for group in (group_a, group_b):
+            mask = (values == group).to_numpy() & ~np.isnan(num) & ~np.isnan(den)
+            if not mask.any():
+                raise ValueError(f"Group {group} not found in '{feature}'.")
+            samples += [num[mask], den[mask]]
+        return TwoSampleResampler(*samples, seed=seed, n_jobs=n_jobs, max_batch_bytes=max_batch_bytes)
+
+    def bootstrap_test(self, feature, group_a, group_b, metric='loss_ratio', n_resamples=10_000,
+                       confidence=0.95, seed=None, n_jobs=1, max_batch_bytes=256 * 2 ** 20):
+        """
+        Percentile bootstrap confidence interval for the difference in metric ('frequency',
+        'severity', 'margin' or 'loss_ratio') between group_a and group_b of feature.
+        H0 is rejected when the interval excludes 0. See resampling.TwoSampleResampler.
+        """
+        resampler = self._resampler(feature, group_a, group_b, metric, seed, n_jobs, max_batch_bytes)
+        res = resampler.bootstrap(n_resamples, confidence)
+        return self._interpret({"Test": f"Bootstrap ({METRICS[metric][2]})",
+                                "Feature": feature,
+                                "Groups": [group_a, group_b],
+                                "Group_1_Value": resampler.value_a,
+                                "Group_2_Value": resampler.value_b,
+                                "Difference": res['difference'],
+                                "CI_Lower": res['ci_lower'],
+                                "CI_Upper": res['ci_upper'],
+                                "Std_Error": res['std_error'],
+                                "P-Value": res['p_value'],
+                                "Reject_H0": not res['ci_lower'] <= 0 <= res['ci_upper'],
+                                "Resamples": res['resamples'],
+                                "Seed": resampler.seed})
+
+    def permutation_test(self, feature, group_a, group_b, metric='loss_ratio', n_resamples=10_000, alpha=0.05,
+                         early_stop=True, stop_confidence=0.99, seed=None, n_jobs=1, max_batch_bytes=256 * 2 ** 20):
+        """
+        Permutation p-value for the difference in metric between group_a and group_b of feature.
+        With early_stop, resampling ends once the p-value is clearly above or below alpha.
+        """
+        resampler = self._resampler(feature, group_a, group_b, metric, seed, n_jobs, max_batch_bytes)
+        res = resampler.permutation(n_resamples, alpha, early_stop, stop_confidence)
+        return self._interpret({"Test": f"Permutation ({METRICS[metric][2]})",
+                                "Feature": feature,
+                                "Groups": [group_a, group_b],
+                                "Group_1_Value": resampler.value_a,
+                                "Group_2_Value": resampler.value_b,
+                                "Difference": res['difference'],
+                                "P-Value": res['p_value'],
+                                "Reject_H0": res['p_value'] < alpha,
+                                "Resamples": res['resamples'],
+                                "Stopped_Early": res['stopped_early'],
+                                "Seed": resampler.seed})
+
     def _interpret(self, result):
         p = result["P-Value"]
         feat = result["Feature"]
@@ -72,19 +291,22 @@ class HypothesisTester:
     def test_zipcode_risk(self, zip_a, zip_b):
         if not self.metrics_calculated:
             raise RuntimeError("Calculate metrics first.")
-        data_zip = self.data[self.data["PostalCode"].isin([zip_a, zip_b])]
+        data = self._frame(["PostalCode", "ClaimOccurred"])
+        data_zip = data[data["PostalCode"].isin([zip_a, zip_b])]
         return self._interpret(self._chi_square("PostalCode", data=data_zip))
 
     def test_zipcode_margin(self, zip_a, zip_b):
         if not self.metrics_calculated:
             raise RuntimeError("Calculate metrics first.")
-        data_zip = self.data[self.data["PostalCode"].isin([zip_a, zip_b])]
+        data = self._frame(["PostalCode", "Margin"])
+        data_zip = data[data["PostalCode"].isin([zip_a, zip_b])]
         return self._interpret(self._t_test("PostalCode", "Margin", data=data_zip))
 
     def test_gender_risk(self):
         if not self.metrics_calculated:
             raise RuntimeError("Calculate metrics first.")
-        data_gender = self.data[self.data["Gender"].isin(["Male", "Female"])]
+        data = self._frame(["Gender", "ClaimOccurred", "TotalClaims"])
+        data_gender = data[data["Gender"].isin(["Male", "Female"])]
         freq_result = self._interpret(self._chi_square("Gender", data=data_gender))
         severity_result = self._interpret(self._t_test("Gender", "TotalClaims", data=data_gender))
         return freq_result, severity_result
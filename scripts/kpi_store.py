@@ -0,0 +1,188 @@
+"""
+Persisted, month-partitioned store of additive KPI sums.
+
+Each TransactionMonth slice is reduced once to the additive sums of aggregation.partial_sums
+(overall and per segment) and written as one small Parquet file per segment and month.
+Loss ratios, frequency, severity and margin for any month range or segment are then
+answered by summing those partitions, without touching raw rows, so a monthly refresh
+costs one month of data.
+"""
+
+import json
+import os
+import warnings
+
+import pandas as pd
+from aggregation import SUM_COLS, partial_sums, finalize_kpis, _segment_key
+
+OVERALL = 'overall'
+
+
+def _segment_name(segment):
+    key = _segment_key(segment)
+    return '+'.join(key) if isinstance(key, list) else key
+
+
+def _month_key(month):
+    return pd.Timestamp(month).strftime('%Y-%m')
+
+
+class KPIStore:
+    """
+    KPI store rooted at path: <path>/<segment>/<YYYY-MM>.parquet plus a manifest.json
+    recording the segments, the month column and the rows behind every stored month.
+    Segments are column names or tuples of column names; they are fixed when the store
+    is created and read back from the manifest afterwards.
+    """
+
+    def __init__(self, path, segment_cols=None, month_col='TransactionMonth'):
+        self.path = path
+        self.manifest_path = os.path.join(path, 'manifest.json')
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            self.segment_cols = [tuple(s) if isinstance(s, list) else s for s in manifest['segments']]
+            self.month_col = manifest['month_col']
+            self.manifest = manifest
+            if segment_cols is not None and [_segment_name(s) for s in segment_cols] != \
+                    [_segment_name(s) for s in self.segment_cols]:
+                raise ValueError(f"{path} was created for segments {self.segment_cols}.")
+        else:
+            self.segment_cols = list(segment_cols or [])
+            self.month_col = month_col
+            self.manifest = {'segments': self.segment_cols, 'month_col': month_col, 'months': {}}
+
+    def months(self):
+        """Stored months as sorted 'YYYY-MM' strings."""
+        return sorted(self.manifest['months'])
+
+    def _partition_path(self, segment, month):
+        return os.path.join(self.path, _segment_name(segment) if segment is not None else OVERALL, f"{month}.parquet")
+
+    def _write(self, sums, segment, month):
+        file_path = self._partition_path(segment, month)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = file_path + '.tmp'
+        sums.reset_index().to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+
+    def _save_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, default=list)
+        os.replace(tmp_path, self.manifest_path)
+
+    def append(self, data, replace=True):
+        """
+        Reduces the rows of data to monthly partial sums and writes one partition per month
+        and segment. replace=True makes re-appending a month idempotent (it is overwritten);
+        replace=False adds to what is stored, for months delivered in several pieces.
+        Returns the months written.
+        """
+        if self.month_col not in data.columns:
+            raise ValueError(f"Column {self.month_col} not found in data.")
+        months = pd.to_datetime(data[self.month_col]).dt.strftime('%Y-%m')
+        written = []
+        for month, rows in data.groupby(months, sort=True).groups.items():
+            chunk = data.loc[rows]
+            merge = not replace and month in self.manifest['months']
+            for segment in [None] + self.segment_cols:
+                sums = partial_sums(chunk, segment)
+                if segment is None:
+                    sums.index = pd.Index([OVERALL], name='Segment')
+                if merge:
+                    # add() upcasts the integer counts; keep the stored dtypes
+                    sums = sums.add(self._read(segment, month), fill_value=0).astype(sums.dtypes.to_dict())
+                self._write(sums, segment, month)
+            previous = self.manifest['months'].get(month, {}).get('rows', 0) if merge else 0
+            self.manifest['months'][month] = {'rows': previous + len(chunk)}
+            written.append(month)
+        self._save_manifest()
+        return written
+
+    def fit(self, chunks, replace_existing=True):
+        """
+        Appends a stream of chunks, e.g. DataLoader.load_data(..., typed=True, chunksize=...).
+        Months already in the store are replaced on their first appearance in the stream and
+        accumulated afterwards, so a month may span several chunks.
+        """
+        seen = set()
+        for chunk in chunks:
+            months = pd.to_datetime(chunk[self.month_col]).dt.strftime('%Y-%m')
+            fresh = months.isin(set(months.dropna()) - seen) if replace_existing else pd.Series(False, index=months.index)
+            if fresh.any():
+                self.append(chunk[fresh.to_numpy()])
+            if (~fresh).any():
+                self.append(chunk[(~fresh).to_numpy()], replace=False)
+            seen |= set(months.dropna())
+        return self
+
+    def _read(self, segment, month):
+        frame = pd.read_parquet(self._partition_path(segment, month))
+        key = _segment_key(segment) if segment is not None else 'Segment'
+        return frame.set_index(key)
+
+    def _select_months(self, start=None, end=None):
+        months = self.months()
+        if start is not None:
+            months = [m for m in months if m >= _month_key(start)]
+        if end is not None:
+            months = [m for m in months if m <= _month_key(end)]
+        return months
+
+    def sums(self, segment=None, start=None, end=None, by_month=False):
+        """
+        Additive sums over the stored months between start and end (inclusive, anything
+        pd.Timestamp accepts), for the portfolio (segment=None) or a stored segment.
+        by_month=True keeps the month as the last index level.
+        """
+        if segment is not None and _segment_name(segment) not in [_segment_name(s) for s in self.segment_cols]:
+            raise ValueError(f"Segment {segment} is not stored; available: {self.segment_cols}")
+        months = self._select_months(start, end)
+        if not months:
+            raise ValueError("No stored months in the requested range.")
+        frame = pd.concat([pd.read_parquet(self._partition_path(segment, month)).assign(
+            **{self.month_col: pd.Timestamp(month)}) for month in months], ignore_index=True)
+
+        key = _segment_key(segment) if segment is not None else []
+        key = key if isinstance(key, list) else [key]
+        group_cols = key + ([self.month_col] if by_month else [])
+        if not group_cols:
+            return frame[SUM_COLS].sum().to_frame(OVERALL).T
+        return frame.groupby(group_cols, sort=True)[SUM_COLS].sum()
+
+    def query(self, segment=None, start=None, end=None, by_month=False):
+        """
+        KPIs (see aggregation.finalize_kpis) over a month range: a Series for the portfolio,
+        a DataFrame per segment value (and month with by_month=True) otherwise.
+        """
+        kpis = finalize_kpis(self.sums(segment, start, end, by_month))
+        return kpis.iloc[0] if segment is None and not by_month else kpis
+
+    def loss_ratios(self, segment_cols, start=None, end=None, by_month=False):
+        """
+        Same layout as ExploratoryDataAnalysis.calculate_loss_ratios, answered from the store.
+        Segments that are not stored are skipped with a warning, as missing columns are there.
+        """
+        stored = [_segment_name(s) for s in self.segment_cols]
+        missing = [col for col in segment_cols if _segment_name(col) not in stored]
+        if missing:
+            warnings.warn(f"Skipping segments not in the store: {missing}")
+            segment_cols = [col for col in segment_cols if col not in missing]
+        overall = self.sums(None, start, end)
+        results = {'overall': overall['TotalClaims'].iloc[0] / overall['TotalPremium'].iloc[0]}
+        cols = ['TotalPremium', 'TotalClaims', 'LossRatio']
+        for col in segment_cols:
+            results[col] = self.query(col, start, end)[cols]
+        if by_month:
+            for col in segment_cols:
+                results[(col, self.month_col)] = self.query(col, start, end, by_month=True)[cols]
+        return results
+
+    def metrics(self, start=None, end=None):
+        """Portfolio KPIs in the layout of HypothesisTester.calculate_metrics."""
+        kpis = self.query(None, start, end)
+        return {"Claim Frequency": kpis['ClaimFrequency'],
+                "Claim Severity": kpis['ClaimSeverity'] if kpis['ClaimCount'] else 0,
+                "Average Margin": kpis['AverageMargin']}
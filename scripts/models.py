@@ -1,5 +1,9 @@
 # scripts/models.py - ENHANCED for Classification and Regression
 
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression, LogisticRegression
@@ -7,84 +11,457 @@ from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 import xgboost as xgb
 from sklearn.metrics import mean_squared_error, r2_score, \
                             roc_auc_score, f1_score, precision_score, recall_score, accuracy_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler, train_test_split, StratifiedKFold, \
+                                    GroupKFold, KFold
+from threadpoolctl import threadpool_limits
+from profiling import profile_methods
+
+# model name -> (task, estimator class, fixed/default parameters); names match the train_* methods
+MODEL_SPECS = {
+    'logistic_regression': ('classification', LogisticRegression,
+                            dict(solver='liblinear', random_state=42, max_iter=1000)),
+    'rf_classifier': ('classification', RandomForestClassifier,
+                      dict(n_estimators=200, max_depth=10, random_state=42, n_jobs=-1)),
+    'xgb_classifier': ('classification', xgb.XGBClassifier,
+                       dict(n_estimators=200, max_depth=6, learning_rate=0.1, use_label_encoder=False,
+                            eval_metric='logloss', random_state=42, n_jobs=-1)),
+    'linear_regression': ('regression', LinearRegression, dict()),
+    'random_forest': ('regression', RandomForestRegressor,
+                      dict(n_estimators=200, max_depth=10, random_state=42, n_jobs=-1)),
+    'xgboost': ('regression', xgb.XGBRegressor,
+                dict(n_estimators=200, max_depth=6, learning_rate=0.1, random_state=42, n_jobs=-1)),
+}
+
 
+def build_model(name, **params):
+    """Instantiates a MODEL_SPECS estimator with its defaults overridden by params."""
+    if name not in MODEL_SPECS:
+        raise ValueError(f"Unknown model: {name}. Choose from {list(MODEL_SPECS)}")
+    _, estimator_cls, defaults = MODEL_SPECS[name]
+    return estimator_cls(**{**defaults, **params})
+
+@profile_methods
 class ModelTrainer:
     """
     A class to train and evaluate models for both Regression (Severity) 
     and Classification (Frequency) tasks.
+    X_train/X_test may be DataFrames or the scipy CSR matrices produced by
+    FeatureEngineering.create_features(encoding='sparse'); the estimators consume them directly.
+    On a stratified sample, pass the row weights (FeatureEngineering.sample_weights) as
+    sample_weight (used in fitting) and test_weight (used in the evaluation metrics).
     """
-    def __init__(self, X_train, X_test, y_train, y_test):
+    def __init__(self, X_train, X_test, y_train, y_test, sample_weight=None, test_weight=None):
         self.X_train = X_train
         self.X_test = X_test
         self.y_train = y_train
         self.y_test = y_test
+        self.sample_weight = sample_weight
+        self.test_weight = test_weight
         
     # --- Classification Training Methods ---
     
     def train_logistic_regression(self):
-        self.lr_clf_model = LogisticRegression(solver='liblinear', random_state=42, max_iter=1000)
-        self.lr_clf_model.fit(self.X_train, self.y_train)
+        self.lr_clf_model = build_model('logistic_regression')
+        self.lr_clf_model.fit(self.X_train, self.y_train, sample_weight=self.sample_weight)
         return self.lr_clf_model
 
     def train_rf_classifier(self, n_estimators=200, max_depth=10):
-        self.rf_clf_model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42, n_jobs=-1)
-        self.rf_clf_model.fit(self.X_train, self.y_train)
+        self.rf_clf_model = build_model('rf_classifier', n_estimators=n_estimators, max_depth=max_depth)
+        self.rf_clf_model.fit(self.X_train, self.y_train, sample_weight=self.sample_weight)
         return self.rf_clf_model
 
     def train_xgb_classifier(self, n_estimators=200, max_depth=6, learning_rate=0.1):
-        self.xgb_clf_model = xgb.XGBClassifier(n_estimators=n_estimators, max_depth=max_depth, learning_rate=learning_rate, 
-                                                use_label_encoder=False, eval_metric='logloss', random_state=42, n_jobs=-1)
-        self.xgb_clf_model.fit(self.X_train, self.y_train)
+        self.xgb_clf_model = build_model('xgb_classifier', n_estimators=n_estimators, max_depth=max_depth,
+                                         learning_rate=learning_rate)
+        self.xgb_clf_model.fit(self.X_train, self.y_train, sample_weight=self.sample_weight)
         return self.xgb_clf_model
 
     # --- Regression Training Methods (Your existing code) ---
     
     def train_linear_regression(self):
-        self.lr_model = LinearRegression()
-        self.lr_model.fit(self.X_train, self.y_train)
+        self.lr_model = build_model('linear_regression')
+        self.lr_model.fit(self.X_train, self.y_train, sample_weight=self.sample_weight)
         return self.lr_model
 
     def train_random_forest(self, n_estimators=200, max_depth=10):
-        self.rf_model = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=42, n_jobs=-1)
-        self.rf_model.fit(self.X_train, self.y_train)
+        self.rf_model = build_model('random_forest', n_estimators=n_estimators, max_depth=max_depth)
+        self.rf_model.fit(self.X_train, self.y_train, sample_weight=self.sample_weight)
         return self.rf_model
 
     def train_xgboost(self, n_estimators=200, max_depth=6, learning_rate=0.1):
-        self.xgb_model = xgb.XGBRegressor(n_estimators=n_estimators, max_depth=max_depth, learning_rate=learning_rate, 
-                                          random_state=42, n_jobs=-1)
-        self.xgb_model.fit(self.X_train, self.y_train)
+        self.xgb_model = build_model('xgboost', n_estimators=n_estimators, max_depth=max_depth,
+                                     learning_rate=learning_rate)
+        self.xgb_model.fit(self.X_train, self.y_train, sample_weight=self.sample_weight)
         return self.xgb_model
 
     # --- Evaluation Methods ---
     
-    def evaluate_regression(self, model, name="Model"):
+    def evaluate_regression(self, model, name="Model", verbose=True):
         y_pred = model.predict(self.X_test)
 
         # Ensure predictions are non-negative for claim amounts
         y_pred = np.maximum(0, y_pred) 
 
         # Compute RMSE manually for compatibility
-        mse = mean_squared_error(self.y_test, y_pred)
+        mse = mean_squared_error(self.y_test, y_pred, sample_weight=self.test_weight)
         rmse = np.sqrt(mse)
-        r2 = r2_score(self.y_test, y_pred)
+        r2 = r2_score(self.y_test, y_pred, sample_weight=self.test_weight)
 
-        print(f"{name} (Regression): RMSE={rmse:.2f}, R²={r2:.4f}")
+        if verbose:
+            print(f"{name} (Regression): RMSE={rmse:.2f}, R²={r2:.4f}")
         return y_pred, rmse, r2
 
 
-    def evaluate_classification(self, model, name="Model"):
+    def evaluate_classification(self, model, name="Model", verbose=True):
         y_pred = model.predict(self.X_test)
         y_pred_proba = model.predict_proba(self.X_test)[:, 1]
         
         results = {
-            'Accuracy': accuracy_score(self.y_test, y_pred),
-            'Precision': precision_score(self.y_test, y_pred, zero_division=0),
-            'Recall': recall_score(self.y_test, y_pred, zero_division=0),
-            'F1-Score': f1_score(self.y_test, y_pred, zero_division=0),
-            'ROC-AUC': roc_auc_score(self.y_test, y_pred_proba)
+            'Accuracy': accuracy_score(self.y_test, y_pred, sample_weight=self.test_weight),
+            'Precision': precision_score(self.y_test, y_pred, zero_division=0, sample_weight=self.test_weight),
+            'Recall': recall_score(self.y_test, y_pred, zero_division=0, sample_weight=self.test_weight),
+            'F1-Score': f1_score(self.y_test, y_pred, zero_division=0, sample_weight=self.test_weight),
+            'ROC-AUC': roc_auc_score(self.y_test, y_pred_proba, sample_weight=self.test_weight)
         }
-        print(f"\n--- {name} (Classification) ---")
-        for metric, value in results.items():
-            print(f"{metric}: {value:.4f}")
+        if verbose:
+            print(f"\n--- {name} (Classification) ---")
+            for metric, value in results.items():
+                print(f"{metric}: {value:.4f}")
             
-        return y_pred_proba, results
\ No newline at end of file
+        return y_pred_proba, results
+
+# --- Out-of-core XGBoost training ---
+
+class PolicyChunkIter(xgb.DataIter):
+    """
+    XGBoost data iterator over chunks from the loader, encoded by a fitted FeaturePipeline.
+
+    chunk_factory is a zero-argument callable returning a fresh chunk iterator, e.g.
+    lambda: DataLoader().load_data(path, typed=True, chunksize=200_000); XGBoost calls
+    reset() to restart it on every pass. With claims_only=True only rows with TotalClaims > 0
+    are fed (severity modelling).
+    """
+
+    def __init__(self, chunk_factory, pipeline, target='HasClaim', claims_only=False, cache_prefix=None):
+        self.chunk_factory = chunk_factory
+        self.pipeline = pipeline
+        self.target = target
+        self.claims_only = claims_only
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._chunks = iter(self.chunk_factory())
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self.reset()
+        for chunk in self._chunks:
+            if self.claims_only:
+                chunk = chunk[chunk['TotalClaims'] > 0]
+            if len(chunk) == 0:
+                continue
+            X = self.pipeline.transform(chunk)
+            y = self.pipeline.extract_targets(chunk)[self.target]
+            input_data(data=X, label=y.to_numpy(), feature_names=list(self.pipeline.feature_names))
+            return 1
+        return 0
+
+
+def train_xgb_external(chunk_factory, pipeline, task='classification', params=None, num_boost_round=200,
+                       max_bin=256, eval_chunk_factory=None, early_stopping_rounds=None, cache_dir=None):
+    """
+    Trains XGBoost from the chunked dataset without materialising the one-hot design matrix.
+
+    Chunks are quantised into a QuantileDMatrix through PolicyChunkIter (hist tree method),
+    so only the compressed histogram index is held in memory; with cache_dir the pages are
+    kept on disk instead (external memory). task='classification' models HasClaim,
+    task='regression' models TotalClaims on the claim rows. Returns the trained Booster.
+    """
+    if task not in ('classification', 'regression'):
+        raise ValueError(f"Unknown task: {task}. Use 'classification' or 'regression'.")
+    target, claims_only = ('HasClaim', False) if task == 'classification' else ('TotalClaims', True)
+    defaults = {'tree_method': 'hist', 'max_depth': 6, 'learning_rate': 0.1, 'seed': 42,
+                'objective': 'binary:logistic' if task == 'classification' else 'reg:squarederror',
+                'eval_metric': 'logloss' if task == 'classification' else 'rmse'}
+    params = {**defaults, **(params or {}), 'tree_method': 'hist'}
+
+    def make_iter(factory, prefix):
+        cache_prefix = os.path.join(cache_dir, prefix) if cache_dir else None
+        return PolicyChunkIter(factory, pipeline, target=target, claims_only=claims_only, cache_prefix=cache_prefix)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        ext_mem_cls = getattr(xgb, 'ExtMemQuantileDMatrix', None)
+        dtrain = (ext_mem_cls(make_iter(chunk_factory, 'train'), max_bin=max_bin) if ext_mem_cls
+                  else xgb.DMatrix(make_iter(chunk_factory, 'train')))
+    else:
+        dtrain = xgb.QuantileDMatrix(make_iter(chunk_factory, None), max_bin=max_bin)
+
+    evals = [(dtrain, 'train')]
+    if eval_chunk_factory is not None:
+        deval = xgb.QuantileDMatrix(make_iter(eval_chunk_factory, None), max_bin=max_bin, ref=dtrain)
+        evals.append((deval, 'eval'))
+
+    return xgb.train(params, dtrain, num_boost_round=num_boost_round, evals=evals,
+                     early_stopping_rounds=early_stopping_rounds if eval_chunk_factory is not None else None,
+                     verbose_eval=False)
+
+
+# --- Training orchestration ---
+
+_WORKER_DATA = {}
+
+
+def _init_worker(X_train, X_test, y_train, y_test):
+    """Process-pool initializer: ships the train/test split to each worker once."""
+    _WORKER_DATA['trainer'] = ModelTrainer(X_train, X_test, y_train, y_test)
+
+
+def _subsample(X, y, fraction, random_state):
+    if fraction >= 1:
+        return X, y
+    rows = np.random.default_rng(random_state).permutation(X.shape[0])[:max(int(X.shape[0] * fraction), 2)]
+    rows.sort()
+    X_sub = X.iloc[rows] if hasattr(X, 'iloc') else X[rows]
+    return X_sub, y.iloc[rows]
+
+
+def _run_job(job):
+    """Fits and evaluates one (model, params, resource) candidate inside a worker."""
+    trainer = _WORKER_DATA['trainer']
+    name, params = job['model'], dict(job['params'])
+    task = MODEL_SPECS[name][0]
+    n_threads = job['n_threads']
+    if 'n_jobs' in MODEL_SPECS[name][2]:
+        params['n_jobs'] = n_threads
+
+    X_train, y_train = _subsample(trainer.X_train, trainer.y_train, job['resource'], job['random_state'])
+    fit_kwargs = {}
+    if job['early_stopping_rounds'] and name in ('xgb_classifier', 'xgboost'):
+        stratify = y_train if task == 'classification' else None
+        X_train, X_val, y_train, y_val = train_test_split(
+            X_train, y_train, test_size=job['validation_fraction'], random_state=job['random_state'], stratify=stratify)
+        params['early_stopping_rounds'] = job['early_stopping_rounds']
+        fit_kwargs = dict(eval_set=[(X_val, y_val)], verbose=False)
+
+    start = time.perf_counter()
+    with threadpool_limits(limits=n_threads):
+        model = build_model(name, **params)
+        model.fit(X_train, y_train, **fit_kwargs)
+        if task == 'classification':
+            _, metrics = trainer.evaluate_classification(model, name=name, verbose=False)
+        else:
+            _, rmse, r2 = trainer.evaluate_regression(model, name=name, verbose=False)
+            metrics = {'RMSE': rmse, 'R2': r2}
+
+    return {'Model': name, 'Params': job['params'], 'Resource': job['resource'], **metrics,
+            'BestIteration': getattr(model, 'best_iteration', None) if fit_kwargs else None,
+            'FitSeconds': time.perf_counter() - start}
+
+
+class TrainingOrchestrator:
+    """
+    Hyperparameter search across the ModelTrainer model types on a process pool.
+
+    Each job gets threads_per_job threads (model n_jobs and BLAS/OpenMP pools are capped),
+    so n_workers x threads_per_job fills the machine without oversubscription. Metrics come
+    from ModelTrainer.evaluate_classification/evaluate_regression on the test split and are
+    collected into one leaderboard.
+    """
+
+    def __init__(self, X_train, X_test, y_train, y_test, n_workers=None, threads_per_job=None, random_state=42):
+        self.data = (X_train, X_test, y_train, y_test)
+        n_cpus = os.cpu_count() or 1
+        self.n_workers = n_workers or max(1, n_cpus // (threads_per_job or 1))
+        self.threads_per_job = threads_per_job or max(1, n_cpus // self.n_workers)
+        self.random_state = random_state
+        self.leaderboard = None
+
+    def _candidates(self, search_space, strategy, n_iter):
+        candidates = []
+        for name, space in search_space.items():
+            if name not in MODEL_SPECS:
+                raise ValueError(f"Unknown model: {name}. Choose from {list(MODEL_SPECS)}")
+            if strategy == 'grid' or not space:
+                grid = ParameterGrid(space or {})
+            else:
+                grid = ParameterSampler(space, n_iter=n_iter, random_state=self.random_state)
+            candidates += [(name, params) for params in grid]
+        tasks = {MODEL_SPECS[name][0] for name, _ in candidates}
+        if len(tasks) > 1:
+            raise ValueError("Search space mixes classification and regression models.")
+        return candidates
+
+    def _run(self, executor, candidates, resource, early_stopping_rounds, validation_fraction):
+        jobs = [{'model': name, 'params': params, 'resource': resource, 'n_threads': self.threads_per_job,
+                 'early_stopping_rounds': early_stopping_rounds, 'validation_fraction': validation_fraction,
+                 'random_state': self.random_state} for name, params in candidates]
+        return list(executor.map(_run_job, jobs))
+
+    def search(self, search_space, strategy='grid', n_iter=10, eta=3, min_resource=None,
+               early_stopping_rounds=None, validation_fraction=0.1):
+        """
+        Runs the search and returns the leaderboard (best first).
+
+        search_space maps model names (see MODEL_SPECS) to parameter grids, or to distributions
+        for strategy='random'. strategy='halving' runs successive halving on the grid/random
+        candidates, using the fraction of training rows as the resource: each round keeps the
+        best 1/eta candidates and multiplies their rows by eta until the full set is used; the
+        final survivor is always trained on the full set.
+        XGBoost models early-stop on a held-out validation_fraction when early_stopping_rounds is set.
+        """
+        if strategy not in ('grid', 'random', 'halving'):
+            raise ValueError(f"Unknown strategy: {strategy}. Use 'grid', 'random' or 'halving'.")
+        candidates = self._candidates(search_space, 'random' if strategy == 'random' else 'grid', n_iter)
+        if not candidates:
+            raise ValueError("Empty search space.")
+        task = MODEL_SPECS[candidates[0][0]][0]
+        metric, ascending = ('ROC-AUC', False) if task == 'classification' else ('RMSE', True)
+
+        results = []
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_worker, initargs=self.data) as executor:
+            if strategy != 'halving':
+                results = self._run(executor, candidates, 1.0, early_stopping_rounds, validation_fraction)
+            else:
+                n_rounds = max(int(np.ceil(np.log(len(candidates)) / np.log(eta))), 0)
+                resource = min_resource or eta ** -n_rounds
+                while True:
+                    round_results = self._run(executor, candidates, min(resource, 1.0),
+                                              early_stopping_rounds, validation_fraction)
+                    results += round_results
+                    if resource >= 1:
+                        break
+                    if len(candidates) > 1:
+                        ranked = sorted(zip(round_results, candidates), key=lambda rc: rc[0][metric],
+                                        reverse=not ascending)
+                        candidates = [c for _, c in ranked[:max(len(candidates) // eta, 1)]]
+                    # A lone survivor goes straight to the full training set
+                    resource = 1.0 if len(candidates) == 1 else resource * eta
+
+        leaderboard = pd.DataFrame(results)
+        self.leaderboard = leaderboard.sort_values(['Resource', metric], ascending=[False, ascending]).reset_index(drop=True)
+        return self.leaderboard
+
+
+# --- Cross-validation ---
+
+_CV_DATA = {}
+
+
+def _init_cv_worker(X, y_freq, y_sev):
+    """Process-pool initializer: ships the design matrix and targets to each worker once."""
+    _CV_DATA.update(X=X, y_freq=y_freq, y_sev=y_sev)
+
+
+def _take_rows(X, rows):
+    return X.iloc[rows] if hasattr(X, 'iloc') else X[rows]
+
+
+def _run_fold(job):
+    """Fits one candidate on one fold and returns its metrics and out-of-fold predictions."""
+    X, train_rows, test_rows = _CV_DATA['X'], job['train_rows'], job['test_rows']
+    y = _CV_DATA['y_freq'] if job['task'] == 'classification' else _CV_DATA['y_sev']
+    trainer = ModelTrainer(_take_rows(X, train_rows), _take_rows(X, test_rows), y.iloc[train_rows], y.iloc[test_rows])
+
+    params = dict(job['params'])
+    if 'n_jobs' in MODEL_SPECS[job['model']][2]:
+        params['n_jobs'] = job['n_threads']
+    with threadpool_limits(limits=job['n_threads']):
+        model = build_model(job['model'], **params)
+        model.fit(trainer.X_train, trainer.y_train)
+        if job['task'] == 'classification':
+            predictions, metrics = trainer.evaluate_classification(model, verbose=False)
+        else:
+            predictions, rmse, r2 = trainer.evaluate_regression(model, verbose=False)
+            metrics = {'RMSE': rmse, 'R2': r2}
+    return {'candidate': job['candidate'], 'fold': job['fold'], 'metrics': metrics,
+            'test_rows': test_rows, 'predictions': np.asarray(predictions)}
+
+
+class CrossValidator:
+    """
+    K-fold (or grouped, e.g. by PolicyID) cross-validation with cached folds.
+
+    Fold indices are computed once and kept as int32 arrays; the claim-only severity subset of
+    each fold is an index mask over those arrays rather than a copied frame. Folds (and
+    candidates) are evaluated in parallel on a process pool, returning mean/std metrics and
+    out-of-fold predictions.
+    """
+
+    def __init__(self, X, y_freq, y_sev=None, n_splits=5, groups=None, random_state=42,
+                 n_workers=None, threads_per_job=None):
+        self.X = X
+        self.y_freq = pd.Series(y_freq).reset_index(drop=True)
+        self.y_sev = pd.Series(y_sev).reset_index(drop=True) if y_sev is not None else None
+        n_cpus = os.cpu_count() or 1
+        self.n_workers = n_workers or max(1, n_cpus // (threads_per_job or 1))
+        self.threads_per_job = threads_per_job or max(1, n_cpus // self.n_workers)
+
+        rows = np.zeros(X.shape[0])
+        if groups is not None:
+            splitter = GroupKFold(n_splits=n_splits).split(rows, groups=np.asarray(groups))
+        elif self.y_freq.nunique() > 1:
+            splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(rows, self.y_freq)
+        else:
+            splitter = KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(rows)
+        self.folds = [(train.astype(np.int32), test.astype(np.int32)) for train, test in splitter]
+        self.claim_mask = (self.y_sev > 0).to_numpy() if self.y_sev is not None else None
+
+    def _fold_rows(self, task):
+        for train, test in self.folds:
+            if task == 'regression':
+                # Severity subset as an index mask over the cached fold indices
+                train, test = train[self.claim_mask[train]], test[self.claim_mask[test]]
+            yield train, test
+
+    def evaluate_many(self, candidates):
+        """
+        Cross-validates a list of (model_name, params) candidates of the same task.
+        Returns (summary, oof) where summary has one row per candidate with mean/std of every
+        metric and oof is a DataFrame of out-of-fold predictions (one column per candidate;
+        NaN outside the claim rows for severity models).
+        """
+        tasks = {MODEL_SPECS[name][0] for name, _ in candidates}
+        if len(tasks) != 1:
+            raise ValueError("Candidates must all be classification or all be regression models.")
+        task = tasks.pop()
+        if task == 'regression' and self.y_sev is None:
+            raise ValueError("Severity models need y_sev.")
+
+        jobs = [{'candidate': i, 'fold': k, 'model': name, 'params': params, 'task': task,
+                 'train_rows': train, 'test_rows': test, 'n_threads': self.threads_per_job}
+                for i, (name, params) in enumerate(candidates)
+                for k, (train, test) in enumerate(self._fold_rows(task))]
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_cv_worker,
+                                 initargs=(self.X, self.y_freq, self.y_sev)) as executor:
+            results = list(executor.map(_run_fold, jobs))
+
+        labels = [f"{name} {params}" if params else name for name, params in candidates]
+        oof = pd.DataFrame(np.nan, index=self.y_freq.index, columns=labels)
+        rows = []
+        for i, (name, params) in enumerate(candidates):
+            fold_results = [r for r in results if r['candidate'] == i]
+            for r in fold_results:
+                oof.iloc[r['test_rows'], i] = r['predictions']
+            metrics = pd.DataFrame([r['metrics'] for r in fold_results])
+            summary = {'Model': name, 'Params': params, 'Folds': len(fold_results)}
+            for metric in metrics.columns:
+                summary[f'{metric}_mean'] = metrics[metric].mean()
+                summary[f'{metric}_std'] = metrics[metric].std()
+            rows.append(summary)
+        return pd.DataFrame(rows), oof
+
+    def evaluate(self, model_name, params=None):
+        """Cross-validates one model; returns (summary row, out-of-fold predictions)."""
+        summary, oof = self.evaluate_many([(model_name, params or {})])
+        return summary.iloc[0], oof.iloc[:, 0]
+
+    def evaluate_leaderboard(self, leaderboard, top_k=None):
+        """Cross-validates the distinct (Model, Params) entries of a TrainingOrchestrator leaderboard."""
+        candidates = []
+        for _, row in leaderboard.iterrows():
+            candidate = (row['Model'], row['Params'])
+            if candidate not in candidates:
+                candidates.append(candidate)
+        return self.evaluate_many(candidates[:top_k] if top_k else candidates)
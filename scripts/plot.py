@@ -1,110 +1,387 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from aggregation import segment_sums, zip_month_panel, top_zipcodes, zip_spearman
+from sampling import weights_of
+
+FIGURE_FORMATS = ('png', 'svg')
+
+
+def box_stats(values, label, whis=1.5, max_fliers=1000, random_state=0):
+    """
+    Quantile summary of values in the form ax.bxp() draws (Tukey whiskers at whis x IQR).
+    At most max_fliers outliers are kept: the extremes plus a random sample of the rest.
+    Returns None when values has no finite entries.
+    """
+    x = np.asarray(values, dtype=float)
+    x = x[np.isfinite(x)]
+    if not len(x):
+        return None
+    q1, med, q3 = np.percentile(x, [25, 50, 75])
+    lo, hi = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+    inside = x[(x >= lo) & (x <= hi)]
+    fliers = x[(x < lo) | (x > hi)]
+    if len(fliers) > max_fliers:
+        rng = np.random.default_rng(random_state)
+        sample = rng.choice(fliers, max_fliers - 2, replace=False)
+        fliers = np.concatenate([[fliers.min(), fliers.max()], sample])
+    return {'label': label, 'med': med, 'q1': q1, 'q3': q3,
+            'whislo': inside.min(), 'whishi': inside.max(), 'fliers': fliers}
+
+
+def histogram_summary(values, bins=30, kde=True, kde_points=256, weights=None):
+    """
+    Binned histogram of values (np.histogram) plus, with kde=True, a Gaussian KDE curve in
+    count units, estimated by smoothing a fine histogram with Scott's bandwidth. weights
+    (e.g. sketch bucket counts) weight each value. Returns None when nothing is finite.
+    """
+    x = np.asarray(values, dtype=float)
+    w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=float)
+    finite = np.isfinite(x)
+    x, w = x[finite], w[finite]
+    if not w.sum():
+        return None
+    counts, edges = np.histogram(x, bins=bins, weights=w)
+    summary = {'counts': counts, 'edges': edges, 'kde_x': None, 'kde_y': None}
+    n = w.sum()
+    std = np.sqrt(np.average((x - np.average(x, weights=w)) ** 2, weights=w))
+    if kde and std > 0 and edges[-1] > edges[0]:
+        fine_counts, fine_edges = np.histogram(x, bins=kde_points, range=(edges[0], edges[-1]), weights=w)
+        fine_width = fine_edges[1] - fine_edges[0]
+        sigma = std * n ** (-1 / 5) / fine_width
+        half = int(min(np.ceil(4 * sigma), kde_points - 1))
+        kernel = np.exp(-0.5 * (np.arange(-half, half + 1) / max(sigma, 1e-12)) ** 2)
+        smoothed = np.convolve(fine_counts, kernel / kernel.sum(), mode='same')
+        summary['kde_x'] = (fine_edges[:-1] + fine_edges[1:]) / 2
+        summary['kde_y'] = smoothed * (edges[1] - edges[0]) / fine_width
+    return summary
+
+
+def _draw_histogram(ax, summary, color):
+    edges = summary['edges']
+    ax.bar(edges[:-1], summary['counts'], width=np.diff(edges), align='edge', color=color, alpha=0.6,
+           edgecolor='white')
+    if summary['kde_x'] is not None:
+        ax.plot(summary['kde_x'], summary['kde_y'], color=color)
+    ax.set_ylabel('Count')
+
+
+def _draw_segment_lr(summary):
+    col, segment, overall_lr = summary['col'], summary['segment'], summary['overall_lr']
+    fig = plt.figure(figsize=(10, 5))
+    sns.barplot(x=segment.index, y=segment['LossRatio'], palette='viridis')
+    plt.axhline(overall_lr, color='red', linestyle='--', label='Overall LR')
+    plt.title(f"Loss Ratio by {col}")
+    plt.xticks(rotation=45)
+    plt.legend()
+    return fig
+
+
+def _draw_boxplots(summary):
+    stats = summary['stats']
+    fig = plt.figure(figsize=(15, 4))
+    for i, stat in enumerate(stats):
+        ax = plt.subplot(1, len(stats), i + 1)
+        ax.bxp([stat], showfliers=True, patch_artist=True, boxprops={'facecolor': 'skyblue'})
+        ax.set_xticks([])
+        plt.title(stat['label'])
+    plt.tight_layout()
+    return fig
+
+
+def _draw_histograms(summary):
+    histograms = summary['histograms']
+    fig = plt.figure(figsize=(15, 4))
+    for i, (title, hist) in enumerate(histograms):
+        ax = plt.subplot(1, len(histograms), i + 1)
+        _draw_histogram(ax, hist, summary.get('color', 'teal'))
+        plt.title(title)
+    plt.tight_layout()
+    return fig
+
+
+def _draw_categorical_distributions(summary):
+    counts_by_col = summary['counts']
+    fig = plt.figure(figsize=(15, 5))
+    for i, (col, counts) in enumerate(counts_by_col):
+        plt.subplot(1, len(counts_by_col), i + 1)
+        sns.barplot(x=counts.index, y=counts.values, palette='pastel')
+        plt.xticks(rotation=45)
+        plt.title(f"Distribution of {col}")
+    plt.tight_layout()
+    return fig
+
+
+def _draw_monthly_trends(summary):
+    monthly = summary['monthly']
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+    ax2 = ax1.twinx()
+
+    ax1.bar(monthly.index, monthly['PolicyCount'], color='gray', alpha=0.5)
+    ax2.plot(monthly.index, monthly['LossRatio'], color='red', marker='o')
+
+    ax1.set_ylabel("Policy Count")
+    ax2.set_ylabel("Loss Ratio")
+    plt.title("Monthly Policy Count vs Loss Ratio")
+    return fig
+
+
+def _draw_vehicle_make_risk(summary):
+    high_volume, top_n = summary['high_volume'], summary['top_n']
+    fig = plt.figure(figsize=(12, 7))
+    sns.scatterplot(
+        data=high_volume,
+        x='AvgPremium', y='AvgClaim',
+        size='Volume', hue=high_volume.index,
+        sizes=(50, 400), legend=False
+    )
+
+    # Annotate top N and bottom N AvgClaim
+    top_vehicles = high_volume.nlargest(top_n, 'AvgClaim')
+    bottom_vehicles = high_volume.nsmallest(top_n, 'AvgClaim')
+    for idx, row in pd.concat([top_vehicles, bottom_vehicles]).iterrows():
+        plt.text(row['AvgPremium'], row['AvgClaim'], idx, fontsize=9)
+
+    plt.title("Vehicle Make Risk Profile (Annotated Top/Bottom AvgClaim)")
+    plt.xlabel("Average Premium")
+    plt.ylabel("Average Claim Severity")
+    return fig
+
+
+def _draw_zipcode_correlations(summary):
+    corr_series, top_n = summary['corr'], summary['top_n']
+    fig = plt.figure(figsize=(8, 5))
+    sns.barplot(x=corr_series.index.astype(str), y=corr_series.values, palette='coolwarm')
+    plt.ylabel("Spearman Correlation (Premium vs Claims)")
+    plt.title(f"Top {top_n} ZIP Codes Correlation")
+    plt.ylim(-1, 1)
+    return fig
+
+
+def _draw_zipcode_scatter(summary):
+    panel = summary['panel']
+    fig = plt.figure(figsize=(12, 6))
+
+    for zip_code in summary['zips']:
+        zip_data = panel.xs(zip_code, level=0)
+        sns.scatterplot(
+            x=zip_data['TotalPremium'],
+            y=zip_data['TotalClaims'],
+            label=f"ZIP {zip_code}",
+            s=70
+        )
+        sns.regplot(
+            x=zip_data['TotalPremium'], y=zip_data['TotalClaims'],
+            scatter=False, ci=None
+        )
+
+    plt.xlabel("Monthly Total Premium")
+    plt.ylabel("Monthly Total Claims")
+    plt.title("Monthly Premium vs Claims by ZIP Code")
+    plt.legend()
+    return fig
+
+
+def _draw_custom_value_distribution(summary):
+    fig = plt.figure(figsize=(12, 5))
+    ax = plt.subplot(1, 2, 1)
+    ax.bxp([summary['box']], showfliers=True, patch_artist=True, boxprops={'facecolor': 'lightcoral'})
+    ax.set_xticks([])
+    plt.title("CustomValueEstimate - Outliers")
+
+    ax = plt.subplot(1, 2, 2)
+    _draw_histogram(ax, summary['hist'], 'coral')
+    plt.title("CustomValueEstimate - Distribution")
+
+    plt.tight_layout()
+    return fig
+
+
+def _draw_correlation_heatmap(summary):
+    fig = plt.figure(figsize=(10, 8))
+    sns.heatmap(summary['corr'], annot=True, fmt=".2f", cmap='coolwarm', cbar=True)
+    plt.title("Correlation Heatmap")
+    return fig
+
+
+def _init_render_worker():
+    plt.switch_backend('Agg')
+
+
+def _render_figure(draw, summary, path):
+    """Worker task: draws one figure from its summary and writes it to path."""
+    fig = draw(summary)
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
 
 class EDAPlots:
     """
     Visualization utilities for EDA on insurance portfolio data.
+
+    Every plot is drawn from a small precomputed summary (quantiles, binned histograms,
+    grouped sums, cached correlations) rather than from the raw rows. With output_dir set
+    the figures are written there as PNG/SVG instead of being shown; the process keeps its
+    matplotlib backend. render_report() regenerates the whole EDA report in worker processes.
+    On a stratified sample the SampleWeight column (or weight_col) weights the sums,
+    counts and histograms; box plots show the quantiles of the sampled rows.
     """
 
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame, output_dir=None, fmt='png', weight_col=None):
+        if fmt not in FIGURE_FORMATS:
+            raise ValueError(f"Unsupported figure format: {fmt}. Use 'png' or 'svg'.")
         self.data = data
+        self.weight_col = weights_of(data, weight_col)
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self._corr_cache = {}
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def _finish(self, draw, summary, name):
+        """Draws and shows a figure, or saves and closes it in headless mode. Returns the file path if saved."""
+        if not self.output_dir:
+            draw(summary)
+            plt.show()
+            return None
+        # Off-screen save with interactive mode off; the backend stays as it is
+        with plt.ioff():
+            return _render_figure(draw, summary, os.path.join(self.output_dir, f"{name}.{self.fmt}"))
+
+    # --- Summaries (small, picklable inputs for the _draw_* functions) ---
+
+    def _weights(self):
+        """Row weights as a float Series (ones when the data is not a weighted sample)."""
+        if self.weight_col is None:
+            return pd.Series(1.0, index=self.data.index)
+        return self.data[self.weight_col].astype(float)
 
-    def plot_segmented_monthly_lr(self, segment_cols):
+    def _segment_lr_summaries(self, segment_cols, n_jobs=None):
+        data = self.data
+        weights = self._weights()
+        overall_lr = (data['TotalClaims'] * weights).sum() / (data['TotalPremium'] * weights).sum()
+        segments = segment_sums(data, segment_cols, n_jobs=n_jobs, weight_col=self.weight_col)
+        summaries = [{'col': col, 'overall_lr': overall_lr,
+                      'segment': segments[col].sort_values('LossRatio', ascending=False)[['LossRatio']]}
+                     for col in segment_cols if col in segments]
+        return overall_lr, summaries
+
+    def _univariate_summaries(self, numerical_cols, profile=None):
+        if profile is not None:
+            cols = [col for col in numerical_cols if col in profile.columns]
+            stats = [profile.box_stats(col) for col in cols]
+            hists = [profile.histogram_summary(col, transform=np.log1p) for col in cols]
+        else:
+            cols = [col for col in numerical_cols if col in self.data.columns]
+            stats = [box_stats(self.data[col], col) for col in cols]
+            weights = self._weights().to_numpy() if self.weight_col else None
+            with np.errstate(invalid='ignore', divide='ignore'):
+                hists = [histogram_summary(np.log1p(self.data[col].to_numpy(dtype=float)), weights=weights)
+                         for col in cols]
+        histograms = [(f'Log({col})', hist) for col, hist in zip(cols, hists) if hist is not None]
+        return {'stats': [stat for stat in stats if stat is not None]}, {'histograms': histograms, 'color': 'teal'}
+
+    def _categorical_summary(self, categorical_cols):
+        cols = [col for col in categorical_cols if col in self.data.columns]
+        if self.weight_col is None:
+            return {'counts': [(col, self.data[col].value_counts()) for col in cols]}
+        weights = self._weights()
+        return {'counts': [(col, weights.groupby(self.data[col], observed=True).sum()
+                            .sort_values(ascending=False).rename('count')) for col in cols]}
+
+    def _monthly_summary(self):
+        data = self.data
+        weights = self._weights()
+        monthly = pd.DataFrame({
+            'TotalPremium': data['TotalPremium'] * weights,
+            'TotalClaims': data['TotalClaims'] * weights,
+            'PolicyCount': data['PolicyID'].notna() * weights,
+        }).groupby(data['TransactionMonth']).sum()
+        monthly['LossRatio'] = monthly['TotalClaims'] / monthly['TotalPremium']
+        return {'monthly': monthly}
+
+    def _vehicle_make_summary(self, top_n):
+        data = self.data
+        claims = data['TotalClaims']
+        weights = self._weights()
+        has_claim = claims > 0
+        # Weighted means as ratios of weighted sums (plain means when unweighted)
+        sums = pd.DataFrame({
+            'Premium': data['TotalPremium'] * weights,
+            'Weight': weights,
+            'Claims': (claims * weights).where(has_claim, 0.0),
+            'ClaimWeight': weights.where(has_claim, 0.0),
+            'Volume': data['PolicyID'].notna() * weights,
+        }).groupby(data['make'], observed=True).sum()
+        make_risk = pd.DataFrame({
+            'AvgPremium': sums['Premium'] / sums['Weight'],
+            'AvgClaim': sums['Claims'] / sums['ClaimWeight'].replace(0, np.nan),
+            'Volume': sums['Volume'],
+        }).dropna()
+        high_volume = make_risk[make_risk['Volume'] > make_risk['Volume'].quantile(0.9)]
+        return {'high_volume': high_volume, 'top_n': top_n}
+
+    def _zipcode_summaries(self, top_n, panel=None):
+        # The ZIP x month panel excludes NA PostalCodes; both ZIP views are drawn from it
+        if panel is None:
+            panel = zip_month_panel(self.data, weight_col=self.weight_col)
+        top_zips = top_zipcodes(panel, top_n)
+        corr = zip_spearman(panel, top_zips).sort_values(ascending=False)
+        sub = panel.loc[panel.index.get_level_values(0).isin(top_zips), ['TotalPremium', 'TotalClaims']]
+        return {'corr': corr, 'top_n': top_n}, {'panel': sub, 'zips': list(top_zips)}
+
+    def _custom_value_summary(self):
+        values = self.data['CustomValueEstimate']
+        return {'box': box_stats(values, 'CustomValueEstimate'), 'hist': histogram_summary(values)}
+
+    def correlation_matrix(self, numerical_cols=None):
+        """Pearson correlation of numerical_cols, computed once per column set and cached."""
+        if numerical_cols is None:
+            numerical_cols = self.data.select_dtypes(include=np.number).columns.tolist()
+        key = tuple(numerical_cols)
+        if key not in self._corr_cache:
+            self._corr_cache[key] = self.data[list(numerical_cols)].corr()
+        return self._corr_cache[key]
+
+    # --- Plots ---
+
+    def plot_segmented_monthly_lr(self, segment_cols, n_jobs=None):
         """
         Plots segmented Loss Ratios for given columns (e.g., Province, VehicleType, Gender)
         to answer key profitability questions.
         """
-        data = self.data
-        overall_lr = data['TotalClaims'].sum() / data['TotalPremium'].sum()
+        overall_lr, summaries = self._segment_lr_summaries(segment_cols, n_jobs=n_jobs)
         print(f"Overall Loss Ratio: {overall_lr:.2%}")
+        return [self._finish(_draw_segment_lr, summary, f"loss_ratio_{summary['col']}") for summary in summaries]
 
-        for col in segment_cols:
-            if col in data.columns:
-                segment = data.groupby(col).agg(
-                    TotalPremium=('TotalPremium', 'sum'),
-                    TotalClaims=('TotalClaims', 'sum')
-                )
-                segment['LossRatio'] = segment['TotalClaims'] / segment['TotalPremium']
-                segment = segment.sort_values('LossRatio', ascending=False)
-
-                plt.figure(figsize=(10, 5))
-                sns.barplot(x=segment.index, y=segment['LossRatio'], palette='viridis')
-                plt.axhline(overall_lr, color='red', linestyle='--', label='Overall LR')
-                plt.title(f"Loss Ratio by {col}")
-                plt.xticks(rotation=45)
-                plt.legend()
-                plt.show()
-
-    def univariate_analysis(self, numerical_cols):
+    def univariate_analysis(self, numerical_cols, profile=None):
         """
         Plots boxplots and log-scaled histograms for numerical columns
-        to detect outliers and visualize distributions.
+        to detect outliers and visualize distributions. With a sketches.NumericProfiler
+        (e.g. built over chunks of a larger extract) the plots come from its sketches.
         """
-        data = self.data
-
-        # Boxplots
-        plt.figure(figsize=(15, 4))
-        for i, col in enumerate(numerical_cols):
-            if col in data.columns:
-                plt.subplot(1, len(numerical_cols), i + 1)
-                sns.boxplot(y=data[col], color='skyblue')
-                plt.title(col)
-        plt.tight_layout()
-        plt.show()
-
-        # Log histograms
-        plt.figure(figsize=(15, 4))
-        for i, col in enumerate(numerical_cols):
-            if col in data.columns:
-                plt.subplot(1, len(numerical_cols), i + 1)
-                sns.histplot(np.log1p(data[col]), bins=30, kde=True, color='teal')
-                plt.title(f'Log({col})')
-        plt.tight_layout()
-        plt.show()
+        boxes, histograms = self._univariate_summaries(numerical_cols, profile)
+        return [self._finish(_draw_boxplots, boxes, 'univariate_boxplots'),
+                self._finish(_draw_histograms, histograms, 'univariate_log_histograms')]
 
     def plot_categorical_distributions(self, categorical_cols):
         """
         Plots bar charts for categorical variables to understand value distributions.
         """
-        data = self.data
-        plt.figure(figsize=(15, 5))
-        
-        for i, col in enumerate(categorical_cols):
-            if col in data.columns:
-                plt.subplot(1, len(categorical_cols), i + 1)
-                counts = data[col].value_counts()
-                sns.barplot(x=counts.index, y=counts.values, palette='pastel')
-                plt.xticks(rotation=45)
-                plt.title(f"Distribution of {col}")
-        
-        plt.tight_layout()
-        plt.show()
+        return self._finish(_draw_categorical_distributions, self._categorical_summary(categorical_cols),
+                            'categorical_distributions')
 
     def plot_monthly_trends(self):
         """
         Plots monthly premiums, claims, and loss ratios over time
         to detect temporal trends in claim frequency and severity.
         """
-        data = self.data
-        monthly = data.groupby('TransactionMonth').agg(
-            TotalPremium=('TotalPremium', 'sum'),
-            TotalClaims=('TotalClaims', 'sum'),
-            PolicyCount=('PolicyID', 'count')
-        )
-        monthly['LossRatio'] = monthly['TotalClaims'] / monthly['TotalPremium']
-
-        fig, ax1 = plt.subplots(figsize=(12, 6))
-        ax2 = ax1.twinx()
-
-        ax1.bar(monthly.index, monthly['PolicyCount'], color='gray', alpha=0.5)
-        ax2.plot(monthly.index, monthly['LossRatio'], color='red', marker='o')
-
-        ax1.set_ylabel("Policy Count")
-        ax2.set_ylabel("Loss Ratio")
-        plt.title("Monthly Policy Count vs Loss Ratio")
-        plt.show()
+        return self._finish(_draw_monthly_trends, self._monthly_summary(), 'monthly_trends')
 
     def plot_vehicle_make_risk(self, top_n=3):
         """
@@ -112,125 +389,101 @@ class EDAPlots:
         Bubble size = number of policies.
         Annotates top/bottom N AvgClaim vehicles.
         """
-        data = self.data
-        make_risk = data.groupby('make').agg(
-            AvgPremium=('TotalPremium', 'mean'),
-            AvgClaim=('TotalClaims', lambda x: x[x > 0].mean()),
-            Volume=('PolicyID', 'count')
-        ).dropna()
+        return self._finish(_draw_vehicle_make_risk, self._vehicle_make_summary(top_n), 'vehicle_make_risk')
 
-        high_volume = make_risk[make_risk['Volume'] > make_risk['Volume'].quantile(0.9)]
-
-        plt.figure(figsize=(12, 7))
-        sns.scatterplot(
-            data=high_volume,
-            x='AvgPremium', y='AvgClaim',
-            size='Volume', hue=high_volume.index,
-            sizes=(50, 400), legend=False
-        )
-
-        # Annotate top N and bottom N AvgClaim
-        top_vehicles = high_volume.nlargest(top_n, 'AvgClaim')
-        bottom_vehicles = high_volume.nsmallest(top_n, 'AvgClaim')
-        for idx, row in pd.concat([top_vehicles, bottom_vehicles]).iterrows():
-            plt.text(row['AvgPremium'], row['AvgClaim'], idx, fontsize=9)
-
-        plt.title("Vehicle Make Risk Profile (Annotated Top/Bottom AvgClaim)")
-        plt.xlabel("Average Premium")
-        plt.ylabel("Average Claim Severity")
-        plt.show()
-
-    def plot_zipcode_correlations(self):
+    def plot_zipcode_correlations(self, top_n=5, panel=None):
         """
-        Plots Spearman correlation between monthly premiums and claims for top 5 ZIP codes,
-        excluding missing PostalCode values.
+        Plots Spearman correlation between monthly premiums and claims for top N ZIP codes,
+        excluding missing PostalCode values. panel is an aggregation.zip_month_panel of the
+        data (e.g. bivariate_analysis()['zip_panel']); without it the panel is rebuilt.
         """
-        data = self.data
-        # Drop NA PostalCodes before counting
-        valid_postal_codes = data['PostalCode'].dropna()
-        top_zips = valid_postal_codes.value_counts().nlargest(5).index
-        correlations = {}
-
-        for z in top_zips:
-            zip_data = data[data['PostalCode'] == z]
-            monthly = zip_data.groupby('TransactionMonth').agg(
-                P=('TotalPremium', 'sum'),
-                C=('TotalClaims', 'sum')
-            )
-            if len(monthly) > 1:
-                correlations[z] = monthly['P'].corr(monthly['C'], method='spearman')
-
-        corr_series = pd.Series(correlations).sort_values(ascending=False)
-        plt.figure(figsize=(8, 5))
-        sns.barplot(x=corr_series.index, y=corr_series.values, palette='coolwarm')
-        plt.ylabel("Spearman Correlation (Premium vs Claims)")
-        plt.title("Top 5 ZIP Codes Correlation")
-        plt.ylim(-1, 1)
-        plt.show()
+        corr, _ = self._zipcode_summaries(top_n, panel)
+        return self._finish(_draw_zipcode_correlations, corr, 'zipcode_correlations')
 
-
-    def plot_zipcode_scatter(self, top_n=5):
+    def plot_zipcode_scatter(self, top_n=5, panel=None):
         """
-        Plots scatter plots of monthly TotalPremium vs TotalClaims for the top N ZIP codes.
+        Plots scatter plots of monthly TotalPremium vs TotalClaims for the top N ZIP codes,
+        from panel when given (see plot_zipcode_correlations).
         """
-        data = self.data
-        top_zips = data['PostalCode'].value_counts().nlargest(top_n).index
-        
-        plt.figure(figsize=(12, 6))
-        
-        for zip_code in top_zips:
-            zip_data = data[data['PostalCode'] == zip_code].groupby('TransactionMonth').agg(
-                TotalPremium=('TotalPremium', 'sum'),
-                TotalClaims=('TotalClaims', 'sum')
-            )
-            sns.scatterplot(
-                x=zip_data['TotalPremium'],
-                y=zip_data['TotalClaims'],
-                label=f"ZIP {zip_code}",
-                s=70
-            )
-            sns.regplot(
-                x=zip_data['TotalPremium'], y=zip_data['TotalClaims'],
-                scatter=False, ci=None
-            )
-        
-        plt.xlabel("Monthly Total Premium")
-        plt.ylabel("Monthly Total Claims")
-        plt.title("Monthly Premium vs Claims by ZIP Code")
-        plt.legend()
-        plt.show()
+        _, scatter = self._zipcode_summaries(top_n, panel)
+        return self._finish(_draw_zipcode_scatter, scatter, 'zipcode_scatter')
 
     def plot_custom_value_distribution(self):
         """
         Plots histogram and boxplot for CustomValueEstimate to visualize outliers.
         """
-        data = self.data
-        if 'CustomValueEstimate' not in data.columns:
+        if 'CustomValueEstimate' not in self.data.columns:
             print("CustomValueEstimate not found in dataset.")
-            return
-
-        plt.figure(figsize=(12, 5))
-        plt.subplot(1, 2, 1)
-        sns.boxplot(y=data['CustomValueEstimate'], color='lightcoral')
-        plt.title("CustomValueEstimate - Outliers")
-
-        plt.subplot(1, 2, 2)
-        sns.histplot(data['CustomValueEstimate'].dropna(), bins=30, kde=True, color='coral')
-        plt.title("CustomValueEstimate - Distribution")
-
-        plt.tight_layout()
-        plt.show()
+            return None
+        summary = self._custom_value_summary()
+        if summary['box'] is None:
+            print("CustomValueEstimate has no values to plot.")
+            return None
+        return self._finish(_draw_custom_value_distribution, summary, 'custom_value_distribution')
 
     def plot_correlation_heatmap(self, numerical_cols=None):
         """
         Plots a correlation heatmap for numerical variables to understand multivariate relationships.
         """
+        return self._finish(_draw_correlation_heatmap, {'corr': self.correlation_matrix(numerical_cols)},
+                            'correlation_heatmap')
+
+    # --- Batch report ---
+
+    def report_tasks(self, segment_cols=(), numerical_cols=(), categorical_cols=(), top_n=5):
+        """
+        Returns the (draw function, summary, figure name) triples of the full EDA report.
+        All aggregation happens here, so the tasks only carry small summaries.
+        """
         data = self.data
-        if numerical_cols is None:
-            numerical_cols = data.select_dtypes(include=np.number).columns.tolist()
-        corr = data[numerical_cols].corr()
-        
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(corr, annot=True, fmt=".2f", cmap='coolwarm', cbar=True)
-        plt.title("Correlation Heatmap")
-        plt.show()
+        tasks = []
+        if segment_cols:
+            _, summaries = self._segment_lr_summaries(segment_cols)
+            tasks += [(_draw_segment_lr, summary, f"loss_ratio_{summary['col']}") for summary in summaries]
+        if numerical_cols:
+            boxes, histograms = self._univariate_summaries(numerical_cols)
+            tasks += [(_draw_boxplots, boxes, 'univariate_boxplots'),
+                      (_draw_histograms, histograms, 'univariate_log_histograms')]
+            tasks.append((_draw_correlation_heatmap, {'corr': self.correlation_matrix(list(numerical_cols))},
+                          'correlation_heatmap'))
+        if categorical_cols:
+            tasks.append((_draw_categorical_distributions, self._categorical_summary(categorical_cols),
+                          'categorical_distributions'))
+        if {'TransactionMonth', 'PolicyID'} <= set(data.columns):
+            tasks.append((_draw_monthly_trends, self._monthly_summary(), 'monthly_trends'))
+        if {'make', 'PolicyID'} <= set(data.columns):
+            tasks.append((_draw_vehicle_make_risk, self._vehicle_make_summary(3), 'vehicle_make_risk'))
+        if {'PostalCode', 'TransactionMonth'} <= set(data.columns):
+            corr, scatter = self._zipcode_summaries(top_n)
+            tasks += [(_draw_zipcode_correlations, corr, 'zipcode_correlations'),
+                      (_draw_zipcode_scatter, scatter, 'zipcode_scatter')]
+        if 'CustomValueEstimate' in data.columns:
+            summary = self._custom_value_summary()
+            if summary['box'] is not None:
+                tasks.append((_draw_custom_value_distribution, summary, 'custom_value_distribution'))
+        return tasks
+
+    def render_report(self, output_dir=None, segment_cols=(), numerical_cols=(), categorical_cols=(), top_n=5,
+                      fmt=None, n_jobs=None):
+        """
+        Writes every EDA figure to output_dir (default self.output_dir) as PNG or SVG.
+        Summaries are computed once here and the figures are drawn in n_jobs worker
+        processes on the Agg backend. Returns the written file paths.
+        """
+        output_dir = output_dir or self.output_dir
+        fmt = fmt or self.fmt
+        if not output_dir:
+            raise ValueError("No output_dir specified for the report.")
+        if fmt not in FIGURE_FORMATS:
+            raise ValueError(f"Unsupported figure format: {fmt}. Use 'png' or 'svg'.")
+        os.makedirs(output_dir, exist_ok=True)
+
+        tasks = self.report_tasks(segment_cols, numerical_cols, categorical_cols, top_n)
+        paths = [os.path.join(output_dir, f"{name}.{fmt}") for _, _, name in tasks]
+        n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(tasks), 1))
+        if n_jobs == 1:
+            # Saved and closed figures are never shown, so the current backend can stay
+            with plt.ioff():
+                return [_render_figure(draw, summary, path) for (draw, summary, _), path in zip(tasks, paths)]
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_render_worker) as executor:
+            return list(executor.map(_render_figure, [t[0] for t in tasks], [t[1] for t in tasks], paths))
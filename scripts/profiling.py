@@ -0,0 +1,280 @@
+"""
+Opt-in stage profiling for the pipeline classes.
+
+Classes decorated with @profile_methods (PreprocessData, FeatureEngineering, ModelTrainer,
+FeatureInterpreter, HypothesisTester) record, for every public method call while a
+StageProfiler is active: wall and CPU time, peak RSS above the RSS at the start of the call,
+and the rows, columns and memory of the input and output. Records are appended to a JSON
+lines file as they complete and summarized per method by StageProfiler.summary().
+
+Disabled (the default), a decorated method costs one global lookup per call.
+
+Usage:
+    with StageProfiler('profile.jsonl') as profiler:
+        data = preprocess.handle_missing_values(data)
+        ...
+    print(profiler.summary())
+
+Setting PIPELINE_PROFILE=<path> in the environment enables profiling for the whole process.
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from utils import frame_memory
+
+# Attributes used as a method's input when it takes no frame argument (e.g. ModelTrainer.train_*)
+INPUT_ATTRS = ('data', 'X_train', 'X_test')
+
+_ACTIVE = None
+
+
+def _current_rss():
+    """Resident set size in bytes from /proc/self/statm, or None where it is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss():
+    """Peak RSS of the process in bytes from getrusage, or None where it is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakMemory:
+    """
+    Context manager sampling the process RSS every interval seconds in a background thread.
+    start and peak are in bytes. Without /proc the process-wide ru_maxrss is used, which is
+    a high-water mark since process start rather than per block; where neither exists
+    (Windows) both stay None.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss())
+
+    def __enter__(self):
+        self.start = _current_rss()
+        if self.start is None:
+            self.start = self.peak = _max_rss()
+            return self
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is None:
+            self.peak = _max_rss()
+            return False
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+        return False
+
+
+def _is_sparse(obj):
+    # scipy is only imported by the stages that produce sparse matrices
+    sparse = sys.modules.get('scipy.sparse')
+    return sparse is not None and sparse.issparse(obj)
+
+
+def _is_frame_like(obj):
+    return isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)) or _is_sparse(obj)
+
+
+def _memory(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return frame_memory(obj)
+    if _is_sparse(obj):
+        if not hasattr(obj, 'indptr'):
+            obj = obj.tocsr()
+        return int(obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes)
+    return int(obj.nbytes)
+
+
+def describe_frames(obj, measure_memory=True):
+    """
+    (rows, columns, bytes) of a frame, Series, array or sparse matrix. For tuples, lists and
+    dicts rows/columns are those of the first frame-like element and bytes the total over all
+    of them; anything else gives (None, None, None).
+    """
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (tuple, list)):
+        frames = [item for item in obj if _is_frame_like(item)]
+        if not frames:
+            return None, None, None
+        rows, cols, _ = describe_frames(frames[0], measure_memory=False)
+        return rows, cols, sum(_memory(f) for f in frames) if measure_memory else None
+    if not _is_frame_like(obj):
+        return None, None, None
+    shape = obj.shape
+    return (int(shape[0]), int(shape[1]) if len(shape) > 1 else 1,
+            _memory(obj) if measure_memory else None)
+
+
+class StageProfiler:
+    """
+    Collects one record per profiled method call while active (as a context manager or between
+    start() and stop()). With output_path every record is appended to that JSON lines file as
+    soon as the call returns, so a run that dies keeps the records of the stages before it.
+    sample_memory=False skips the RSS sampling thread, measure_memory=False skips frame sizes.
+    """
+
+    def __init__(self, output_path=None, sample_memory=True, measure_memory=True, interval=0.01):
+        self.output_path = output_path
+        self.sample_memory = sample_memory
+        self.measure_memory = measure_memory
+        self.interval = interval
+        self.records = []
+        self._depth = 0
+        self._previous = None
+
+    def start(self):
+        global _ACTIVE
+        self._previous, _ACTIVE = _ACTIVE, self
+        return self
+
+    def stop(self):
+        global _ACTIVE
+        _ACTIVE = self._previous
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _emit(self, record):
+        self.records.append(record)
+        if self.output_path:
+            with open(self.output_path, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def call(self, stage, func, instance, args, kwargs):
+        """Runs func(instance, *args, **kwargs) and records its cost under stage."""
+        source = next((arg for arg in args if _is_frame_like(arg)), None)
+        if source is None:
+            source = next((getattr(instance, attr) for attr in INPUT_ATTRS
+                           if _is_frame_like(getattr(instance, attr, None))), None)
+        rows_in, cols_in, bytes_in = describe_frames(source, self.measure_memory)
+
+        memory = PeakMemory(self.interval) if self.sample_memory else None
+        status, result = 'ok', None
+        self._depth += 1
+        start_time, start, cpu_start = time.time(), time.perf_counter(), time.process_time()
+        try:
+            if memory is not None:
+                with memory:
+                    result = func(instance, *args, **kwargs)
+            else:
+                result = func(instance, *args, **kwargs)
+            return result
+        except BaseException as exc:
+            status = f"error: {type(exc).__name__}"
+            raise
+        finally:
+            seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+            self._depth -= 1
+            rows_out, cols_out, bytes_out = describe_frames(result, self.measure_memory)
+            measured = memory is not None and memory.peak is not None
+            self._emit({
+                'stage': stage, 'depth': self._depth, 'status': status,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(start_time)),
+                'wall_seconds': round(seconds, 6), 'cpu_seconds': round(cpu_seconds, 6),
+                'peak_rss_delta_mb': round((memory.peak - memory.start) / 2 ** 20, 2) if measured else None,
+                'rss_mb': round(memory.peak / 2 ** 20, 2) if measured else None,
+                'rows_in': rows_in, 'cols_in': cols_in, 'bytes_in': bytes_in,
+                'rows_out': rows_out, 'cols_out': cols_out, 'bytes_out': bytes_out,
+            })
+
+    def summary(self, top_level=False):
+        """
+        Per-stage table: calls, total and mean wall seconds, CPU seconds, the largest peak RSS
+        delta and the rows seen, slowest first. top_level=True drops calls nested in other
+        profiled calls (e.g. fit/apply inside handle_missing_values).
+        """
+        records = pd.DataFrame(self.records)
+        if records.empty:
+            return records
+        if top_level:
+            records = records[records['depth'] == 0]
+        table = records.groupby('stage', sort=False).agg(
+            Calls=('wall_seconds', 'size'),
+            WallSeconds=('wall_seconds', 'sum'),
+            MeanWallSeconds=('wall_seconds', 'mean'),
+            CPUSeconds=('cpu_seconds', 'sum'),
+            PeakRSSDeltaMB=('peak_rss_delta_mb', 'max'),
+            RowsIn=('rows_in', 'max'),
+            RowsOut=('rows_out', 'max'),
+            Errors=('status', lambda s: int((s != 'ok').sum())),
+        )
+        return table.sort_values('WallSeconds', ascending=False).round(4)
+
+
+def profile_methods(cls):
+    """
+    Class decorator: wraps the public methods defined on cls so that calls are recorded while
+    a StageProfiler is active. Stages are named '<Class>.<method>'.
+    """
+    for name, attr in list(vars(cls).items()):
+        if name.startswith('_') or not callable(attr) or isinstance(attr, (staticmethod, classmethod, type)):
+            continue
+        setattr(cls, name, _profiled(attr, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _profiled(func, stage):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if _ACTIVE is None:
+            return func(self, *args, **kwargs)
+        return _ACTIVE.call(stage, func, self, args, kwargs)
+    return wrapper
+
+
+def enable_profiling(output_path=None, **kwargs):
+    """Starts a process-wide StageProfiler and returns it (stop it with disable_profiling)."""
+    return StageProfiler(output_path, **kwargs).start()
+
+
+def disable_profiling():
+    """Stops the active profiler, if any, and returns it."""
+    profiler = _ACTIVE
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def _print_summary(profiler):
+    if profiler.records:
+        print("--- Stage Profile ---")
+        print(profiler.summary().to_string())
+
+
+if os.environ.get('PIPELINE_PROFILE'):
+    atexit.register(_print_summary, enable_profiling(os.environ['PIPELINE_PROFILE']))
@@ -0,0 +1,272 @@
+"""
+Bootstrap and permutation tests for the difference of a KPI between two groups.
+
+Every KPI compared here (claim frequency, claim severity, margin, loss ratio) is a ratio of
+two column sums, so a resample only needs the numerator and denominator sums per group.
+Resamples are drawn in batches of NumPy count matrices: (numerator, denominator) pairs that
+repeat over many rows, such as the zeros of zero-inflated claims, are drawn as counts per
+distinct pair (multinomial for the bootstrap, multivariate hypergeometric for the permutation
+test), and the remaining light rows are drawn as blocks of row index matrices (bootstrap) or
+random row masks (permutation test), reduced with one gather or matrix product per block.
+Batch sizes are capped by memory, every batch has its own seed stream (so results do not depend on the number of worker
+processes), and permutation tests stop once a confidence bound on the p-value is on one side
+of alpha.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import beta
+
+# metric -> (numerator column, denominator column or None for a row count, label)
+METRICS = {
+    'frequency': ('ClaimOccurred', None, 'Claim Frequency'),
+    'severity': ('TotalClaims', 'ClaimOccurred', 'Claim Severity'),
+    'margin': ('Margin', None, 'Margin'),
+    'loss_ratio': ('TotalClaims', 'TotalPremium', 'Loss Ratio'),
+}
+
+# (numerator, denominator) pairs held by at least this many rows are resampled as counts
+HEAVY_PAIR_ROWS = 8
+# Upper bound on resamples per batch, so early stopping and worker pools see several batches
+MAX_BATCH_RESAMPLES = 1000
+# Permutation tests never stop early before this many resamples
+MIN_STOP_RESAMPLES = 100
+# Working set of one block of light-row draws; larger blocks are bound by memory bandwidth
+LIGHT_BLOCK_BYTES = 8 * 2 ** 20
+# Per light row and resample: index + complex gather (bootstrap), random byte + float mask (permutation)
+_BOOTSTRAP_ROW_BYTES = 24
+_SUBSET_ROW_BYTES = 10
+
+_KIND_KEYS = {'bootstrap': 0, 'permutation': 1}
+_WORKER_RESAMPLER = None
+
+
+def _ratio(num, den):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den != 0, num / np.where(den != 0, den, 1), np.nan)
+
+
+def _distinct_pairs(num, den):
+    """Distinct (num, den) pairs, how many rows hold each, and each row's pair."""
+    num_codes, num_values = pd.factorize(num)
+    den_codes, den_values = pd.factorize(den)
+    keys, inverse, counts = np.unique(num_codes.astype(np.int64) * len(den_values) + den_codes,
+                                      return_inverse=True, return_counts=True)
+    pairs = np.column_stack([np.asarray(num_values, dtype=float)[keys // len(den_values)],
+                             np.asarray(den_values, dtype=float)[keys % len(den_values)]])
+    return pairs, counts, inverse
+
+
+class _Sample:
+    """
+    Numerator/denominator rows of one sample, split into heavy pairs (held by at least
+    HEAVY_PAIR_ROWS rows, e.g. the zeros of zero-inflated columns), resampled as count
+    matrices, and the remaining light rows, resampled by row index or row mask.
+    """
+
+    def __init__(self, num, den):
+        pairs, counts, inverse = _distinct_pairs(np.asarray(num, dtype=float), np.asarray(den, dtype=float))
+        heavy = counts >= HEAVY_PAIR_ROWS
+        self.n = len(inverse)
+        self.heavy_pairs, self.heavy_counts = pairs[heavy], counts[heavy]
+        self.light_pairs = np.ascontiguousarray(pairs[inverse[~heavy[inverse]]])
+        # (num, den) of each light row as one complex value, so a resample is a single gather
+        self.light_values = self.light_pairs.view(np.complex128)[:, 0]
+        self.n_light = len(self.light_pairs)
+        self.totals = self.heavy_counts @ self.heavy_pairs + self.light_pairs.sum(axis=0)
+
+    def resample_bytes(self, kind):
+        """Memory of one resample: a row of the heavy count matrix plus the light-row draws."""
+        row_bytes = _BOOTSTRAP_ROW_BYTES if kind == 'bootstrap' else _SUBSET_ROW_BYTES
+        return 8 * (len(self.heavy_counts) + 2) + row_bytes * self.n_light
+
+    def _blocks(self, size, row_bytes):
+        """Slices of at most LIGHT_BLOCK_BYTES worth of resamples (at least one) covering range(size)."""
+        step = int(max(1, LIGHT_BLOCK_BYTES // max(1, row_bytes * self.n_light)))
+        return [slice(start, min(start + step, size)) for start in range(0, size, step)]
+
+    def _light_bootstrap(self, rng, draws, sums):
+        # Each block is one flat index vector holding the draws of its resamples back to back
+        for block in self._blocks(len(draws), _BOOTSTRAP_ROW_BYTES):
+            k = draws[block]
+            drawn = k > 0
+            if not drawn.any():
+                continue
+            rows = rng.integers(0, self.n_light, size=int(k.sum()), dtype=np.intp)
+            starts = np.concatenate([[0], np.cumsum(k[drawn])[:-1]])
+            totals = np.add.reduceat(np.take(self.light_values, rows), starts)
+            sums[np.flatnonzero(drawn) + block.start] += np.column_stack([totals.real, totals.imag])
+
+    def bootstrap_sums(self, rng, size):
+        """(size, 2) numerator and denominator sums of resamples drawn with replacement."""
+        light_draws = rng.binomial(self.n, self.n_light / self.n, size=size) if self.n_light else np.zeros(size, int)
+        sums = np.zeros((size, 2))
+        if len(self.heavy_counts):
+            counts = rng.multinomial(self.n - light_draws, self.heavy_counts / self.heavy_counts.sum())
+            sums += counts @ self.heavy_pairs
+        if self.n_light:
+            self._light_bootstrap(rng, light_draws, sums)
+        return sums
+
+    def _light_masks(self, rng, k):
+        """
+        (len(k), n_light) 0/1 float matrix whose row i selects a uniform random subset of k[i]
+        light rows. Rows are first kept with probability ~k[i] / n_light from random bytes, then
+        random kept (or dropped) rows are flipped until exactly k[i] are kept; the result is
+        exchangeable over rows, so every subset of size k[i] is equally likely.
+        """
+        n = self.n_light
+        raw = rng.bit_generator.random_raw(-(-len(k) * n // 8)).view(np.uint8)[:len(k) * n].reshape(len(k), n)
+        thresholds = np.clip(np.rint(256 * k / n), 0, 255).astype(np.uint8)
+        masks = raw < thresholds[:, None]
+        for i, excess in enumerate(masks.sum(axis=1) - k):
+            if excess:
+                rows = _pick_rows(rng, masks[i], excess > 0, abs(int(excess)))
+                masks[i, rows] = excess < 0
+        return masks.astype(np.float64)
+
+    def subset_sums(self, rng, size, m):
+        """(size, 2) numerator and denominator sums of random subsets of m rows (without replacement)."""
+        colors = np.append(self.heavy_counts, self.n_light)
+        counts = rng.multivariate_hypergeometric(colors, m, size=size, method='marginals')
+        sums = counts[:, :-1] @ self.heavy_pairs
+        if self.n_light:
+            for block in self._blocks(size, _SUBSET_ROW_BYTES):
+                sums[block] += self._light_masks(rng, counts[block, -1]) @ self.light_pairs
+        return sums
+
+
+def _pick_rows(rng, mask, value, count):
+    """count distinct uniformly random positions where mask == value."""
+    n = len(mask)
+    candidates = int(mask.sum()) if value else n - int(mask.sum())
+    if count * n > candidates * 64:
+        # Too few candidates for rejection sampling
+        return rng.choice(np.flatnonzero(mask == value), count, replace=False)
+    # The first count distinct hits of uniform draws over all rows are a uniform random subset
+    drawn = np.empty(0, dtype=np.int64)
+    while True:
+        draws = rng.integers(0, n, size=2 * count * n // candidates + 16)
+        drawn = np.concatenate([drawn, draws[mask[draws] == value]])
+        _, first = np.unique(drawn, return_index=True)
+        if len(first) >= count:
+            return drawn[np.sort(first)[:count]]
+
+
+def _init_resample_worker(resampler):
+    global _WORKER_RESAMPLER
+    _WORKER_RESAMPLER = resampler
+
+
+def _run_resample_batch(job):
+    return _WORKER_RESAMPLER._batch(*job)
+
+
+class TwoSampleResampler:
+    """
+    Resampling tests for ratio(A) - ratio(B), where ratio = sum(numerator) / sum(denominator)
+    over the rows of a group. seed makes runs reproducible (the entropy used is kept in
+    self.seed); n_jobs > 1 spreads batches over worker processes (None uses every CPU);
+    max_batch_bytes caps the memory of one batch of resamples.
+    """
+
+    def __init__(self, num_a, den_a, num_b, den_b, seed=None, n_jobs=1, max_batch_bytes=256 * 2 ** 20):
+        self._num_a, self._den_a, self._num_b, self._den_b = num_a, den_a, num_b, den_b
+        self.a = _Sample(num_a, den_a)
+        self.b = _Sample(num_b, den_b)
+        if not self.a.n or not self.b.n:
+            raise ValueError("Both groups need at least one row.")
+        self.value_a = float(_ratio(*self.a.totals))
+        self.value_b = float(_ratio(*self.b.totals))
+        self.observed = self.value_a - self.value_b
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.n_jobs = n_jobs or os.cpu_count()
+        self.max_batch_bytes = max_batch_bytes
+        self._pooled = None
+
+    @property
+    def pooled(self):
+        if self._pooled is None:
+            self._pooled = _Sample(np.concatenate([self._num_a, self._num_b]), np.concatenate([self._den_a, self._den_b]))
+        return self._pooled
+
+    def _batch(self, kind, seed, size):
+        rng = np.random.default_rng(seed)
+        if kind == 'bootstrap':
+            sums_a, sums_b = self.a.bootstrap_sums(rng, size), self.b.bootstrap_sums(rng, size)
+        else:
+            # Draw the smaller group's rows from the pool; the other group gets the rest
+            drawn = self.pooled.subset_sums(rng, size, min(self.a.n, self.b.n))
+            rest = self.pooled.totals - drawn
+            sums_a, sums_b = (drawn, rest) if self.a.n <= self.b.n else (rest, drawn)
+        return _ratio(sums_a[:, 0], sums_a[:, 1]) - _ratio(sums_b[:, 0], sums_b[:, 1])
+
+    def _batches(self, kind, n_resamples):
+        """Yields the differences of each batch of resamples, in batch order."""
+        samples = (self.a, self.b) if kind == 'bootstrap' else (self.pooled,)
+        resample_bytes = sum(sample.resample_bytes(kind) for sample in samples)
+        size = int(max(1, min(MAX_BATCH_RESAMPLES, self.max_batch_bytes // resample_bytes)))
+        starts = range(0, n_resamples, size)
+        seeds = np.random.SeedSequence(self.seed, spawn_key=(_KIND_KEYS[kind],)).spawn(len(starts))
+        jobs = [(kind, seed, min(size, n_resamples - start)) for start, seed in zip(starts, seeds)]
+
+        if self.n_jobs == 1 or len(jobs) == 1:
+            for job in jobs:
+                yield self._batch(*job)
+            return
+        executor = ProcessPoolExecutor(max_workers=min(self.n_jobs, len(jobs)), initializer=_init_resample_worker,
+                                       initargs=(self,))
+        try:
+            futures = [executor.submit(_run_resample_batch, job) for job in jobs]
+            for future in futures:
+                yield future.result()
+        finally:
+            # Batches not started when a test stops early are dropped
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def bootstrap(self, n_resamples=10_000, confidence=0.95):
+        """
+        Percentile bootstrap of the difference, each group resampled with replacement.
+        The p-value is twice the smaller share of resampled differences on either side of 0.
+        Resamples where a ratio is undefined (e.g. no claims for severity) are dropped.
+        """
+        diffs = np.concatenate(list(self._batches('bootstrap', n_resamples)))
+        diffs = diffs[~np.isnan(diffs)]
+        if not len(diffs):
+            lower = upper = std_error = p_value = np.nan
+        else:
+            lower, upper = np.percentile(diffs, [50 * (1 - confidence), 50 * (1 + confidence)])
+            std_error = diffs.std(ddof=1) if len(diffs) > 1 else np.nan
+            p_value = min(1.0, 2 * min((diffs <= 0).mean(), (diffs >= 0).mean()))
+        return {'difference': self.observed, 'ci_lower': float(lower), 'ci_upper': float(upper),
+                'std_error': float(std_error), 'p_value': float(p_value), 'resamples': len(diffs)}
+
+    def permutation(self, n_resamples=10_000, alpha=0.05, early_stop=True, stop_confidence=0.99):
+        """
+        Two-sided permutation test: group labels are shuffled over the pooled rows and the
+        p-value is (1 + #|difference| >= |observed|) / (1 + resamples). With early_stop the test
+        ends once the stop_confidence Clopper-Pearson interval of p lies entirely above or below alpha.
+        """
+        threshold = abs(self.observed) * (1 - 1e-12)
+        extreme = done = 0
+        stopped = False
+        batches = self._batches('permutation', n_resamples)
+        try:
+            for diffs in batches:
+                diffs = diffs[~np.isnan(diffs)]
+                extreme += int((np.abs(diffs) >= threshold).sum())
+                done += len(diffs)
+                if early_stop and MIN_STOP_RESAMPLES <= done < n_resamples:
+                    tail = (1 - stop_confidence) / 2
+                    lower = beta.ppf(tail, extreme, done - extreme + 1) if extreme else 0.0
+                    upper = beta.ppf(1 - tail, extreme + 1, done - extreme) if extreme < done else 1.0
+                    if upper < alpha or lower > alpha:
+                        stopped = True
+                        break
+        finally:
+            batches.close()
+        p_value = (extreme + 1) / (done + 1) if not np.isnan(self.observed) else np.nan
+        return {'difference': self.observed, 'p_value': float(p_value), 'resamples': done, 'stopped_early': stopped}
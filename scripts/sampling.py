@@ -0,0 +1,160 @@
+"""
+One-pass stratified reservoir sampling for fast exploratory runs.
+
+Rows are streamed chunk by chunk (e.g. from DataLoader.load_data(..., chunksize=...)); each
+row gets a uniform random key and every stratum (by default Province x HasClaim) keeps the
+rows with the smallest keys, i.e. a uniform sample without replacement of that stratum.
+Rare claim strata can be kept whole (or with a larger size) while the no-claim strata are
+subsampled; every sampled row carries the weight population / sampled rows of its stratum,
+which the KPI functions (aggregation, eda, plot) apply to give unbiased totals and ratios.
+
+Keys are drawn in row order from one seeded generator, so a sample depends on the seed and
+the row order, not on the chunk size.
+"""
+
+import numpy as np
+import pandas as pd
+
+WEIGHT_COL = 'SampleWeight'
+DEFAULT_STRATA = ('Province', 'HasClaim')
+
+_KEY, _STRATUM, _ROW = '_sample_key', '_sample_stratum', '_sample_row'
+
+
+def weights_of(data, weight_col=None):
+    """
+    The weight column to use for data: weight_col if given, WEIGHT_COL if data carries it
+    (a sample from StratifiedSampler), otherwise None (unweighted).
+    """
+    if weight_col is not None:
+        if weight_col not in data.columns:
+            raise ValueError(f"Weight column {weight_col} not found in data.")
+        return weight_col
+    return WEIGHT_COL if WEIGHT_COL in data.columns else None
+
+
+class StratifiedSampler:
+    """
+    Stratified reservoir (bottom-k) sampler over a stream of chunks.
+
+    size rows are kept per stratum, claim_size per stratum with HasClaim == 1 (None keeps
+    every claim row). HasClaim is derived from TotalClaims when it is a stratum but not a
+    column. Samplers with the same settings built on different workers (with different
+    seeds) can be merged.
+    """
+
+    def __init__(self, size=5000, claim_size=None, strata=DEFAULT_STRATA, seed=0, weight_col=WEIGHT_COL):
+        if size < 1:
+            raise ValueError("size must be at least 1.")
+        self.size = size
+        self.claim_size = claim_size
+        self.strata = list(strata)
+        self.seed = seed
+        self.weight_col = weight_col
+        self.rng = np.random.default_rng(seed)
+        self.population = pd.Series(dtype=np.int64)
+        self.stratum_keys = {}
+        self.reservoir = None
+        self.categories = {}
+        self.rows_seen = 0
+
+    def _stratum_frame(self, chunk):
+        columns = {}
+        for col in self.strata:
+            if col in chunk.columns:
+                columns[col] = chunk[col]
+            elif col == 'HasClaim' and 'TotalClaims' in chunk.columns:
+                columns[col] = (chunk['TotalClaims'] > 0).astype(np.int8)
+            else:
+                raise ValueError(f"Stratum column {col} not found in chunk.")
+        return pd.DataFrame(columns, index=chunk.index)
+
+    def _capacity(self, key):
+        if 'HasClaim' in self.strata and key[self.strata.index('HasClaim')] == 1:
+            return np.inf if self.claim_size is None else self.claim_size
+        return self.size
+
+    def _keep_smallest(self, frame):
+        """Keeps the rows with the smallest keys of each stratum, up to its capacity."""
+        frame = frame.sort_values([_STRATUM, _KEY], kind='stable')
+        capacity = np.array([self._capacity(key) for key in self.stratum_keys])
+        rank = frame.groupby(_STRATUM, sort=False).cumcount().to_numpy()
+        return frame[rank < capacity[frame[_STRATUM].to_numpy()]]
+
+    def update(self, chunk):
+        """Adds one chunk to the reservoir."""
+        strata = self._stratum_frame(chunk)
+        grouper = strata.groupby(self.strata, dropna=False, observed=True, sort=False)
+        local_ids = grouper.ngroup().to_numpy()
+        sizes = grouper.size()
+        keys = [key if isinstance(key, tuple) else (key,) for key in sizes.index]
+        # Categorical and plain values of the same stratum share one id
+        keys = [tuple(None if pd.isna(v) else (v.item() if hasattr(v, 'item') else v) for v in key) for key in keys]
+        global_ids = np.array([self.stratum_keys.setdefault(key, len(self.stratum_keys)) for key in keys])
+        self.population = self.population.add(pd.Series(sizes.to_numpy(), index=global_ids), fill_value=0).astype(np.int64)
+
+        for col in chunk.columns:
+            if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                self.categories.setdefault(col, {}).update(dict.fromkeys(chunk[col].cat.categories))
+
+        candidates = chunk.assign(**{_KEY: self.rng.random(len(chunk)), _STRATUM: global_ids[local_ids],
+                                     _ROW: np.arange(self.rows_seen, self.rows_seen + len(chunk))})
+        self.rows_seen += len(chunk)
+        candidates = self._keep_smallest(candidates)
+        frames = [self.reservoir, candidates] if self.reservoir is not None else [candidates]
+        self.reservoir = self._keep_smallest(pd.concat(frames, ignore_index=True)) if len(frames) > 1 else candidates
+        return self
+
+    def fit(self, chunks):
+        """Consumes an iterator of chunks, e.g. DataLoader.load_data(..., typed=True, chunksize=...)."""
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def merge(self, other):
+        """
+        Merges a sampler with the same strata and sizes that saw other rows (the bottom-k of
+        the union is the bottom-k of both reservoirs). Row order follows self, then other.
+        """
+        if (other.strata, other.size, other.claim_size) != (self.strata, self.size, self.claim_size):
+            raise ValueError("Cannot merge samplers with different strata or sizes.")
+        if other.reservoir is None:
+            return self
+        remap = np.array([self.stratum_keys.setdefault(key, len(self.stratum_keys)) for key in other.stratum_keys])
+        population = pd.Series(other.population.to_numpy(), index=remap[other.population.index.to_numpy()])
+        self.population = self.population.add(population, fill_value=0).astype(np.int64)
+        for col, categories in other.categories.items():
+            self.categories.setdefault(col, {}).update(categories)
+        reservoir = other.reservoir.assign(**{_STRATUM: remap[other.reservoir[_STRATUM].to_numpy()],
+                                              _ROW: other.reservoir[_ROW] + self.rows_seen})
+        self.rows_seen += other.rows_seen
+        frames = [self.reservoir, reservoir] if self.reservoir is not None else [reservoir]
+        self.reservoir = self._keep_smallest(pd.concat(frames, ignore_index=True))
+        return self
+
+    def stratum_summary(self):
+        """Population and sampled rows and the weight of every stratum."""
+        if self.reservoir is None:
+            raise ValueError("No data sampled yet.")
+        sampled = self.reservoir[_STRATUM].value_counts()
+        index = pd.MultiIndex.from_tuples(list(self.stratum_keys), names=self.strata)
+        summary = pd.DataFrame({'Population': self.population.reindex(range(len(index)), fill_value=0).to_numpy(),
+                                'Sampled': sampled.reindex(range(len(index)), fill_value=0).to_numpy()}, index=index)
+        summary['Weight'] = summary['Population'] / summary['Sampled'].replace(0, np.nan)
+        return summary.sort_index()
+
+    def sample(self):
+        """
+        The sampled rows in their original order, with the weight column (population /
+        sampled rows of the row's stratum). Categorical columns keep the categories of the input.
+        """
+        if self.reservoir is None:
+            raise ValueError("No data sampled yet.")
+        reservoir = self.reservoir.sort_values(_ROW)
+        sampled = reservoir[_STRATUM].value_counts()
+        weights = self.population / sampled.reindex(self.population.index)
+        data = reservoir.drop(columns=[_KEY, _STRATUM, _ROW])
+        for col, categories in self.categories.items():
+            data[col] = pd.Categorical(data[col], categories=list(categories))
+        data[self.weight_col] = weights.reindex(reservoir[_STRATUM]).to_numpy()
+        return data.reset_index(drop=True)
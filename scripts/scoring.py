@@ -0,0 +1,196 @@
+"""
+Frequency x severity scoring of new policies.
+
+Loads a fitted FeaturePipeline with the frequency (HasClaim) classifier and the severity
+(TotalClaims) regressor, and scores policy records in batches from a file, stdin or a
+local HTTP endpoint.
+
+Usage:
+    python scoring.py --model scorer.joblib --input policies.txt --output scores.txt
+    cat policies.txt | python scoring.py --model scorer.joblib --input - --output -
+    python scoring.py --model scorer.joblib --serve --port 8080
+"""
+
+import argparse
+import json
+import sys
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+from utils import iter_typed_chunks, coerce_schema
+
+# Identifier columns copied through to the scored output when present
+ID_COLS = ['UnderwrittenCoverID', 'PolicyID']
+
+
+class PolicyScorer:
+    """
+    Scores policies as P(claim) x expected severity.
+
+    RiskPremium = PurePremium * (1 + loading), where PurePremium = ClaimProbability * ExpectedSeverity.
+    Batches are transformed and predicted on a thread pool of n_workers.
+    """
+
+    def __init__(self, pipeline, freq_model, sev_model, loading=0.0, batch_size=50_000, n_workers=1):
+        self.pipeline = pipeline
+        self.freq_model = freq_model
+        self.sev_model = sev_model
+        self.loading = loading
+        self.batch_size = batch_size
+        self.n_workers = n_workers
+        self.stats = {'rows': 0, 'seconds': 0.0}
+        self.explainers = {}
+
+    def save(self, path):
+        """Saves the pipeline, both models and the loading as one bundle."""
+        joblib.dump({'pipeline': self.pipeline, 'freq_model': self.freq_model,
+                     'sev_model': self.sev_model, 'loading': self.loading}, path)
+
+    @classmethod
+    def load(cls, path, batch_size=50_000, n_workers=1):
+        bundle = joblib.load(path)
+        return cls(bundle['pipeline'], bundle['freq_model'], bundle['sev_model'],
+                   loading=bundle.get('loading', 0.0), batch_size=batch_size, n_workers=n_workers)
+
+    def score(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Scores one batch of typed policy records."""
+        X = self.pipeline.transform(data)
+        if isinstance(X, pd.DataFrame):
+            # Convert once for both models; the column layout is fixed by the pipeline
+            X = X.to_numpy(dtype=np.float32)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            probability = self.freq_model.predict_proba(X)[:, 1]
+            # Claim amounts cannot be negative
+            severity = np.maximum(0, self.sev_model.predict(X))
+        scores = data[[col for col in ID_COLS if col in data.columns]].copy()
+        scores['ClaimProbability'] = probability
+        scores['ExpectedSeverity'] = severity
+        scores['PurePremium'] = probability * severity
+        scores['RiskPremium'] = scores['PurePremium'] * (1 + self.loading)
+        return scores
+
+    def explain(self, data: pd.DataFrame, top_k=5, target='frequency', **explainer_kwargs):
+        """
+        Top top_k factors behind the frequency (or severity) prediction of each policy in data,
+        named by original column. The QuoteExplainer is built on first use and reused.
+        """
+        if target not in ('frequency', 'severity'):
+            raise ValueError(f"Unknown target: {target}. Use 'frequency' or 'severity'.")
+        if target not in self.explainers:
+            from feature_importance import QuoteExplainer
+            model = self.freq_model if target == 'frequency' else self.sev_model
+            self.explainers[target] = QuoteExplainer(model, self.pipeline.feature_names,
+                                                     getattr(self.pipeline, 'feature_sources', None),
+                                                     **explainer_kwargs)
+        explanation = self.explainers[target].explain(self.pipeline.transform(data), top_k=top_k)
+        ids = data[[col for col in ID_COLS if col in data.columns]]
+        if not ids.empty:
+            explanation = explanation.join(ids, on='Row')
+        return explanation
+
+    def score_batches(self, batches):
+        """
+        Scores an iterable of batches in order, n_workers at a time, updating self.stats.
+        At most 2 x n_workers batches are read ahead, so a lazy iterable (e.g. file chunks)
+        is never pulled into memory as a whole.
+        """
+        start = time.perf_counter()
+        if self.n_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+                pending = deque()
+                for batch in batches:
+                    pending.append(executor.submit(self.score, batch))
+                    if len(pending) >= 2 * self.n_workers:
+                        scores = pending.popleft().result()
+                        self.stats['rows'] += len(scores)
+                        yield scores
+                while pending:
+                    scores = pending.popleft().result()
+                    self.stats['rows'] += len(scores)
+                    yield scores
+        else:
+            for batch in batches:
+                scores = self.score(batch)
+                self.stats['rows'] += len(scores)
+                yield scores
+        self.stats['seconds'] += time.perf_counter() - start
+
+    def score_stream(self, source, output):
+        """
+        Streams pipe-delimited records from source (path or file-like) in batch_size chunks
+        and writes the scores to output (path or file-like). Returns the throughput stats.
+        """
+        header = True
+        for scores in self.score_batches(iter_typed_chunks(source, self.batch_size)):
+            scores.to_csv(output, sep='|', index=False, header=header, mode='w' if header else 'a')
+            header = False
+        return self.report()
+
+    def report(self):
+        rows, seconds = self.stats['rows'], self.stats['seconds']
+        rate = rows / seconds if seconds else float('nan')
+        print(f"Scored {rows} policies in {seconds:.2f}s ({rate:,.0f} policies/s)", file=sys.stderr)
+        return {'rows': rows, 'seconds': seconds, 'rows_per_second': rate}
+
+
+def serve(scorer, host='127.0.0.1', port=8080):
+    """
+    Local HTTP stand-in: POST a JSON list of policy records to /score and get the scores back.
+    """
+    class ScoreHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/score':
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                records = json.loads(self.rfile.read(length))
+                scores = scorer.score(coerce_schema(pd.DataFrame.from_records(records)))
+                body = scores.to_json(orient='records').encode()
+            except (ValueError, KeyError) as exc:
+                self.send_error(400, str(exc))
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), ScoreHandler)
+    print(f"Serving scores on http://{host}:{port}/score", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score policies with frequency x severity models.")
+    parser.add_argument('--model', required=True, help="Bundle saved with PolicyScorer.save")
+    parser.add_argument('--input', default='-', help="Pipe-delimited policy file, or - for stdin")
+    parser.add_argument('--output', default='-', help="Output file, or - for stdout")
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--serve', action='store_true', help="Run the local HTTP endpoint instead")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    scorer = PolicyScorer.load(args.model, batch_size=args.batch_size, n_workers=args.workers)
+    if args.serve:
+        serve(scorer, args.host, args.port)
+        return
+    source = sys.stdin if args.input == '-' else args.input
+    output = sys.stdout if args.output == '-' else args.output
+    scorer.score_stream(source, output)
+
+
+if __name__ == '__main__':
+    main()
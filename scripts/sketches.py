@@ -0,0 +1,225 @@
+"""
+Mergeable streaming sketches for profiling numerical columns out of core.
+
+MomentSketch keeps count, mean and variance (Welford/Chan updates), QuantileSketch keeps
+log-spaced bucket counts with a fixed relative error on every quantile (DDSketch). Both are
+built in one pass over chunks and can be merged across workers; NumericProfiler bundles
+them per column and produces describe()/variability tables and univariate plot summaries.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _finite(values):
+    x = np.asarray(values, dtype=float)
+    return x[np.isfinite(x)]
+
+
+class MomentSketch:
+    """Count, mean, variance, min and max, updated per chunk and mergeable (Chan et al.)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _combine(self, count, mean, m2, lo, hi):
+        if not count:
+            return self
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+        return self
+
+    def update(self, values):
+        """Adds the finite entries of values."""
+        x = _finite(values)
+        if not len(x):
+            return self
+        mean = x.mean()
+        return self._combine(len(x), mean, ((x - mean) ** 2).sum(), x.min(), x.max())
+
+    def merge(self, other):
+        return self._combine(other.count, other.mean, other.m2, other.min, other.max)
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1, as pandas)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """
+    DDSketch-style quantile sketch: values are counted in logarithmic buckets of width
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy), so every quantile estimate
+    is within relative_accuracy of the true value. Sketches with the same accuracy merge
+    by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1.")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.min_value = min_value
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _add(self, store, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        """Adds the finite entries of values."""
+        x = _finite(values)
+        if not len(x):
+            return self
+        self._add(self.positive, x[x >= self.min_value])
+        self._add(self.negative, -x[x <= -self.min_value])
+        self.zero_count += int((np.abs(x) < self.min_value).sum())
+        self.count += len(x)
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy.")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _bucket_value(self, keys):
+        return 2 * self.gamma ** np.asarray(keys, dtype=float) / (self.gamma + 1)
+
+    def support(self):
+        """
+        Returns (values, counts): one representative value per non-empty bucket, ascending,
+        clipped to the observed min/max. Usable as a weighted sample of the column.
+        """
+        neg_keys = sorted(self.negative, reverse=True)
+        pos_keys = sorted(self.positive)
+        values = np.concatenate([-self._bucket_value(neg_keys), [0.0] if self.zero_count else [],
+                                 self._bucket_value(pos_keys)])
+        counts = np.array([self.negative[k] for k in neg_keys] + ([self.zero_count] if self.zero_count else [])
+                          + [self.positive[k] for k in pos_keys], dtype=np.int64)
+        return np.clip(values, self.min, self.max), counts
+
+    def quantile(self, q):
+        """Approximate q-quantile(s); q may be a scalar or an array in [0, 1]."""
+        if not self.count:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        values, counts = self.support()
+        rank = np.asarray(q, dtype=float) * (self.count - 1)
+        idx = np.minimum(np.searchsorted(np.cumsum(counts), rank, side='right'), len(values) - 1)
+        result = values[idx]
+        # The extremes are tracked exactly
+        result = np.where(rank <= 0, self.min, np.where(rank >= self.count - 1, self.max, result))
+        return result if np.ndim(q) else float(result)
+
+
+class NumericProfiler:
+    """
+    One-pass profile of numerical columns over a stream of chunks: a MomentSketch and a
+    QuantileSketch per column. Profilers built on different workers can be merged.
+    """
+
+    def __init__(self, columns, relative_accuracy=0.01):
+        self.columns = list(columns)
+        self.relative_accuracy = relative_accuracy
+        self.moments = {col: MomentSketch() for col in self.columns}
+        self.quantiles = {col: QuantileSketch(relative_accuracy) for col in self.columns}
+        self.rows = 0
+
+    def update(self, chunk):
+        """Adds one chunk; columns missing from the chunk are skipped."""
+        for col in self.columns:
+            if col in chunk.columns:
+                values = chunk[col].to_numpy(dtype=float, na_value=np.nan)
+                self.moments[col].update(values)
+                self.quantiles[col].update(values)
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        for col in other.columns:
+            if col not in self.moments:
+                self.columns.append(col)
+                self.moments[col] = MomentSketch()
+                self.quantiles[col] = QuantileSketch(self.relative_accuracy)
+            self.moments[col].merge(other.moments[col])
+            self.quantiles[col].merge(other.quantiles[col])
+        self.rows += other.rows
+        return self
+
+    def fit(self, chunks):
+        """Consumes an iterator of chunks, e.g. DataLoader.load_data(..., typed=True, chunksize=...)."""
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def describe(self):
+        """Approximate equivalent of data[columns].describe() (quartiles from the sketches)."""
+        table = {}
+        for col in self.columns:
+            m = self.moments[col]
+            q1, med, q3 = self.quantiles[col].quantile([0.25, 0.5, 0.75])
+            table[col] = {'count': m.count, 'mean': m.mean if m.count else np.nan, 'std': m.std,
+                          'min': m.min if m.count else np.nan, '25%': q1, '50%': med, '75%': q3,
+                          'max': m.max if m.count else np.nan}
+        return pd.DataFrame(table)
+
+    def variability(self):
+        """Mean, median, std and coefficient of variation per column."""
+        desc = self.describe()
+        table = desc.loc[['mean', '50%', 'std']].rename(index={'50%': 'median'})
+        cv = (table.loc['std'] / table.loc['mean']).to_frame().T
+        cv.index = ['CV']
+        return pd.concat([table, cv])
+
+    def box_stats(self, col, whis=1.5):
+        """
+        Quantile summary of col in the form ax.bxp() draws (see plot.box_stats). Whiskers
+        and fliers are bucket representatives, one flier per non-empty outlying bucket.
+        """
+        sketch = self.quantiles[col]
+        if not sketch.count:
+            return None
+        q1, med, q3 = sketch.quantile([0.25, 0.5, 0.75])
+        lo, hi = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+        values, _ = sketch.support()
+        inside = values[(values >= lo) & (values <= hi)]
+        return {'label': col, 'med': med, 'q1': q1, 'q3': q3,
+                'whislo': inside.min() if len(inside) else q1, 'whishi': inside.max() if len(inside) else q3,
+                'fliers': values[(values < lo) | (values > hi)]}
+
+    def histogram_summary(self, col, bins=30, transform=None, kde=True):
+        """Binned histogram of col (optionally of transform(col), e.g. np.log1p) from the sketch."""
+        from plot import histogram_summary
+        values, counts = self.quantiles[col].support()
+        if transform is not None:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = transform(values)
+        return histogram_summary(values, bins=bins, kde=kde, weights=counts)
@@ -0,0 +1,208 @@
+"""
+Synthetic insurance policy data in the MachineLearningRating_v3 schema.
+
+Generates pipe-delimited files with the raw column layout (see
+data_preprocessing.COLUMN_GROUPS), realistic cardinalities (about 900 postal codes with a
+skewed volume, about 45 makes and 400 models with consistent vehicle specs), a claim
+frequency of about 0.3% with heavy-tailed claim amounts, and the raw file's missing-value
+rates. Rows are generated in chunks, so files of 10M rows fit in constant memory.
+
+Usage:
+    python synthetic_data.py --rows 1000000 --output ../data/synthetic_1m.txt
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from data_preprocessing import COLUMN_GROUPS
+
+COLUMNS = [col for cols in COLUMN_GROUPS.values() for col in cols]
+
+# Approximate share of missing values per column in the raw extract
+MISSING_RATES = {
+    'Bank': 0.146, 'AccountType': 0.040, 'MaritalStatus': 0.008, 'Gender': 0.010,
+    'mmcode': 0.0006, 'VehicleType': 0.0006, 'make': 0.0006, 'Model': 0.0006, 'Cylinders': 0.0006,
+    'cubiccapacity': 0.0006, 'kilowatts': 0.0006, 'bodytype': 0.0006, 'NumberOfDoors': 0.0006,
+    'VehicleIntroDate': 0.0006, 'CustomValueEstimate': 0.780, 'CapitalOutstanding': 0.00002,
+    'NewVehicle': 0.153, 'WrittenOff': 0.642, 'Rebuilt': 0.642, 'Converted': 0.642,
+    'CrossBorder': 0.9993, 'NumberOfVehiclesInFleet': 1.0,
+}
+
+PROVINCES = ['Gauteng', 'Western Cape', 'KwaZulu-Natal', 'North West', 'Mpumalanga',
+             'Eastern Cape', 'Limpopo', 'Free State', 'Northern Cape']
+PROVINCE_SHARES = [0.39, 0.17, 0.17, 0.14, 0.05, 0.03, 0.02, 0.02, 0.01]
+MONTHS = pd.date_range('2013-10-01', '2015-08-01', freq='MS')
+
+
+def _choice(rng, values, n, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=p)]
+
+
+def _zipf_shares(n, exponent=1.1):
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def reference_tables(seed=0, n_postal_codes=888, n_models=411, n_makes=46):
+    """
+    Fixed lookups shared by every chunk of a file: the postal codes and the per-model vehicle
+    specs (so make/mmcode/engine columns stay consistent for a model).
+    """
+    rng = np.random.default_rng(seed + 1_000_003)
+    return {'postal_codes': np.sort(rng.choice(np.arange(1, 10000), n_postal_codes, replace=False)),
+            'vehicles': _vehicle_table(rng, n_models, n_makes)}
+
+
+def _vehicle_table(rng, n_models, n_makes):
+    make_of_model = rng.choice(n_makes, n_models, p=_zipf_shares(n_makes))
+    cylinders = rng.choice([4.0, 6.0, 8.0], n_models, p=[0.9, 0.08, 0.02])
+    cubic = np.round(rng.normal(1000 + 400 * cylinders, 250, n_models).clip(800, 6000), -1)
+    return pd.DataFrame({
+        'make': [f"MAKE {m:02d}" for m in make_of_model],
+        'Model': [f"MODEL {i:03d}" for i in range(n_models)],
+        'mmcode': rng.integers(4_000_000, 65_000_000, n_models).astype(float),
+        'VehicleType': _choice(rng, ['Passenger Vehicle', 'Medium Commercial', 'Heavy Commercial',
+                                     'Light Commercial', 'Bus'], n_models, p=[0.9, 0.06, 0.02, 0.01, 0.01]),
+        'Cylinders': cylinders,
+        'cubiccapacity': cubic,
+        'kilowatts': np.round(cubic / 20 + rng.normal(0, 10, n_models)).clip(40, 400),
+        'bodytype': _choice(rng, ['B/S', 'S/D', 'H/B', 'D/S', 'S/C', 'P/V'], n_models,
+                            p=[0.6, 0.15, 0.1, 0.08, 0.05, 0.02]),
+        'NumberOfDoors': _choice(rng, [4.0, 5.0, 2.0, 3.0], n_models, p=[0.75, 0.15, 0.05, 0.05]).astype(float),
+        'VehicleIntroDate': [f"{m}/{y}" for m, y in zip(rng.integers(1, 13, n_models), rng.integers(1988, 2015, n_models))],
+    })
+
+
+def generate_policies(n_rows, seed=0, claim_frequency=0.003, missing_rates=None, tables=None):
+    """
+    Returns n_rows raw (untyped, as read from the pipe-delimited file) synthetic policy rows.
+    seed is an int or a np.random.SeedSequence; tables are the reference_tables() to draw
+    postal codes and vehicles from (by default those of seed, or of its entropy).
+    """
+    rng = np.random.default_rng(seed)
+    if tables is None:
+        tables = reference_tables(seed.entropy if isinstance(seed, np.random.SeedSequence) else seed)
+    vehicles, postal_codes = tables['vehicles'], tables['postal_codes']
+    missing_rates = MISSING_RATES if missing_rates is None else missing_rates
+    n = n_rows
+
+    province = _choice(rng, PROVINCES, n, p=PROVINCE_SHARES)
+    postal_code = postal_codes[rng.choice(len(postal_codes), n, p=_zipf_shares(len(postal_codes)))]
+    vehicle = vehicles.iloc[rng.choice(len(vehicles), n, p=_zipf_shares(len(vehicles), 0.9))].reset_index(drop=True)
+
+    sum_insured = np.round(np.exp(rng.normal(11.3, 1.3, n)), 2)
+    premium_per_term = np.round(sum_insured * np.exp(rng.normal(-6.5, 0.8, n)), 2)
+    # Most monthly transactions carry no premium; the rest spread around the term premium
+    total_premium = np.where(rng.random(n) < 0.45, 0.0, premium_per_term * rng.uniform(0.5, 1.0, n) / 1.15)
+    has_claim = rng.random(n) < claim_frequency
+    # Heavy-tailed severity: lognormal body with a Pareto tail
+    severity = np.where(rng.random(n) < 0.9, np.exp(rng.normal(9.5, 1.2, n)), 40_000 * (1 + rng.pareto(1.3, n)))
+    total_claims = np.where(has_claim, np.round(severity, 2), 0.0)
+
+    df = pd.DataFrame({
+        'UnderwrittenCoverID': rng.integers(1, 301_175, n),
+        'PolicyID': rng.integers(1, 23_247, n),
+        'TransactionMonth': _choice(rng, MONTHS.strftime('%Y-%m-%d 00:00:00'), n, p=_zipf_shares(len(MONTHS), 0.3)[::-1]),
+        'IsVATRegistered': rng.random(n) < 0.006,
+        'Citizenship': _choice(rng, ['  ', 'ZA', 'AF', 'ZW'], n, p=[0.9, 0.09, 0.005, 0.005]),
+        'LegalType': _choice(rng, ['Individual', 'Close Corporation', 'Private company', 'Public company',
+                                   'Partnership', 'Sole proprietor'], n, p=[0.9, 0.05, 0.03, 0.01, 0.005, 0.005]),
+        'Title': _choice(rng, ['Mr', 'Mrs', 'Ms', 'Miss', 'Dr'], n, p=[0.93, 0.04, 0.02, 0.009, 0.001]),
+        'Language': 'English',
+        'Bank': _choice(rng, ['First National Bank', 'Standard Bank', 'ABSA Bank', 'Nedbank', 'Capitec Bank',
+                              'Investec Bank', 'African Bank'], n, p=[0.35, 0.25, 0.2, 0.1, 0.05, 0.03, 0.02]),
+        'AccountType': _choice(rng, ['Current account', 'Savings account', 'Transmission account'], n,
+                               p=[0.6, 0.3, 0.1]),
+        'MaritalStatus': _choice(rng, ['Not specified', 'Single', 'Married'], n, p=[0.99, 0.007, 0.003]),
+        'Gender': _choice(rng, ['Not specified', 'Male', 'Female'], n, p=[0.95, 0.04, 0.01]),
+        'Country': 'South Africa',
+        'Province': province,
+        'PostalCode': postal_code,
+        'MainCrestaZone': _choice(rng, [f"Zone {i:02d}" for i in range(16)], n, p=_zipf_shares(16, 0.8)),
+        'SubCrestaZone': _choice(rng, [f"Subzone {i:02d}" for i in range(45)], n, p=_zipf_shares(45, 0.8)),
+        'ItemType': 'Mobility - Motor',
+        'mmcode': vehicle['mmcode'].to_numpy(),
+        'VehicleType': vehicle['VehicleType'].to_numpy(),
+        'RegistrationYear': rng.integers(1987, 2016, n),
+        'make': vehicle['make'].to_numpy(),
+        'Model': vehicle['Model'].to_numpy(),
+        'Cylinders': vehicle['Cylinders'].to_numpy(),
+        'cubiccapacity': vehicle['cubiccapacity'].to_numpy(),
+        'kilowatts': vehicle['kilowatts'].to_numpy(),
+        'bodytype': vehicle['bodytype'].to_numpy(),
+        'NumberOfDoors': vehicle['NumberOfDoors'].to_numpy(),
+        'VehicleIntroDate': vehicle['VehicleIntroDate'].to_numpy(),
+        'CustomValueEstimate': np.round(sum_insured * rng.uniform(0.8, 1.2, n), 2),
+        'AlarmImmobiliser': _choice(rng, ['Yes', 'No'], n, p=[0.99, 0.01]),
+        'TrackingDevice': _choice(rng, ['Yes', 'No'], n, p=[0.25, 0.75]),
+        'CapitalOutstanding': np.where(rng.random(n) < 0.5, '0', np.round(sum_insured * 0.8).astype(np.int64).astype(str)),
+        'NewVehicle': _choice(rng, ['More than 6 months', 'Less than 6 months'], n, p=[0.99, 0.01]),
+        'WrittenOff': _choice(rng, ['No', 'Yes'], n, p=[0.999, 0.001]),
+        'Rebuilt': _choice(rng, ['No', 'Yes'], n, p=[0.999, 0.001]),
+        'Converted': _choice(rng, ['No', 'Yes'], n, p=[0.999, 0.001]),
+        'CrossBorder': 'No',
+        'NumberOfVehiclesInFleet': np.nan,
+        'SumInsured': sum_insured,
+        'TermFrequency': _choice(rng, ['Monthly', 'Annual'], n, p=[0.99, 0.01]),
+        'CalculatedPremiumPerTerm': premium_per_term,
+        'ExcessSelected': _choice(rng, ['Mobility - Windscreen', 'No excess', 'Mobility - Metered Taxis - R2000',
+                                        'Mobility - Taxi with value more than R100 000'], n, p=[0.55, 0.3, 0.1, 0.05]),
+        'CoverCategory': _choice(rng, ['Windscreen', 'Own damage', 'Third Party', 'Passenger Liability',
+                                       'Signage and Vehicle Wraps', 'Keys and Alarms'], n,
+                                 p=[0.3, 0.25, 0.15, 0.12, 0.1, 0.08]),
+        'CoverType': _choice(rng, ['Windscreen', 'Own Damage', 'Third Party', 'Passenger Liability',
+                                   'Signage and Vehicle Wraps', 'Keys and Alarms'], n,
+                             p=[0.3, 0.25, 0.15, 0.12, 0.1, 0.08]),
+        'CoverGroup': _choice(rng, ['Comprehensive - Taxi', 'Motor Comprehensive', 'Basic Excess Waiver'], n,
+                              p=[0.6, 0.39, 0.01]),
+        'Section': _choice(rng, ['Motor Comprehensive', 'Optional Extended Covers', 'Third Party Only'], n,
+                           p=[0.95, 0.04, 0.01]),
+        'Product': _choice(rng, ['Mobility Metered Taxis: Monthly', 'Mobility Commercial Cover: Monthly',
+                                 'Standalone passenger liability'], n, p=[0.6, 0.39, 0.01]),
+        'StatutoryClass': 'Commercial',
+        'StatutoryRiskType': 'IFRS Constant',
+        'TotalPremium': np.round(total_premium, 2),
+        'TotalClaims': total_claims,
+    }, columns=COLUMNS)
+
+    for col, rate in missing_rates.items():
+        if col in df.columns and rate > 0:
+            mask = rng.random(n) < rate
+            if mask.any():
+                df[col] = df[col].astype(object).where(~mask, None) if df[col].dtype.kind in 'OUT' \
+                    else df[col].where(~mask)
+    return df
+
+
+def write_policies(output_path, n_rows, seed=0, chunk_rows=1_000_000, **kwargs):
+    """
+    Writes n_rows synthetic rows to output_path (pipe-delimited, like the raw extract),
+    chunk_rows at a time. Each chunk draws from its own child of SeedSequence(seed), so a file
+    is reproducible for a given seed and files with different seeds share no chunks.
+    """
+    tables = reference_tables(seed)
+    starts = range(0, n_rows, chunk_rows)
+    written = 0
+    for i, (start, chunk_seed) in enumerate(zip(starts, np.random.SeedSequence(seed).spawn(len(starts)))):
+        chunk = generate_policies(min(chunk_rows, n_rows - start), seed=chunk_seed, tables=tables, **kwargs)
+        chunk.to_csv(output_path, sep='|', index=False, header=(i == 0), mode='w' if i == 0 else 'a')
+        written += len(chunk)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic MachineLearningRating_v3-style policy data.")
+    parser.add_argument('--rows', type=int, required=True, help="Number of rows to generate")
+    parser.add_argument('--output', required=True, help="Pipe-delimited output file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--claim-frequency', type=float, default=0.003)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    written = write_policies(args.output, args.rows, seed=args.seed, chunk_rows=args.chunk_rows,
+                             claim_frequency=args.claim_frequency)
+    print(f"Wrote {written} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,178 @@
-import pandas as pd 
+import pandas as pd
+import numpy as np
 import os
+import re
+import json
+import hashlib
+import inspect
+from pandas.tseries.api import guess_datetime_format
+
+# Columns stored as pandas categories when loading with a schema
+CATEGORICAL_COLS = [
+    'IsVATRegistered', 'Citizenship', 'LegalType', 'Title', 'Language',
+    'Bank', 'AccountType', 'MaritalStatus', 'Gender', 'Country',
+    'Province', 'PostalCode', 'MainCrestaZone', 'SubCrestaZone', 'ItemType', 'VehicleType',
+    'make', 'Model', 'bodytype', 'AlarmImmobiliser', 'TrackingDevice',
+    'TermFrequency', 'CoverCategory', 'CoverType', 'CoverGroup',
+    'Section', 'Product', 'StatutoryClass', 'StatutoryRiskType', 'WrittenOff', 'Rebuilt', 'Converted'
+]
+
+# Other low-cardinality text columns, also read as categories to avoid object storage
+EXTRA_CATEGORICAL_COLS = ['NewVehicle', 'ExcessSelected', 'CrossBorder']
+
+# Compact numeric dtypes; money columns stay float64 so portfolio sums keep their precision
+NUMERIC_DTYPES = {
+    'UnderwrittenCoverID': 'int32',
+    'PolicyID': 'int32',
+    'mmcode': 'float64',
+    'RegistrationYear': 'int16',
+    'Cylinders': 'float32',
+    'cubiccapacity': 'float32',
+    'kilowatts': 'float32',
+    'NumberOfDoors': 'float32',
+    'CustomValueEstimate': 'float64',
+    'NumberOfVehiclesInFleet': 'float32',
+    'SumInsured': 'float64',
+    'CalculatedPremiumPerTerm': 'float64',
+    'TotalPremium': 'float64',
+    'TotalClaims': 'float64',
+}
+
+# Read as text, then coerced (the raw file mixes numbers and free text in these)
+COERCED_NUMERIC_COLS = ['CapitalOutstanding']
+
+DATE_COLS = ['TransactionMonth', 'VehicleIntroDate']
+
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.feather': 'feather'}
+
+
+def schema_dtypes(usecols=None):
+    """
+    Returns the read_csv dtype mapping for the raw file, restricted to usecols if given.
+    """
+    dtypes = {col: 'category' for col in CATEGORICAL_COLS + EXTRA_CATEGORICAL_COLS}
+    dtypes.update(NUMERIC_DTYPES)
+    dtypes.update({col: 'str' for col in COERCED_NUMERIC_COLS})
+    if usecols is not None:
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in usecols}
+    return dtypes
+
+
+def parse_dates(series, errors='coerce'):
+    """
+    Parses a date column once per distinct value instead of once per row. The format is
+    guessed from the first value; values it does not fit fall back to format='mixed'.
+    Columns that are already datetimes are returned unchanged.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Index(np.asarray(uniques, dtype=object), dtype=object).astype(str)
+    fmt = guess_datetime_format(uniques[0]) if len(uniques) else None
+    if fmt:
+        parsed = pd.Series(pd.to_datetime(uniques, format=fmt, errors='coerce'))
+        failed = parsed.isna().to_numpy()
+        if failed.any():
+            parsed[failed] = pd.to_datetime(uniques[failed], format='mixed', errors=errors)
+    else:
+        parsed = pd.Series(pd.to_datetime(uniques, format='mixed', errors=errors))
+    values = pd.DatetimeIndex(parsed).take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def apply_schema(df):
+    """
+    Finishes typing a frame read with schema_dtypes: coerces text-encoded numerics and parses dates.
+    """
+    for col in COERCED_NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in DATE_COLS:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+    return df
+
+
+def coerce_schema(df):
+    """
+    Casts an untyped frame (e.g. built from JSON records) to the loader schema so it matches
+    frames read with typed=True. Category columns are keyed on their string values.
+    """
+    for col, dtype in schema_dtypes(df.columns).items():
+        if dtype == 'category':
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str)).astype('category')
+        elif dtype != 'str':
+            values = pd.to_numeric(df[col], errors='coerce')
+            # Integer columns with gaps cannot hold NaN, so they stay float
+            df[col] = values.astype(dtype if dtype.startswith('float') or not values.isna().any() else 'float64')
+    return apply_schema(df)
+
+
+def iter_typed_chunks(source, chunksize, usecols=None, engine='c'):
+    """
+    Yields typed chunks from a pipe-delimited path or file-like object (e.g. sys.stdin).
+    """
+    # low_memory parsing unions the categories of its internal blocks, which fails when a
+    # block's categories are inferred with another dtype (e.g. all-numeric codes)
+    read_kwargs = dict(sep='|', usecols=usecols, dtype=schema_dtypes(usecols), engine=engine, low_memory=False)
+    with pd.read_csv(source, chunksize=chunksize, **read_kwargs) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk)
+
+
+def frame_memory(obj):
+    """
+    Returns the bytes held by a DataFrame or Series (object columns measured deeply).
+    """
+    if obj is None:
+        return 0
+    usage = obj.memory_usage(deep=True)
+    return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+
+
+def dvc_md5(file_path):
+    """
+    Returns the md5 recorded for file_path in its DVC pointer file (file_path + '.dvc').
+    Falls back to a size/mtime fingerprint when the file is not DVC tracked.
+    """
+    dvc_path = file_path + '.dvc'
+    if os.path.exists(dvc_path):
+        with open(dvc_path) as f:
+            match = re.search(r'md5:\s*([0-9a-f]{32})', f.read())
+        if match:
+            return match.group(1)
+    stat = os.stat(file_path)
+    return hashlib.md5(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+def read_columnar(file_path, columns=None):
+    """
+    Memory-maps a Parquet or Feather file and reads only the requested columns.
+    """
+    fmt = COLUMNAR_FORMATS.get(os.path.splitext(file_path)[1])
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(file_path, columns=columns, memory_map=True)
+    elif fmt == 'feather':
+        import pyarrow.feather as feather
+        table = feather.read_table(file_path, columns=columns, memory_map=True)
+    else:
+        raise ValueError(f"Not a columnar file: {file_path}")
+    return table.to_pandas()
+
+
+def write_columnar(df, output_path):
+    """
+    Writes df as Parquet or Feather depending on the extension of output_path.
+    """
+    fmt = COLUMNAR_FORMATS.get(os.path.splitext(output_path)[1])
+    if fmt == 'parquet':
+        df.to_parquet(output_path, index=False)
+    elif fmt == 'feather':
+        df.reset_index(drop=True).to_feather(output_path)
+    else:
+        raise ValueError(f"Not a columnar file: {output_path}")
+
 
 class DataLoader:
     """Data loader for processed reviews"""
@@ -8,20 +181,128 @@ class DataLoader:
         self.path = path
         self.df = None
 
-    def load_data(self, path=None):
-        """Load file into a DataFrame"""
+    def load_data(self, path=None, typed=False, usecols=None, chunksize=None, engine='c'):
+        """
+        Load file into a DataFrame.
+
+        With typed=True the schema is declared up front (categories, compact numerics, parsed
+        dates) so the raw object columns are never materialised. usecols limits the columns read,
+        and chunksize returns an iterator of typed chunks instead of a single frame.
+        engine is passed to read_csv ('c' or 'pyarrow'); pyarrow cannot stream chunks.
+        """
         file_path = path or self.path
         if not file_path:
             raise ValueError("No file path specified for loading data.")
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
-        self.df = pd.read_csv(file_path, sep='|', low_memory=False)
+        if os.path.splitext(file_path)[1] in COLUMNAR_FORMATS:
+            if chunksize is not None:
+                raise ValueError("chunksize is only supported for delimited text files.")
+            self.df = read_columnar(file_path, columns=usecols)
+            return self.df
+        if engine not in ('c', 'pyarrow'):
+            raise ValueError(f"Unsupported engine: {engine}. Use 'c' or 'pyarrow'.")
+        if chunksize is not None and engine == 'pyarrow':
+            raise ValueError("The pyarrow engine does not support chunksize; use engine='c'.")
+
+        if not typed:
+            if chunksize is not None:
+                return pd.read_csv(file_path, sep='|', usecols=usecols, chunksize=chunksize, low_memory=False)
+            self.df = pd.read_csv(file_path, sep='|', usecols=usecols, engine=engine,
+                                  **({} if engine == 'pyarrow' else {'low_memory': False}))
+            return self.df
+
+        if chunksize is not None:
+            return iter_typed_chunks(file_path, chunksize, usecols=usecols, engine=engine)
+
+        # See iter_typed_chunks: low_memory parsing fails to union sparse categorical columns
+        self.df = apply_schema(pd.read_csv(file_path, sep='|', usecols=usecols, dtype=schema_dtypes(usecols),
+                                           engine=engine, **({} if engine == 'pyarrow' else {'low_memory': False})))
+        return self.df
+
+    def load_sample(self, path=None, size=5000, claim_size=None, strata=None, seed=0, chunksize=200_000,
+                    usecols=None):
+        """
+        Load a stratified sample in one pass over the file (see sampling.StratifiedSampler).
+
+        size rows are kept per stratum (Province x HasClaim by default) and claim_size per
+        claim stratum (None keeps every claim row). The sample carries a SampleWeight column,
+        which the KPI summaries use to give estimates for the full file. The same seed and
+        file always give the same sample, whatever the chunksize.
+        """
+        from sampling import DEFAULT_STRATA, StratifiedSampler
+        file_path = path or self.path
+        sampler = StratifiedSampler(size=size, claim_size=claim_size, strata=strata or DEFAULT_STRATA, seed=seed)
+        self.df = sampler.fit(self.load_data(file_path, typed=True, usecols=usecols, chunksize=chunksize)).sample()
+        self.sampler = sampler
         return self.df
 
+    def load_cached(self, path=None, columns=None, cache_dir=None, fmt='parquet', preprocess=True, rebuild=False):
+        """
+        Load the typed (and optionally preprocessed) frame from a columnar cache.
+
+        The cache file is keyed on the raw file's DVC md5 and a hash of the loading and
+        preprocessing config; it is rebuilt from the raw file whenever either key changes.
+        Reads are memory-mapped and limited to the requested columns.
+        """
+        file_path = path or self.path
+        if not file_path:
+            raise ValueError("No file path specified for loading data.")
+        if fmt not in COLUMNAR_FORMATS.values():
+            raise ValueError(f"Unsupported cache format: {fmt}. Use 'parquet' or 'feather'.")
+
+        cache_path = self.cache_path(file_path, cache_dir, fmt, preprocess)
+        if rebuild or not os.path.exists(cache_path):
+            self._build_cache(file_path, cache_path, preprocess)
+
+        self.df = read_columnar(cache_path, columns=columns)
+        return self.df
+
+    def cache_path(self, file_path, cache_dir=None, fmt='parquet', preprocess=True):
+        """Returns the cache file location for the current raw file and config."""
+        cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(file_path)), 'cache')
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        if not os.path.exists(file_path) and not os.path.exists(file_path + '.dvc'):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        key = f"{dvc_md5(file_path)[:12]}-{self._config_hash(preprocess)[:12]}"
+        return os.path.join(cache_dir, f"{stem}.{key}.{fmt}")
+
+    def _config_hash(self, preprocess):
+        config = {'dtypes': schema_dtypes(), 'dates': DATE_COLS, 'preprocess': bool(preprocess)}
+        if preprocess:
+            import data_preprocessing
+            config['preprocess_source'] = hashlib.md5(inspect.getsource(data_preprocessing).encode()).hexdigest()
+        return hashlib.md5(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def _build_cache(self, file_path, cache_path, preprocess):
+        df = self.load_data(file_path, typed=True)
+        if preprocess:
+            from data_preprocessing import PreprocessData
+            df = PreprocessData(df).handle_missing_values(df)
+
+        cache_dir = os.path.dirname(cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path + '.tmp' + os.path.splitext(cache_path)[1]
+        write_columnar(df, tmp_path)
+        os.replace(tmp_path, cache_path)
+
+        # Drop caches of older raw files built with this config; other configs' caches and
+        # in-flight .tmp files of concurrent builds are left alone
+        stem, key, ext = os.path.basename(cache_path).rsplit('.', 2)
+        md5, config = key.split('-')
+        pattern = re.compile(rf"{re.escape(stem)}\.([0-9a-f]+)-{config}\.{ext}")
+        for name in os.listdir(cache_dir):
+            match = pattern.fullmatch(name)
+            if match and match.group(1) != md5:
+                os.remove(os.path.join(cache_dir, name))
+
     def save_data(self, output_path, sep=None):
-        """Save current DataFrame to CSV"""
+        """Save current DataFrame to CSV, or to Parquet/Feather for .parquet/.feather paths"""
         self.sep = sep
         if self.df is None:
             raise ValueError("No data loaded to save.")
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        self.df.to_csv(output_path, sep='|', index=False)
+        if os.path.splitext(output_path)[1] in COLUMNAR_FORMATS:
+            write_columnar(self.df, output_path)
+        else:
+            self.df.to_csv(output_path, sep=sep or '|', index=False)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from aggregation import StreamingKPIAggregator, segment_sums, top_zipcodes, zip_month_panel, zip_spearman
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+KPI_COLS = ['PolicyCount', 'TotalPremium', 'TotalClaims', 'LossRatio', 'ClaimFrequency', 'ClaimSeverity',
+            'SeverityStd', 'AverageMargin']
+
+
+@pytest.fixture(scope='module')
+def policies():
+    # A higher claim frequency than the default, so every segment has claims to average
+    return coerce_schema(generate_policies(20_000, seed=0, claim_frequency=0.05))
+
+
+def _chunks(data, size=3000):
+    return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+
+def direct_kpis(data, key=None):
+    """The KPIs of aggregation.finalize_kpis computed with a plain groupby."""
+    claims = data['TotalClaims']
+    positive = claims[claims > 0]
+    by = (lambda s: s.groupby(data.loc[s.index, key], observed=True)) if key else (lambda s: s.groupby(lambda _: 0))
+    kpis = pd.DataFrame({
+        'PolicyCount': by(claims).size(),
+        'TotalPremium': by(data['TotalPremium']).sum(),
+        'TotalClaims': by(claims).sum(),
+        'ClaimCount': by(positive).size(),
+        'ClaimSeverity': by(positive).mean(),
+        'SeverityStd': by(positive).std(),
+    })
+    kpis['ClaimCount'] = kpis['ClaimCount'].fillna(0)
+    kpis['LossRatio'] = kpis['TotalClaims'] / kpis['TotalPremium']
+    kpis['ClaimFrequency'] = kpis['ClaimCount'] / kpis['PolicyCount']
+    kpis['AverageMargin'] = (kpis['TotalPremium'] - kpis['TotalClaims']) / kpis['PolicyCount']
+    return kpis[KPI_COLS]
+
+
+def test_streaming_aggregator_matches_groupby(policies):
+    results = StreamingKPIAggregator(['Province', 'VehicleType']).fit(_chunks(policies)).results()
+    overall = direct_kpis(policies).iloc[0]
+    pd.testing.assert_series_equal(results['overall'][KPI_COLS].astype(float), overall.astype(float),
+                                   check_names=False)
+    for col in ('Province', 'VehicleType'):
+        expected = direct_kpis(policies, col)
+        got = results[col][KPI_COLS]
+        got.index = got.index.astype(str)
+        expected.index = expected.index.astype(str)
+        pd.testing.assert_frame_equal(got.astype(float), expected.astype(float), check_names=False)
+
+
+def test_merged_aggregators_match_a_single_pass(policies):
+    chunks = _chunks(policies)
+    single = StreamingKPIAggregator(['Province']).fit(chunks).results()
+    left = StreamingKPIAggregator(['Province']).fit(chunks[::2])
+    merged = left.merge(StreamingKPIAggregator(['Province']).fit(chunks[1::2])).results()
+    pd.testing.assert_series_equal(merged['overall'], single['overall'])
+    pd.testing.assert_frame_equal(merged['Province'], single['Province'])
+
+
+@pytest.mark.parametrize('n_jobs, backend', [(1, 'thread'), (3, 'thread'), (2, 'process')])
+def test_segment_sums_match_groupby(policies, n_jobs, backend):
+    segments = segment_sums(policies, ['Province', 'PostalCode', 'NoSuchColumn'], by_month=True, n_jobs=n_jobs,
+                            backend=backend)
+    assert set(segments) == {'Province', 'PostalCode', ('Province', 'TransactionMonth'),
+                             ('PostalCode', 'TransactionMonth')}
+    for key, got in segments.items():
+        grouped = policies.groupby(list(key) if isinstance(key, tuple) else key, observed=True)
+        expected = pd.DataFrame({'TotalPremium': grouped['TotalPremium'].sum(),
+                                 'TotalClaims': grouped['TotalClaims'].sum(),
+                                 'PolicyCount': grouped.size()})
+        expected['LossRatio'] = expected['TotalClaims'] / expected['TotalPremium']
+        assert np.allclose(got.to_numpy(dtype=float), expected.loc[got.index].to_numpy(dtype=float), equal_nan=True)
+        assert len(got) == len(expected)
+
+
+def test_weighted_segment_sums(policies):
+    weighted = policies.assign(Weight=np.random.default_rng(0).uniform(0.5, 3.0, len(policies)))
+    got = segment_sums(weighted, ['Province'], n_jobs=1, weight_col='Weight')['Province']
+    weights = weighted['Weight']
+    grouped = weighted.assign(TotalPremium=weighted['TotalPremium'] * weights,
+                              TotalClaims=weighted['TotalClaims'] * weights).groupby('Province', observed=True)
+    assert np.allclose(got['TotalPremium'], grouped['TotalPremium'].sum().loc[got.index])
+    assert np.allclose(got['PolicyCount'], grouped['Weight'].sum().loc[got.index])
+
+
+def test_zip_panel_and_spearman_match_scipy(policies):
+    panel = zip_month_panel(policies)
+    zips = top_zipcodes(panel, 4)
+    assert list(zips) == list(policies['PostalCode'].value_counts().index[:4])
+
+    correlations = zip_spearman(panel, zips)
+    monthly = policies.groupby(['PostalCode', 'TransactionMonth'], observed=True)[['TotalPremium', 'TotalClaims']].sum()
+    for zip_code in zips:
+        rows = monthly.xs(zip_code, level=0)
+        expected = stats.spearmanr(rows['TotalPremium'], rows['TotalClaims']).statistic
+        assert np.isclose(correlations[zip_code], expected, equal_nan=True)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preprocessing import PreprocessData, _fill_missing
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+
+@pytest.fixture(scope='module')
+def policies():
+    data = coerce_schema(generate_policies(5000, seed=0))
+    # Gaps in every kind of planned column
+    rng = np.random.default_rng(0)
+    for col in data.columns:
+        data.loc[rng.random(len(data)) < 0.05, col] = np.nan
+    return data
+
+
+def _per_column_apply(data, plan):
+    """The column-by-column fill the bulk assignment replaced."""
+    data = data.drop(columns=[col for col in plan['drop_cols'] + plan['drop_after'] if col in data.columns])
+    for col in plan['flag_cols']:
+        if col in data.columns:
+            data[col + '_missing_flag'] = data[col].isna().astype(int)
+    for col, value in plan['fill_values'].items():
+        if col in data.columns:
+            filled = _fill_missing(data[col], value, data[col].isna().to_numpy())
+            if filled is not None:
+                data[col] = filled
+    return data
+
+
+def test_chunked_fit_matches_full_fit(policies):
+    preprocess = PreprocessData(policies)
+    full = preprocess.fit_missing_values(policies)
+    chunked = preprocess.fit_missing_values(policies.iloc[start:start + 700] for start in range(0, len(policies), 700))
+    assert full['fill_values'] and chunked['fill_values'].keys() == full['fill_values'].keys()
+    for col, value in full['fill_values'].items():
+        assert chunked['fill_values'][col] == value or (pd.isna(value) and pd.isna(chunked['fill_values'][col]))
+    assert chunked['missing_counts'] == full['missing_counts'] and chunked['n_rows'] == full['n_rows']
+
+
+def test_bulk_fill_matches_per_column_fill(policies):
+    preprocess = PreprocessData(policies)
+    plan = preprocess.fit_missing_values(policies)
+    expected = _per_column_apply(policies, plan)
+    pd.testing.assert_frame_equal(preprocess.apply_missing_values(policies, plan), expected)
+
+    data = policies.copy()
+    assert preprocess.apply_missing_values(data, plan, inplace=True) is data
+    pd.testing.assert_frame_equal(data, expected)
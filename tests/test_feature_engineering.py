@@ -0,0 +1,67 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preprocessing import PreprocessData
+from feature_engineering import FeatureEngineering, FeaturePipeline
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+
+@pytest.fixture(scope='module')
+def policies():
+    return coerce_schema(generate_policies(3000, seed=0))
+
+
+def test_sparse_design_equals_dense_features(policies):
+    dense = FeatureEngineering(policies).create_features()
+    engineering = FeatureEngineering(policies)
+    X = engineering.create_features(encoding='sparse')
+    sparse = pd.DataFrame(X.toarray(), columns=engineering.feature_names, index=policies.index)
+
+    # Dense keeps the targets and drops the first level of each categorical
+    common = [col for col in dense.columns if col in sparse.columns]
+    assert set(dense.columns) - set(common) == {'TotalClaims', 'HasClaim'}
+    # Large integer codes such as mmcode (~4e7) must not be rounded
+    assert dense['mmcode'].max() > 2 ** 24
+    for col in common:
+        assert np.array_equal(dense[col].to_numpy(dtype=float), sparse[col].to_numpy(), equal_nan=True), col
+
+
+@pytest.mark.parametrize('min_frequency', [None, 5])
+def test_sparse_encoding_of_unseen_levels(policies, min_frequency):
+    pipeline = FeaturePipeline(encoding='sparse', min_frequency=min_frequency).fit(policies)
+    batch = policies.iloc[:50].copy()
+    batch['make'] = batch['make'].cat.add_categories(['Unseen'])
+    batch.loc[batch.index[0], 'make'] = 'Unseen'
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        X = pipeline.transform(batch)
+    make_cols = [i for i, name in enumerate(pipeline.feature_names) if pipeline.feature_sources[name] == 'make']
+    # Unseen levels go to '<col>_other' when rare levels are pooled, else encode as zeros
+    assert X[0].toarray()[0, make_cols].sum() == (1.0 if min_frequency else 0.0)
+    assert np.array_equal(X[1:].toarray(), pipeline.transform(policies.iloc[1:50]).toarray(), equal_nan=True)
+
+
+def test_pipeline_transform_equals_create_features(policies):
+    # The pipeline applies the missing-value plan before encoding
+    cleaned = PreprocessData(policies).handle_missing_values(policies)
+    dense = FeatureEngineering(cleaned).create_features().drop(columns=['TotalClaims', 'HasClaim'])
+    pipeline = FeaturePipeline().fit(policies)
+    transformed = pipeline.transform(policies)
+    assert list(transformed.columns) == list(dense.columns) == pipeline.feature_names
+    assert np.allclose(transformed.to_numpy(dtype=float), dense.to_numpy(dtype=float), equal_nan=True)
+
+    # Batches map onto the same layout, unseen levels encode as zeros
+    batch = policies.iloc[:50].copy()
+    batch['make'] = batch['make'].cat.add_categories(['Unseen'])
+    batch.loc[batch.index[0], 'make'] = 'Unseen'
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        encoded = pipeline.transform(batch)
+    assert list(encoded.columns) == pipeline.feature_names
+    make_cols = [col for col in encoded.columns if pipeline.feature_sources[col] == 'make']
+    assert not encoded.loc[batch.index[0], make_cols].any()
+    pd.testing.assert_frame_equal(encoded.iloc[1:], transformed.iloc[1:50])
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import xgboost as xgb
+
+import feature_importance
+from feature_engineering import FeaturePipeline
+from feature_importance import FeatureInterpreter, QuoteExplainer, clear_shap_cache
+from synthetic_data import generate_policies
+
+
+def _model_and_rows(seed=0, n_rows=200):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, 4)), columns=['a', 'b', 'c', 'd'])
+    y = X['a'] * 2 + X['b'] + rng.normal(scale=0.1, size=n_rows)
+    model = xgb.XGBRegressor(n_estimators=5, max_depth=2).fit(X, y)
+    return model, X
+
+
+def test_shap_cache_is_bounded_and_clearable(monkeypatch):
+    monkeypatch.setattr(feature_importance, 'SHAP_CACHE_SIZE', 2)
+    clear_shap_cache()
+    model, X = _model_and_rows()
+    interpreter = FeatureInterpreter(model, X)
+    first = interpreter.shap_summary(sample_size=50, plot=False, random_state=0)[1]
+    for random_state in (1, 2):
+        interpreter.shap_summary(sample_size=50, plot=False, random_state=random_state)
+    assert len(feature_importance._SHAP_CACHE) == 2
+    # The oldest result was evicted; recomputing it gives the same values
+    again = interpreter.shap_summary(sample_size=50, plot=False, random_state=0)[1]
+    assert again is not first and np.allclose(again, first)
+    assert len(feature_importance._SHAP_CACHE) == 2
+
+    clear_shap_cache()
+    assert not feature_importance._SHAP_CACHE
+
+
+def test_quote_explainer_explains_each_new_row_once():
+    model, X = _model_and_rows()
+    explainer = QuoteExplainer(model, X.columns, {'a': 'ab', 'b': 'ab'}, latency_budget_ms=None)
+    explained = []
+    explain_fn = explainer._explain_fn
+    explainer._explain_fn = lambda rows: explained.append(rows.shape[0]) or explain_fn(rows)
+
+    batch = sp.csr_matrix(X.iloc[[0, 1, 0, 2, 1]].to_numpy(), dtype=np.float32)
+    original = batch.copy()
+    values = explainer.contributions(batch)
+    assert explained == [3]
+    assert (batch != original).nnz == 0
+    assert np.allclose(values[0], values[2]) and np.allclose(values[1], values[4])
+    assert np.allclose(values, explainer.contributions(batch))
+    assert explained == [3]
+    # No stored zeros here, so the dense form explains the same
+    assert np.allclose(values[3], explainer.contributions(X.iloc[2].to_numpy())[0])
+
+
+def test_quote_explainer_matches_margin_of_sparse_trained_model():
+    data = generate_policies(3000, seed=0)
+    pipeline = FeaturePipeline(encoding='sparse')
+    X = pipeline.fit_transform(data)
+    # Stored zeros are values for XGBoost, absent entries are missing
+    X.data[::7] = 0.0
+    y = pipeline.extract_targets(data)['HasClaim']
+    model = xgb.XGBClassifier(n_estimators=30, max_depth=4).fit(X, y)
+
+    rows = X[:300]
+    explainer = QuoteExplainer(model, pipeline.feature_names, pipeline.feature_sources, latency_budget_ms=None)
+    values = explainer.contributions(rows)
+    bias = model.get_booster().predict(xgb.DMatrix(rows), pred_contribs=True)[:, -1]
+    assert np.allclose(values.sum(axis=1) + bias, model.predict(rows, output_margin=True), atol=1e-4)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency, ttest_ind
+
+from hypothesis_testing import HypothesisTester, adjust_pvalues
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+
+@pytest.fixture(scope='module')
+def tester():
+    data = coerce_schema(generate_policies(20_000, seed=0, claim_frequency=0.05))
+    tester = HypothesisTester(data, copy=False)
+    tester.calculate_metrics()
+    return tester
+
+
+def test_pairs_match_scipy(tester):
+    results = tester.test_pairs('Province', top_n=4, correction=None)
+    data = tester._frame(['Province', 'ClaimOccurred', 'Margin', 'TotalClaims'])
+    assert len(results) == 6 * 3
+    for _, row in results.iterrows():
+        a, b = data[data['Province'] == row['Group_1']], data[data['Province'] == row['Group_2']]
+        if row['Test'].startswith('Chi-Square'):
+            both = pd.concat([a, b])
+            statistic, p_value, _, _ = chi2_contingency(pd.crosstab(both['Province'].astype(str),
+                                                                    both['ClaimOccurred']))
+        else:
+            col = row['Test'][len('T-Test ('):-1]
+            statistic, p_value = ttest_ind(a[col], b[col], equal_var=False)
+            assert np.isclose(row['Group_1_Mean'], a[col].mean())
+        assert np.isclose(row['Statistic'], statistic, rtol=1e-6), row
+        assert np.isclose(row['P-Value'], p_value, rtol=1e-6, atol=1e-12), row
+
+
+def test_adjusted_pvalues_follow_the_correction(tester):
+    results = tester.test_pairs('Province', top_n=4)
+    for _, group in results.groupby('Test'):
+        assert np.allclose(group['Adjusted_P-Value'], adjust_pvalues(group['P-Value'].to_numpy(), 'fdr_bh'))
+    assert np.allclose(adjust_pvalues([0.01, 0.04, 0.03], 'bonferroni'), [0.03, 0.12, 0.09])
+    assert np.allclose(adjust_pvalues([0.01, 0.04, 0.03], 'holm'), [0.03, 0.06, 0.06])
@@ -0,0 +1,62 @@
+"""
+Import-time budget for the lightweight entry points of the scripts package.
+
+Each statement runs in a fresh interpreter (best of REPEAT runs) and fails when it loads one
+of the heavy libraries, or takes more than BUDGET_MS beyond a bare `import pandas`.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['shap', 'xgboost', 'sklearn', 'scipy', 'matplotlib', 'seaborn']
+
+BUDGET_MS = 150.0
+REPEAT = 3
+
+# Statements that must stay light
+LIGHT_IMPORTS = [
+    'import scripts',
+    'from scripts import DataLoader',
+    'from scripts import PreprocessData',
+    'from scripts import ExploratoryDataAnalysis',
+    'import scripts; scripts.kpi_store.KPIStore',
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def measure(statement, repeat=REPEAT):
+    """Best-of-repeat seconds for statement in a fresh interpreter, and the heavy modules it loaded."""
+    best, modules = None, []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+                                cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        best = result['seconds'] if best is None else min(best, result['seconds'])
+        modules = result['modules']
+    return best, modules
+
+
+@pytest.fixture(scope='module')
+def pandas_seconds():
+    return measure('import pandas')[0]
+
+
+@pytest.mark.parametrize('statement', LIGHT_IMPORTS)
+def test_light_import_stays_within_budget(statement, pandas_seconds):
+    seconds, modules = measure(statement)
+    assert not modules, f"{statement} loads {', '.join(modules)}"
+    extra_ms = (seconds - pandas_seconds) * 1000
+    assert extra_ms <= BUDGET_MS, f"{statement} takes {extra_ms:.0f} ms over pandas (budget {BUDGET_MS:.0f} ms)"
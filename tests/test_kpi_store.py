@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eda import ExploratoryDataAnalysis
+from kpi_store import KPIStore
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+SEGMENTS = ['Province', 'make', 'PostalCode']
+
+
+@pytest.fixture(scope='module')
+def policies():
+    return coerce_schema(generate_policies(6000, seed=0))
+
+
+@pytest.fixture
+def store(policies, tmp_path):
+    store = KPIStore(str(tmp_path / 'kpis'), SEGMENTS)
+    store.append(policies)
+    return store
+
+
+def test_bivariate_from_store_matches_rows(policies, store):
+    eda = ExploratoryDataAnalysis(policies)
+    from_rows = eda.bivariate_analysis()
+    from_store = eda.bivariate_analysis(store=store)
+    assert from_store.keys() == from_rows.keys()
+    pd.testing.assert_frame_equal(from_store['zip_panel'], from_rows['zip_panel'], check_dtype=False,
+                                  check_index_type=False)
+    pd.testing.assert_series_equal(from_store['zip_correlations'], from_rows['zip_correlations'])
+
+
+def test_unknown_segments_are_skipped_with_a_warning_on_both_paths(policies, store):
+    eda = ExploratoryDataAnalysis(policies)
+    with pytest.warns(UserWarning, match='Gender'):
+        from_store = eda.calculate_loss_ratios(['Province', 'Gender'], store=store)
+    with pytest.warns(UserWarning, match='NoSuchColumn'):
+        from_rows = eda.calculate_loss_ratios(['Province', 'NoSuchColumn'])
+    assert set(from_store) == set(from_rows) == {'overall', 'Province'}
+    assert np.isclose(from_store['overall'], from_rows['overall'])
+
+
+def _direct_sums(data, key):
+    """PolicyCount, TotalPremium, TotalClaims and ClaimCount per key with a plain groupby."""
+    grouped = data.groupby(key, observed=True, sort=True)
+    sums = pd.DataFrame({'PolicyCount': grouped.size(),
+                         'TotalPremium': grouped['TotalPremium'].sum(),
+                         'TotalClaims': grouped['TotalClaims'].sum(),
+                         'ClaimCount': grouped['TotalClaims'].agg(lambda s: (s > 0).sum())})
+    sums['LossRatio'] = sums['TotalClaims'] / sums['TotalPremium']
+    return sums
+
+
+def _assert_kpis_equal(kpis, expected):
+    # The store keeps segment values as strings and months as timestamps of its own
+    keys = list(expected.index.names)
+    kpis = kpis[expected.columns].rename_axis(keys).reset_index()
+    expected = expected.reset_index()
+    kpis[keys] = kpis[keys].astype(str)
+    expected[keys] = expected[keys].astype(str)
+    pd.testing.assert_frame_equal(kpis, expected, check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('start, end', [(None, None), ('2014-03', '2014-11-15')])
+def test_query_matches_a_direct_groupby(policies, store, start, end):
+    months = policies['TransactionMonth']
+    rows = policies[(months >= pd.Timestamp(start or months.min())) & (months <= pd.Timestamp(end or months.max()))]
+
+    overall = store.query(None, start, end)
+    assert overall['PolicyCount'] == len(rows)
+    assert np.isclose(overall['LossRatio'], rows['TotalClaims'].sum() / rows['TotalPremium'].sum())
+    for segment in ['Province', 'make']:
+        _assert_kpis_equal(store.query(segment, start, end), _direct_sums(rows, segment))
+    _assert_kpis_equal(store.query('Province', start, end, by_month=True),
+                       _direct_sums(rows, ['Province', 'TransactionMonth']))
+
+
+def test_reappending_a_month_is_idempotent(policies, store):
+    before = {segment: store.query(segment) for segment in SEGMENTS}
+    rows_before = dict(store.manifest['months'])
+    month = policies[policies['TransactionMonth'] == pd.Timestamp('2014-06-01')]
+
+    assert store.append(month) == ['2014-06']
+    assert store.manifest['months'] == rows_before
+    for segment in SEGMENTS:
+        pd.testing.assert_frame_equal(store.query(segment), before[segment])
+
+    # Reopening from disk reads the same manifest and partitions
+    reopened = KPIStore(store.path)
+    assert reopened.segment_cols == SEGMENTS
+    pd.testing.assert_frame_equal(reopened.query('Province'), before['Province'])
+
+    # replace=False accumulates instead
+    store.append(month, replace=False)
+    assert store.manifest['months']['2014-06']['rows'] == 2 * len(month)
+    assert store.query(None)['PolicyCount'] == len(policies) + len(month)
+
+
+def test_fit_over_chunks_equals_a_single_append(policies, store, tmp_path):
+    # Chunks split months across boundaries; a second fit replaces rather than doubles
+    chunks = [policies.iloc[start:start + 700] for start in range(0, len(policies), 700)]
+    streamed = KPIStore(str(tmp_path / 'streamed'), SEGMENTS).fit(chunks).fit(chunks)
+    assert streamed.manifest['months'] == store.manifest['months']
+    for segment in [None] + SEGMENTS:
+        expected = store.query(segment)
+        if segment is None:
+            pd.testing.assert_series_equal(streamed.query(segment), expected, rtol=1e-9)
+        else:
+            pd.testing.assert_frame_equal(streamed.query(segment), expected, rtol=1e-9)
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from feature_engineering import FeaturePipeline
+from models import CrossValidator, TrainingOrchestrator, train_xgb_external
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+
+@pytest.fixture(scope='module')
+def policies():
+    return coerce_schema(generate_policies(4000, seed=0, claim_frequency=0.1))
+
+
+@pytest.fixture(scope='module')
+def design(policies):
+    pipeline = FeaturePipeline().fit(policies)
+    X = pipeline.transform(policies).to_numpy(dtype=float)
+    targets = pipeline.extract_targets(policies)
+    return pipeline, X, targets['HasClaim'].reset_index(drop=True), targets['TotalClaims'].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('n_candidates, eta, expected_resources', [
+    (4, 2, [0.25, 0.5, 1.0]),
+    (10, 3, [1 / 27, 1 / 9, 1.0]),
+])
+def test_halving_trains_the_survivor_on_the_full_set(design, n_candidates, eta, expected_resources):
+    _, X, y, _ = design
+    split = len(X) * 3 // 4
+    orchestrator = TrainingOrchestrator(X[:split], X[split:], y[:split], y[split:], n_workers=2, threads_per_job=1)
+    space = {'xgb_classifier': {'n_estimators': [5], 'max_depth': list(range(1, n_candidates + 1))}}
+    leaderboard = orchestrator.search(space, strategy='halving', eta=eta)
+
+    assert sorted(leaderboard['Resource'].unique()) == pytest.approx(expected_resources)
+    assert (leaderboard['Resource'] == 1.0).sum() == 1
+    assert leaderboard.loc[0, 'Resource'] == 1.0
+    # Each round keeps the best 1/eta of the previous one
+    for low, high in zip(expected_resources, expected_resources[1:]):
+        previous = leaderboard[np.isclose(leaderboard['Resource'], low)]
+        survivors = leaderboard[np.isclose(leaderboard['Resource'], high)]
+        best = previous.nlargest(len(survivors), 'ROC-AUC')['Params'].map(str)
+        assert set(survivors['Params'].map(str)) == set(best)
+
+
+@pytest.mark.parametrize('grouped', [False, True])
+def test_cross_validator_folds_partition_the_rows(design, policies, grouped):
+    _, X, y_freq, y_sev = design
+    groups = policies['PolicyID'].to_numpy() if grouped else None
+    validator = CrossValidator(X, y_freq, y_sev, n_splits=4, groups=groups, n_workers=1)
+    tested = np.concatenate([test for _, test in validator.folds])
+    assert len(validator.folds) == 4
+    assert np.array_equal(np.sort(tested), np.arange(len(X)))
+    for train, test in validator.folds:
+        assert train.dtype == np.int32 and test.dtype == np.int32
+        assert not np.intersect1d(train, test).size
+        assert len(train) + len(test) == len(X)
+        if grouped:
+            assert not set(groups[train]) & set(groups[test])
+
+
+def test_cross_validator_out_of_fold_predictions_are_complete(design):
+    _, X, y_freq, y_sev = design
+    validator = CrossValidator(X, y_freq, y_sev, n_splits=3, n_workers=2, threads_per_job=1)
+    candidates = [('logistic_regression', {}), ('xgb_classifier', {'n_estimators': 5, 'max_depth': 2})]
+    summary, oof = validator.evaluate_many(candidates)
+    assert list(summary['Folds']) == [3, 3]
+    assert oof.shape == (len(X), 2) and oof.notna().all().all()
+    assert oof.to_numpy().min() >= 0 and oof.to_numpy().max() <= 1
+
+    summary, oof = validator.evaluate('xgboost', {'n_estimators': 5, 'max_depth': 2})
+    claims = (y_sev > 0).to_numpy()
+    assert summary['Folds'] == 3
+    # Severity is predicted on every claim row and nowhere else
+    assert oof[claims].notna().all() and oof[~claims].isna().all()
+
+
+@pytest.mark.parametrize('task, target', [('classification', 'HasClaim'), ('regression', 'TotalClaims')])
+@pytest.mark.parametrize('external', [False, True])
+def test_chunked_training_equals_in_memory_training(design, policies, tmp_path, task, target, external):
+    pipeline = design[0]
+    chunks = lambda: [policies.iloc[start:start + 1000] for start in range(0, len(policies), 1000)]
+    booster = train_xgb_external(chunks, pipeline, task, {'max_depth': 3}, num_boost_round=20,
+                                 cache_dir=str(tmp_path) if external else None)
+
+    # Severity is fitted on the claim rows only
+    rows = policies if task == 'classification' else policies[policies['TotalClaims'] > 0]
+    names = list(pipeline.feature_names)
+    dtrain = xgb.QuantileDMatrix(pipeline.transform(rows), pipeline.extract_targets(rows)[target].to_numpy(),
+                                 max_bin=256, feature_names=names)
+    params = {'tree_method': 'hist', 'max_depth': 3, 'learning_rate': 0.1, 'seed': 42,
+              'objective': 'binary:logistic' if task == 'classification' else 'reg:squarederror'}
+    reference = xgb.train(params, dtrain, num_boost_round=20)
+
+    dall = xgb.DMatrix(pipeline.transform(policies), feature_names=names)
+    assert booster.num_boosted_rounds() == 20
+    assert np.allclose(booster.predict(dall), reference.predict(dall), rtol=1e-5, atol=1e-6)
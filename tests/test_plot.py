@@ -0,0 +1,21 @@
+import os
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+from plot import EDAPlots
+from synthetic_data import generate_policies
+
+
+def test_headless_plots_keep_the_process_backend(tmp_path):
+    previous = matplotlib.get_backend()
+    plt.switch_backend('svg')
+    try:
+        plots = EDAPlots(generate_policies(2000, seed=0), output_dir=str(tmp_path))
+        path = plots.plot_monthly_trends()
+        paths = plots.render_report(numerical_cols=['TotalPremium', 'TotalClaims'], n_jobs=1)
+        assert matplotlib.get_backend() == 'svg'
+        assert os.path.exists(path) and all(os.path.exists(p) for p in paths)
+        assert not plt.get_fignums()
+    finally:
+        plt.switch_backend(previous)
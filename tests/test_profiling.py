@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+
+
+def test_pipeline_imports_and_profiles_without_resource_module():
+    # Windows has neither the resource module nor /proc
+    code = (
+        "import sys; sys.modules['resource'] = None\n"
+        "import profiling\n"
+        "profiling._current_rss = lambda: None\n"
+        "import pandas as pd\n"
+        "from data_preprocessing import PreprocessData\n"
+        "with profiling.StageProfiler() as profiler:\n"
+        "    data = pd.DataFrame({'TotalPremium': [1.0, None], 'TotalClaims': [0.0, 2.0]})\n"
+        "    PreprocessData(data).handle_missing_values(data)\n"
+        "assert profiler.records and profiler.records[0]['rss_mb'] is None\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
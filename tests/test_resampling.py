@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+import resampling
+from resampling import TwoSampleResampler
+
+N_RESAMPLES = 4000
+
+
+def _group(rng, n, frequency):
+    """Zero-inflated claims over a few premium levels, so both heavy pairs and light rows occur."""
+    claims = np.where(rng.random(n) < frequency, rng.lognormal(8, 1, n), 0.0)
+    premium = rng.choice(np.linspace(100, 2000, 20), n)
+    return claims, premium
+
+
+@pytest.fixture(scope='module')
+def groups():
+    rng = np.random.default_rng(1)
+    claims_a, premium_a = _group(rng, 3000, 0.10)
+    claims_b, premium_b = _group(rng, 2000, 0.115)
+    return {'loss_ratio': (claims_a, premium_a, claims_b, premium_b),
+            'frequency': ((claims_a > 0).astype(float), np.ones(3000), (claims_b > 0).astype(float), np.ones(2000))}
+
+
+def _ratio_difference(num_a, den_a, num_b, den_b):
+    return num_a.sum() / den_a.sum() - num_b.sum() / den_b.sum()
+
+
+def _naive_bootstrap(num_a, den_a, num_b, den_b, n_resamples, seed=0):
+    rng = np.random.default_rng(seed)
+    diffs = np.empty(n_resamples)
+    for i in range(n_resamples):
+        a = rng.integers(0, len(num_a), len(num_a))
+        b = rng.integers(0, len(num_b), len(num_b))
+        diffs[i] = _ratio_difference(num_a[a], den_a[a], num_b[b], den_b[b])
+    return diffs
+
+
+def _naive_permutation(num_a, den_a, num_b, den_b, n_resamples, seed=0):
+    rng = np.random.default_rng(seed)
+    num, den = np.concatenate([num_a, num_b]), np.concatenate([den_a, den_b])
+    observed = abs(_ratio_difference(num_a, den_a, num_b, den_b))
+    extreme = 0
+    for _ in range(n_resamples):
+        order = rng.permutation(len(num))
+        a, b = order[:len(num_a)], order[len(num_a):]
+        extreme += abs(_ratio_difference(num[a], den[a], num[b], den[b])) >= observed * (1 - 1e-12)
+    return (extreme + 1) / (n_resamples + 1)
+
+
+@pytest.mark.parametrize('metric', ['loss_ratio', 'frequency'])
+def test_bootstrap_matches_a_naive_loop(groups, metric):
+    result = TwoSampleResampler(*groups[metric], seed=0).bootstrap(N_RESAMPLES)
+    diffs = _naive_bootstrap(*groups[metric], N_RESAMPLES)
+    lower, upper = np.percentile(diffs, [2.5, 97.5])
+    p_value = 2 * min((diffs <= 0).mean(), (diffs >= 0).mean())
+
+    standard_error = diffs.std(ddof=1)
+    assert result['difference'] == pytest.approx(_ratio_difference(*groups[metric]))
+    assert result['resamples'] == N_RESAMPLES
+    # Monte Carlo error of a 2.5% percentile from 4000 resamples is about 0.05 standard errors
+    assert abs(result['ci_lower'] - lower) < 0.25 * standard_error
+    assert abs(result['ci_upper'] - upper) < 0.25 * standard_error
+    assert result['std_error'] == pytest.approx(standard_error, rel=0.08)
+    # The p-value is twice a tail share; allow four standard errors of the difference of two estimates
+    share = p_value / 2
+    assert abs(result['p_value'] - p_value) < 4 * 2 * np.sqrt(2 * share * (1 - share) / N_RESAMPLES)
+
+
+@pytest.mark.parametrize('metric', ['loss_ratio', 'frequency'])
+def test_permutation_matches_a_naive_loop(groups, metric):
+    result = TwoSampleResampler(*groups[metric], seed=0).permutation(N_RESAMPLES, early_stop=False)
+    p_value = _naive_permutation(*groups[metric], N_RESAMPLES)
+    assert result['resamples'] == N_RESAMPLES and not result['stopped_early']
+    assert abs(result['p_value'] - p_value) < 4 * np.sqrt(2 * p_value * (1 - p_value) / N_RESAMPLES)
+
+
+def test_results_do_not_depend_on_n_jobs(groups, monkeypatch):
+    # Small batches, so the work is spread over several batches and workers
+    monkeypatch.setattr(resampling, 'MAX_BATCH_RESAMPLES', 250)
+    results = []
+    for n_jobs in (1, 2, 3):
+        resampler = TwoSampleResampler(*groups['loss_ratio'], seed=123, n_jobs=n_jobs)
+        results.append((resampler.bootstrap(2000), resampler.permutation(2000, early_stop=False),
+                        resampler.permutation(2000)))
+    assert results[0] == results[1] == results[2]
@@ -0,0 +1,74 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sampling import WEIGHT_COL, StratifiedSampler
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+
+@pytest.fixture(scope='module')
+def policies():
+    data = coerce_schema(generate_policies(20_000, seed=0, claim_frequency=0.05))
+    # Covers repeat over months, so tag each row
+    return data.assign(RowID=np.arange(len(data)))
+
+
+def _chunks(data, size=3000):
+    return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+
+def _strata(data):
+    return pd.DataFrame({'Province': data['Province'].astype(str),
+                         'HasClaim': (data['TotalClaims'] > 0).astype(int)})
+
+
+@pytest.mark.parametrize('claim_size', [None, 50])
+def test_weights_reproduce_stratum_populations_and_totals(policies, claim_size):
+    sampler = StratifiedSampler(size=200, claim_size=claim_size, seed=0).fit(_chunks(policies))
+    sample = sampler.sample()
+
+    keys = [_strata(sample)[col] for col in ['Province', 'HasClaim']]
+    population = _strata(policies).value_counts()
+    weighted = sample[WEIGHT_COL].groupby(keys).sum()
+    pd.testing.assert_series_equal(weighted.sort_index(), population.sort_index().astype(float),
+                                   check_names=False, check_index_type=False)
+    summary = sampler.stratum_summary()
+    assert summary['Population'].sum() == len(policies)
+    assert (summary['Sampled'] <= np.where(summary.index.get_level_values('HasClaim') == 1,
+                                           claim_size or np.inf, 200)).all()
+    assert np.isclose(sample[WEIGHT_COL].sum(), len(policies))
+
+    # Rows are drawn without replacement and kept in their original order
+    assert sample['RowID'].is_unique and sample['RowID'].is_monotonic_increasing
+
+    # Weighted totals are unbiased; allow four stratified standard errors
+    for col in ['TotalPremium', 'TotalClaims']:
+        estimate = (sample[col] * sample[WEIGHT_COL]).sum()
+        grouped = sample[col].groupby(keys)
+        n, weight = grouped.size(), sample[WEIGHT_COL].groupby(keys).first()
+        variance = ((weight * n) ** 2 * (1 - 1 / weight) * grouped.var().fillna(0) / n).sum()
+        assert abs(estimate - policies[col].sum()) <= 4 * np.sqrt(variance) + 1e-6 * abs(estimate), col
+
+
+def test_merge_equals_a_single_pass(policies):
+    chunks = _chunks(policies)
+    single = StratifiedSampler(size=150, claim_size=40, seed=7).fit(chunks)
+
+    first = StratifiedSampler(size=150, claim_size=40, seed=7).fit(chunks[:3])
+    second = StratifiedSampler(size=150, claim_size=40)
+    # Continue the key stream where the first sampler stopped, as the single pass does
+    second.rng = copy.deepcopy(first.rng)
+    second.fit(chunks[3:])
+    merged = first.merge(second)
+
+    assert merged.rows_seen == single.rows_seen == len(policies)
+    pd.testing.assert_frame_equal(merged.stratum_summary(), single.stratum_summary())
+    pd.testing.assert_frame_equal(merged.sample(), single.sample())
+
+
+def test_sample_does_not_depend_on_the_chunk_size(policies):
+    samples = [StratifiedSampler(size=100, seed=3).fit(_chunks(policies, size)).sample() for size in (1000, 7000)]
+    pd.testing.assert_frame_equal(samples[0], samples[1])
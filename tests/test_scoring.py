@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from feature_engineering import FeaturePipeline
+from scoring import PolicyScorer
+from synthetic_data import generate_policies
+
+
+@pytest.fixture(scope='module')
+def scorer_and_batches():
+    data = generate_policies(4000, seed=0)
+    pipeline = FeaturePipeline().fit(data)
+    X = pipeline.transform(data).to_numpy(dtype=float)
+    targets = pipeline.extract_targets(data)
+    freq_model = xgb.XGBClassifier(n_estimators=5, max_depth=2).fit(X, targets['HasClaim'])
+    sev_model = xgb.XGBRegressor(n_estimators=5, max_depth=2).fit(X, targets['TotalClaims'])
+    batches = [data.iloc[start:start + 200] for start in range(0, len(data), 200)]
+    return PolicyScorer(pipeline, freq_model, sev_model), batches
+
+
+def test_score_batches_reads_a_bounded_window_ahead(scorer_and_batches):
+    scorer, batches = scorer_and_batches
+    expected = pd.concat(list(scorer.score_batches(batches)))
+
+    scorer.n_workers = 2
+    pulled = []
+
+    def lazy_batches():
+        for batch in batches:
+            pulled.append(len(batch))
+            yield batch
+
+    results = []
+    for scores in scorer.score_batches(lazy_batches()):
+        results.append(scores)
+        assert len(pulled) - len(results) <= 2 * scorer.n_workers
+    pd.testing.assert_frame_equal(pd.concat(results), expected)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import NumericProfiler, QuantileSketch
+from synthetic_data import generate_policies
+from utils import coerce_schema
+
+COLUMNS = ['CustomValueEstimate', 'CapitalOutstanding', 'SumInsured', 'CalculatedPremiumPerTerm',
+           'TotalPremium', 'TotalClaims', 'Margin', 'NumberOfVehiclesInFleet']
+
+
+@pytest.fixture(scope='module')
+def policies():
+    data = coerce_schema(generate_policies(5000, seed=0, claim_frequency=0.05))
+    # A signed column, to exercise the negative buckets
+    data['Margin'] = data['TotalPremium'] - data['TotalClaims']
+    return data
+
+
+def _profile(chunks, relative_accuracy=0.01):
+    return NumericProfiler(COLUMNS, relative_accuracy).fit(chunks)
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_profile_matches_describe_within_the_stated_error(policies, relative_accuracy):
+    chunks = [policies.iloc[start:start + 700] for start in range(0, len(policies), 700)]
+    approx = _profile(chunks, relative_accuracy).describe()
+    exact = policies[COLUMNS].describe()
+
+    # Count, mean, std and extremes are exact up to rounding
+    for stat in ['count', 'mean', 'std', 'min', 'max']:
+        assert np.allclose(approx.loc[stat], exact.loc[stat], rtol=1e-9, equal_nan=True), stat
+
+    for col in COLUMNS:
+        values = np.sort(policies[col].dropna().to_numpy(dtype=float))
+        if not len(values):
+            assert approx[col][['25%', '50%', '75%']].isna().all()
+            continue
+        for q in (0.25, 0.5, 0.75):
+            # describe() interpolates between the two order statistics around the rank; the
+            # sketch is within relative_accuracy of the lower one
+            rank = q * (len(values) - 1)
+            lower, upper = values[int(np.floor(rank))], values[int(np.ceil(rank))]
+            tolerance = relative_accuracy * abs(lower) + (upper - lower) + 1e-9
+            assert abs(approx.loc[f'{q:.0%}', col] - exact.loc[f'{q:.0%}', col]) <= tolerance, (col, q)
+
+
+def test_quantiles_are_within_relative_accuracy():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.lognormal(5, 2, 20_000), -rng.lognormal(2, 1, 5_000), np.zeros(1_000)])
+    sketch = QuantileSketch(relative_accuracy=0.02).update(values)
+    ordered = np.sort(values)
+    qs = np.linspace(0, 1, 101)
+    truth = ordered[np.floor(qs * (len(values) - 1)).astype(int)]
+    assert np.all(np.abs(sketch.quantile(qs) - truth) <= 0.02 * np.abs(truth) + 1e-12)
+
+
+def test_merged_profiles_equal_a_single_pass(policies):
+    chunks = [policies.iloc[start:start + 700] for start in range(0, len(policies), 700)]
+    single = _profile(chunks)
+    merged = _profile(chunks[:3]).merge(_profile(chunks[3:]))
+    assert merged.rows == single.rows == len(policies)
+    pd.testing.assert_frame_equal(merged.describe(), single.describe(), rtol=1e-12)
+    for col in COLUMNS:
+        for a, b in zip(merged.quantiles[col].support(), single.quantiles[col].support()):
+            assert np.array_equal(a, b)
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from synthetic_data import generate_policies, write_policies
+
+
+def _read(path):
+    return pd.read_csv(path, sep='|', dtype=str, keep_default_na=False)
+
+
+def test_written_files_are_reproducible_and_seeds_share_no_chunks(tmp_path):
+    paths = {}
+    for name, seed in (('a', 0), ('b', 0), ('c', 1)):
+        paths[name] = tmp_path / f"{name}.txt"
+        assert write_policies(str(paths[name]), 900, seed=seed, chunk_rows=300) == 900
+    a, b, c = (_read(paths[name]) for name in 'abc')
+    pd.testing.assert_frame_equal(a, b)
+    assert len(a) == 900 and list(a.columns) == list(generate_policies(5).columns)
+    # Chunk 1 of seed 0 used to be chunk 0 of seed 1
+    for i in range(3):
+        for j in range(3):
+            chunk_a, chunk_c = a.iloc[300 * i:300 * (i + 1)], c.iloc[300 * j:300 * (j + 1)]
+            assert not (chunk_a['TotalPremium'].to_numpy() == chunk_c['TotalPremium'].to_numpy()).all()
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import DataLoader, parse_dates
+
+# More rows than one low_memory parsing block, so the C parser has to union block categories
+SPARSE_ROWS = 200_000
+
+
+@pytest.fixture
+def sparse_categorical_file(tmp_path):
+    """A pipe-delimited extract whose CrossBorder column is empty except for the last row."""
+    path = tmp_path / 'sparse.txt'
+    pd.DataFrame({
+        'PolicyID': np.arange(SPARSE_ROWS),
+        'CrossBorder': [''] * (SPARSE_ROWS - 1) + ['No'],
+        'TotalPremium': 1.0,
+        'TotalClaims': 0.0,
+    }).to_csv(path, sep='|', index=False)
+    return str(path)
+
+
+def test_typed_load_of_mostly_empty_categorical(sparse_categorical_file):
+    df = DataLoader(sparse_categorical_file).load_data(typed=True)
+    assert len(df) == SPARSE_ROWS
+    assert isinstance(df['CrossBorder'].dtype, pd.CategoricalDtype)
+    assert df['CrossBorder'].notna().sum() == 1
+
+
+def test_typed_chunks_of_mostly_empty_categorical(sparse_categorical_file):
+    chunks = DataLoader(sparse_categorical_file).load_data(typed=True, chunksize=SPARSE_ROWS)
+    assert sum(chunk['CrossBorder'].notna().sum() for chunk in chunks) == 1
+
+
+def test_cold_cache_build_and_invalidation(sparse_categorical_file, tmp_path):
+    loader = DataLoader(sparse_categorical_file)
+    cache_dir = str(tmp_path / 'cache')
+    first_path = loader.cache_path(sparse_categorical_file, cache_dir, preprocess=False)
+
+    df = loader.load_cached(cache_dir=cache_dir, preprocess=False)
+    assert len(df) == SPARSE_ROWS
+    assert df['CrossBorder'].notna().sum() == 1
+    assert (tmp_path / 'cache').exists() and first_path.endswith('.parquet')
+
+    # Rewriting the raw file changes its fingerprint: the cache is rebuilt and the old file dropped
+    with open(sparse_categorical_file, 'a') as f:
+        f.write(f"{SPARSE_ROWS}|Yes|2.0|0.0\n")
+    second_path = loader.cache_path(sparse_categorical_file, cache_dir, preprocess=False)
+    assert second_path != first_path
+
+    df = loader.load_cached(cache_dir=cache_dir, preprocess=False)
+    assert len(df) == SPARSE_ROWS + 1
+    assert df['CrossBorder'].notna().sum() == 2
+    assert sorted(p.name for p in (tmp_path / 'cache').iterdir()) == [second_path.split('/')[-1]]
+
+
+def test_caches_of_two_configs_coexist(sparse_categorical_file, tmp_path):
+    loader = DataLoader(sparse_categorical_file)
+    cache_dir = tmp_path / 'cache'
+    raw_path = loader.cache_path(sparse_categorical_file, str(cache_dir), preprocess=False)
+    clean_path = loader.cache_path(sparse_categorical_file, str(cache_dir), preprocess=True)
+    cache_dir.mkdir()
+    # The temp file of a concurrent build (of a newer raw file) must survive
+    stem, key, ext = os.path.basename(raw_path).rsplit('.', 2)
+    (cache_dir / f"{stem}.{'0' * 12}-{key.split('-')[1]}.{ext}.tmp.{ext}").write_bytes(b'')
+
+    for preprocess in (True, False, True):
+        loader.load_cached(cache_dir=str(cache_dir), preprocess=preprocess)
+    assert os.path.exists(raw_path) and os.path.exists(clean_path)
+    assert len(list(cache_dir.iterdir())) == 3
+
+    # Both configs hit their cache instead of reparsing the raw file
+    mtimes = {path: os.stat(path).st_mtime_ns for path in (raw_path, clean_path)}
+    loader.load_cached(cache_dir=str(cache_dir), preprocess=False)
+    loader.load_cached(cache_dir=str(cache_dir), preprocess=True)
+    assert mtimes == {path: os.stat(path).st_mtime_ns for path in (raw_path, clean_path)}
+
+
+@pytest.mark.parametrize('values', [
+    ['2015-03-01 00:00:00', '2014-11-01 00:00:00', '2015-03-01 00:00:00', None, '2013-10-01 00:00:00'],
+    ['2015-03-01', '2014-11-01', '2015-03-01'],
+    ['01/06/2002', '12/01/2014', '01/06/2002', ''],
+    # The format guessed from the first value does not fit the others
+    ['2015-03-01 00:00:00', '2014-11-01', '6/1/2002', '2014-11-01T10:30:00', 'not a date', None],
+    [None, None],
+    [],
+])
+@pytest.mark.parametrize('dtype', [object, 'str', 'category'])
+def test_parse_dates_equals_mixed_format_parsing(values, dtype):
+    series = pd.Series(values, dtype=dtype, name='VehicleIntroDate', index=np.arange(len(values)) * 3)
+    expected = pd.to_datetime(series.astype(object), format='mixed', errors='coerce')
+    parsed = parse_dates(series)
+    pd.testing.assert_series_equal(parsed, expected, check_dtype=False)
+    assert pd.api.types.is_datetime64_any_dtype(parsed)
+
+
+def test_parse_dates_returns_datetimes_unchanged():
+    series = pd.Series(pd.to_datetime(['2015-03-01', None]))
+    assert parse_dates(series) is series